@@ -0,0 +1,31 @@
+from utils.api_requests import APIClient
+from utils.resilience import RetryPolicy
+
+
+def test_make_request_throughput(benchmark, api_stub):
+    api_client = APIClient(api_stub, retry=RetryPolicy(retries=0))
+
+    def requests():
+        for offset in range(0, 2000, 100):
+            api_client.make_request(path='/hosts', params={'offset': offset, 'limit': 100})
+
+    benchmark(requests)
+    api_client.close()
+
+
+def test_paginate_offset_prefetch(benchmark, api_stub):
+    api_client = APIClient(api_stub, retry=RetryPolicy(retries=0))
+
+    records = benchmark(lambda: sum(1 for _ in api_client.paginate('/hosts', pagination='offset', page_size=500, prefetch=4)))
+
+    assert records == 10000
+    api_client.close()
+
+
+def test_iter_json_export(benchmark, api_stub):
+    api_client = APIClient(api_stub, retry=RetryPolicy(retries=0))
+
+    records = benchmark(lambda: sum(1 for _ in api_client.iter_json(records_key='items', path='/export')))
+
+    assert records == 10000
+    api_client.close()
@@ -0,0 +1,83 @@
+import json
+import sqlite3
+import pytest
+import threading
+
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from unittest.mock import patch
+from urllib.parse import urlparse, parse_qs
+
+from fleet import generate_diskspace, generate_records
+from utils.database import DatabaseClient
+
+
+# hosts x 3 drives, from a handful of rows to a large fleet
+FLEET_SIZES = [4, 400, 16000]
+
+
+@pytest.fixture(params=FLEET_SIZES, ids=lambda hosts: f'{hosts * 3}rows')
+def diskspace_df(request):
+    return generate_diskspace(request.param)
+
+
+# sqlite3 rejects params=None, which pymssql accepts for statements without parameters
+class SQLiteCursor(sqlite3.Cursor):
+    def execute(self, sql, params=None):
+        return super().execute(sql, params or ())
+
+
+class SQLiteConnection(sqlite3.Connection):
+    def cursor(self):
+        return super().cursor(SQLiteCursor)
+
+
+# DatabaseClient against a SQLite file holding the synthetic fleet, SQLite understands the summary query as well
+@pytest.fixture(params=FLEET_SIZES, ids=lambda hosts: f'{hosts * 3}rows')
+def sqlite_db_client(request, tmp_path):
+    path = str(tmp_path / 'diskspace.db')
+    with sqlite3.connect(path) as conn:
+        generate_diskspace(request.param).to_sql('DiskSpace', conn, index=False)
+
+    with patch.object(DatabaseClient, '_connect', lambda self: sqlite3.connect(path, factory=SQLiteConnection)):
+        db_client = DatabaseClient('database', 'username', 'password', 'host')
+        yield db_client
+        db_client.pool.close()
+
+
+class InventoryHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately, with Nagle every keep-alive request would wait on a delayed ACK
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/hosts':
+            query = parse_qs(url.query)
+            offset, limit = int(query.get('offset', [0])[0]), int(query.get('limit', [100])[0])
+            body = json.dumps({'items': self.server.records[offset:offset + limit]}).encode()
+        elif url.path == '/export':
+            body = self.server.export
+        else:
+            self.send_error(404)
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+# A local inventory API serving 10k host records, paged on /hosts and as one array on /export
+@pytest.fixture(scope='session')
+def api_stub():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), InventoryHandler)
+    server.records = generate_records(10000)
+    server.export = json.dumps({'items': server.records}).encode()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
@@ -0,0 +1,18 @@
+from utils.diskspace import load_diskspace, SUMMARY_SQL, SUMMARY_DTYPES
+
+
+def test_load_diskspace_summary(benchmark, sqlite_db_client):
+    df = benchmark(load_diskspace, sqlite_db_client, summary=True)
+
+    assert df['TotalSize_GB'].dtype == 'float32'
+
+
+def test_load_diskspace_full(benchmark, sqlite_db_client):
+    benchmark(load_diskspace, sqlite_db_client)
+
+
+def test_stream_frames(benchmark, sqlite_db_client):
+    def stream():
+        return sum(len(frame) for frame in sqlite_db_client.stream_frames(SUMMARY_SQL, batch_size=5000, dtypes=SUMMARY_DTYPES))
+
+    assert benchmark(stream) > 0
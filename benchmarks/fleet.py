@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+
+
+DRIVES = ['C', 'D', 'E', 'F', 'G', 'H']
+
+
+# A synthetic DiskSpace table (as returned by SELECT * FROM DiskSpace) with hosts x drives_per_host rows.
+# Sizes and usage are random but reproducible for a seed
+def generate_diskspace(hosts, drives_per_host=3, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = hosts * drives_per_host
+
+    total_gb = rng.choice([50, 100, 250, 500, 1000, 2000], size=rows) * rng.uniform(0.95, 1.0, size=rows)
+    free_gb = total_gb * rng.beta(2, 5, size=rows)
+    updated = pd.Timestamp('2024-01-01') - pd.to_timedelta(rng.integers(0, 7 * 24 * 3600, size=rows), unit='s')
+
+    return pd.DataFrame({
+        'ComputerName': np.repeat([f'HOST{i:05d}' for i in range(hosts)], drives_per_host),
+        'Drive': np.tile(DRIVES[:drives_per_host], hosts),
+        'TotalSize_GB': total_gb.round(2),
+        'FreeSpace_GB': free_gb.round(2),
+        'UpdateTimeStamp': updated.floor('s')
+    })
+
+
+def generate_records(count, seed=0):
+    df = generate_diskspace(count, drives_per_host=1, seed=seed)
+    df['UpdateTimeStamp'] = df['UpdateTimeStamp'].dt.strftime('%Y-%m-%dT%H:%M:%S')
+    return df.to_dict('records')
@@ -0,0 +1,28 @@
+from utils.charts import build_host_views
+from utils.diskspace import derive_diskspace, typed_diskspace, summarize_fleet, page_diskspace
+
+
+# Machine speed reference, the baseline check compares every benchmark relative to this one
+def test_calibration(benchmark):
+    benchmark(lambda: sum(i * i for i in range(200000)))
+
+
+def test_derive_diskspace(benchmark, diskspace_df):
+    benchmark(lambda: typed_diskspace(derive_diskspace(diskspace_df.copy())))
+
+
+def test_summarize_fleet(benchmark, diskspace_df):
+    df = typed_diskspace(derive_diskspace(diskspace_df.copy()))
+
+    benchmark(summarize_fleet, df)
+
+
+# The data path of one dashboard page in main.py: derive, overview summary, page of hosts and per host views
+def test_render_page(benchmark, diskspace_df):
+    def render():
+        df = typed_diskspace(derive_diskspace(diskspace_df.copy()))
+        summarize_fleet(df)
+        page_df, _ = page_diskspace(df, page=1, page_size=25, order_by='fullest')
+        return build_host_views(page_df)
+
+    assert len(benchmark(render)) == min(25, diskspace_df['ComputerName'].nunique())
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# Compares pytest-benchmark JSON reports with the committed baseline and fails when a benchmark got slower than
+# tolerance times its baseline. The fastest round is used as it is the least noisy, and it is taken relative to the
+# calibration benchmark so a baseline recorded on one machine can be checked on another (e.g. a CI runner).
+# Rounds are at least --benchmark-min-time long, so the small fleets loop enough iterations to be as stable as the
+# large ones. When more reports are given each benchmark's best run is used, a regression must show in every run.
+#
+# Usage: python -m pytest benchmarks --no-cov --benchmark-min-time=0.1 --benchmark-json=benchmark-1.json (repeat for -2)
+#        python scripts/check_benchmarks.py benchmark-1.json benchmark-2.json [--tolerance 2.0] [--update]
+
+import os
+import sys
+import json
+import argparse
+
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks', 'baseline.json')
+CALIBRATION = 'test_calibration'
+
+
+# Benchmark name -> fastest round relative to the fastest calibration round
+def report_timings(report_path):
+    with open(report_path) as f:
+        report = json.load(f)
+
+    timings = {benchmark['name']: benchmark['stats']['min'] for benchmark in report['benchmarks']}
+    if CALIBRATION not in timings:
+        raise SystemExit(f'{report_path} has no {CALIBRATION} benchmark')
+
+    calibration = timings.pop(CALIBRATION)
+    return {name: timing / calibration for name, timing in sorted(timings.items())}
+
+
+# Benchmark name -> best relative timing across the reports
+def relative_timings(report_paths):
+    results = {}
+    for report_path in report_paths:
+        for name, value in report_timings(report_path).items():
+            results[name] = min(value, results.get(name, value))
+    return dict(sorted(results.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check benchmark results against the baseline')
+    parser.add_argument('reports', nargs='+', help='pytest-benchmark --benchmark-json output of one or more runs')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='baseline JSON file')
+    parser.add_argument('--tolerance', type=float, default=2.0, help='allowed slowdown factor')
+    parser.add_argument('--update', action='store_true', help='write the report as the new baseline')
+    args = parser.parse_args()
+
+    results = relative_timings(args.reports)
+    if args.update:
+        with open(args.baseline, 'w') as f:
+            json.dump({name: round(value, 4) for name, value in results.items()}, f, indent=2)
+            f.write('\n')
+        print(f'Wrote {len(results)} benchmarks to {args.baseline}')
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+
+    regressions = []
+    print(f"{'benchmark':<56}{'baseline':>10}{'current':>10}{'change':>9}")
+    for name, value in results.items():
+        if name not in baseline:
+            print(f"{name:<56}{'-':>10}{value:>10.3f}      new")
+            continue
+        change = value / baseline[name]
+        flag = '  REGRESSION' if change > args.tolerance else ''
+        print(f"{name:<56}{baseline[name]:>10.3f}{value:>10.3f}{change:>8.2f}x{flag}")
+        if flag:
+            regressions.append(name)
+
+    for name in sorted(set(baseline) - set(results)):
+        print(f'{name:<56} missing from report')
+
+    if regressions:
+        print(f'{len(regressions)} benchmark(s) slower than {args.tolerance}x the baseline: {", ".join(regressions)}')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# Measures the cold import time of every utils module and of the imports of each entry point (main.py,
+# collector.py, ...), each in a fresh interpreter using python -X importtime.
+#
+# Usage: python scripts/import_time.py [--repeat 5] [--json]
+
+import os
+import ast
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+ENTRY_POINTS = ['main.py', 'collector.py', 'exporter.py', 'ingest.py']
+MARKER = '--import-time-start--'
+
+
+# The module level imports of an entry point, so they can be timed without running the script itself
+def entry_point_imports(path):
+    with open(path) as f:
+        tree = ast.parse(f.read())
+    return '\n'.join(ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom)))
+
+
+def targets():
+    result = {}
+    for entry_point in ENTRY_POINTS:
+        result[entry_point] = entry_point_imports(os.path.join(SRC_DIR, entry_point))
+    for file_name in sorted(os.listdir(os.path.join(SRC_DIR, 'utils'))):
+        if file_name.endswith('.py') and file_name != '__init__.py':
+            module = f'utils.{file_name[:-3]}'
+            result[module] = f'import {module}'
+    return result
+
+
+# Returns the total import time and the cumulative time per top level package in milliseconds
+def measure(code):
+    code = f'import sys\nsys.stderr.write("{MARKER}\\n")\n{code}'
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=SRC_DIR, capture_output=True, text=True)
+    if process.returncode != 0:
+        raise RuntimeError(process.stderr.strip().splitlines()[-1])
+
+    lines = process.stderr.split(MARKER, 1)[1].splitlines()
+    total = 0
+    packages = {}
+    for line in lines:
+        if not line.startswith('import time:'):
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        name = name.strip()
+        if depth == 0:
+            total += int(cumulative)
+        if '.' not in name:
+            packages[name] = int(cumulative)
+    return total / 1000, {name: value / 1000 for name, value in packages.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure cold import time per module')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per module, the median is reported')
+    parser.add_argument('--top', type=int, default=3, help='heaviest packages to list per module')
+    parser.add_argument('--json', action='store_true', help='print the results as JSON')
+    args = parser.parse_args()
+
+    results = {}
+    for name, code in targets().items():
+        runs = [measure(code) for _ in range(args.repeat)]
+        packages = runs[len(runs) // 2][1]
+        heaviest = sorted(((package, value) for package, value in packages.items() if package not in ('utils', 'sys')), key=lambda item: -item[1])
+        results[name] = {
+            'total_ms': round(statistics.median(total for total, _ in runs), 1),
+            'heaviest_ms': {package: round(value, 1) for package, value in heaviest[:args.top]}
+        }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'module':<24}{'total':>10}  heaviest imports")
+    for name, result in sorted(results.items(), key=lambda item: -item[1]['total_ms']):
+        heaviest = ', '.join(f'{package} {value:.0f}ms' for package, value in result['heaviest_ms'].items())
+        print(f"{name:<24}{result['total_ms']:>8.0f}ms  {heaviest}")
+
+
+if __name__ == '__main__':
+    main()
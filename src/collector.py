@@ -0,0 +1,78 @@
+import os
+import time
+import logging
+
+from prometheus_client import start_http_server
+
+from utils.logging import set_logging_configuration, job_start_counter, job_complete_counter, job_duration_summary
+from utils.config import DB_HOST, DB_USER, DB_PASS, DB_NAME, PORT, SNAPSHOT_DIR, COLLECT_INTERVAL, DISKSPACE_LOOKBACK, HISTORY_PATH, HISTORY_RESOLUTION, HISTORY_RETENTION_DAYS
+from utils.database import DatabaseClient
+from utils.diskspace import IncrementalLoader
+from utils.history import HistoryStore, forecast_days_until_full, export_forecast
+from utils.snapshot import DISKSPACE_FILE, FORECAST_FILE, write_snapshot
+
+
+JOB_NAME = 'diskspace_collector'
+
+
+class SnapshotCollector:
+    def __init__(self, loader, snapshot_dir, history_store=None):
+        self.loader = loader
+        self.snapshot_dir = snapshot_dir
+        self.history_store = history_store
+        self.logger = logging.getLogger(__name__)
+
+        self.last_fingerprint = None
+
+    def run_once(self):
+        job_start_counter.labels(JOB_NAME).inc()
+        start = time.time()
+        status = 'success'
+
+        try:
+            fingerprint = self.loader.fingerprint()
+            if fingerprint is None or fingerprint != self.last_fingerprint:
+                df = self.loader.load()
+                write_snapshot(df, os.path.join(self.snapshot_dir, DISKSPACE_FILE))
+
+                if self.history_store:
+                    forecast_df = forecast_days_until_full(self.history_store.append(df))
+                    export_forecast(forecast_df)
+                    write_snapshot(forecast_df, os.path.join(self.snapshot_dir, FORECAST_FILE))
+
+                self.last_fingerprint = fingerprint
+                self.logger.info(f'Wrote snapshot with {len(df)} drives')
+            else:
+                self.logger.debug('DiskSpace unchanged, keeping current snapshot')
+        except Exception as e:
+            status = 'failure'
+            self.logger.error(f'Error collecting snapshot: {e}')
+
+        job_complete_counter.labels(JOB_NAME, status).inc()
+        job_duration_summary.labels(JOB_NAME, status).observe(time.time() - start)
+        return status == 'success'
+
+    def run_forever(self, interval):
+        while True:
+            start = time.monotonic()
+            self.run_once()
+            time.sleep(max(0, interval - (time.monotonic() - start)))
+
+
+def main():
+    set_logging_configuration()
+
+    if not SNAPSHOT_DIR:
+        raise ValueError('SNAPSHOT_DIR must be set to run the collector')
+
+    start_http_server(int(PORT))
+
+    db_client = DatabaseClient(database=DB_NAME, username=DB_USER, password=DB_PASS, host=DB_HOST, pool_min_size=1, pool_max_size=1)
+    history_store = HistoryStore(HISTORY_PATH, resolution=HISTORY_RESOLUTION, retention_days=HISTORY_RETENTION_DAYS) if HISTORY_PATH else None
+
+    collector = SnapshotCollector(IncrementalLoader(db_client, summary=True, lookback=DISKSPACE_LOOKBACK), SNAPSHOT_DIR, history_store)
+    collector.run_forever(COLLECT_INTERVAL)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,28 @@
+import os
+import time
+
+from prometheus_client import start_http_server
+
+from utils.logging import set_logging_configuration
+from utils.config import PORT, SNAPSHOT_DIR, EXPORT_INTERVAL
+from utils.exporter import DiskMetricsExporter
+from utils.snapshot import DISKSPACE_FILE
+
+
+def main():
+    set_logging_configuration()
+
+    if not SNAPSHOT_DIR:
+        raise ValueError('SNAPSHOT_DIR must be set to run the exporter')
+
+    start_http_server(int(PORT))
+
+    exporter = DiskMetricsExporter()
+    snapshot_path = os.path.join(SNAPSHOT_DIR, DISKSPACE_FILE)
+    while True:
+        exporter.refresh(snapshot_path)
+        time.sleep(EXPORT_INTERVAL)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+import time
+import logging
+
+from prometheus_client import start_http_server
+
+from utils.logging import set_logging_configuration, job_start_counter, job_complete_counter, job_duration_summary
+from utils.config import DB_HOST, DB_USER, DB_PASS, DB_NAME, PORT, SFTP_HOST, SFTP_USER, SFTP_PASS, SFTP_KEY, SFTP_KEY_PASS, INGEST_DIR, INGEST_STATE_PATH, INGEST_INTERVAL
+from utils.database import DatabaseClient
+from utils.sftp import SFTPClient
+from utils.ingest import CSVIngester, SeenFiles
+
+
+JOB_NAME = 'diskspace_ingest'
+
+
+def run_once(ingester):
+    job_start_counter.labels(JOB_NAME).inc()
+    start = time.time()
+    status = 'success'
+
+    try:
+        ingester.run_once()
+    except Exception as e:
+        status = 'failure'
+        logging.getLogger(__name__).error(f'Error ingesting files: {e}')
+
+    job_complete_counter.labels(JOB_NAME, status).inc()
+    job_duration_summary.labels(JOB_NAME, status).observe(time.time() - start)
+    return status == 'success'
+
+
+def main():
+    set_logging_configuration()
+
+    if not SFTP_HOST:
+        raise ValueError('SFTP_HOST must be set to run the ingester')
+
+    start_http_server(int(PORT))
+
+    db_client = DatabaseClient(database=DB_NAME, username=DB_USER, password=DB_PASS, host=DB_HOST, pool_min_size=1, pool_max_size=1)
+    sftp_client = SFTPClient(SFTP_HOST, SFTP_USER, password=SFTP_PASS, key_base64=SFTP_KEY, key_pass=SFTP_KEY_PASS, pool_size=1)
+    ingester = CSVIngester(sftp_client, db_client, INGEST_DIR, SeenFiles(INGEST_STATE_PATH))
+
+    while True:
+        start = time.monotonic()
+        run_once(ingester)
+        time.sleep(max(0, INGEST_INTERVAL - (time.monotonic() - start)))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,15 +1,59 @@
+import logging
 import pandas as pd
-import altair as alt
 import streamlit as st
-import numpy as np
 
+from datetime import datetime, timedelta
+from prometheus_client import start_http_server
 
-from utils.database import DatabaseClient
-from utils.config import DB_HOST, DB_USER, DB_PASS, DB_NAME
+
+from utils import charts
+from utils.cache import QueryCache
+from utils.charts import build_host_views, percent_used_histogram
+from utils.diskspace import HOST_ORDERS
+from utils.timing import PhaseTimer, phase
+from utils.config import DEBUG, METRICS_PORT, DB_HOST, DB_USER, DB_PASS, DB_NAME, DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, CACHE_TTL, DISKSPACE_LOOKBACK, HISTORY_PATH, HISTORY_RESOLUTION, HISTORY_RETENTION_DAYS, SNAPSHOT_DIR
 
 pd.set_option('display.max_columns', None)
 
-db_client = DatabaseClient(database=DB_NAME, username=DB_USER, password=DB_PASS, host=DB_HOST)
+PAGE_SIZES = [10, 25, 50, 100]
+SORT_OPTIONS = {'name': 'Name', 'fullest': 'Fullest first'}
+TOP_N = 20
+
+
+# Shared across reruns and sessions
+@st.cache_resource
+def get_inventory():
+    query_cache = QueryCache(ttl=CACHE_TTL, max_entries=256)
+
+    # Only the inventory in use is imported
+    if SNAPSHOT_DIR:
+        from utils.inventory import SnapshotInventory
+        return SnapshotInventory(SNAPSHOT_DIR, query_cache, top_n=TOP_N)
+
+    from utils.database import DatabaseClient
+    from utils.history import HistoryStore
+    from utils.inventory import DatabaseInventory
+
+    db_client = DatabaseClient(database=DB_NAME, username=DB_USER, password=DB_PASS, host=DB_HOST, pool_min_size=DB_POOL_MIN_SIZE, pool_max_size=DB_POOL_MAX_SIZE)
+    history_store = HistoryStore(HISTORY_PATH, resolution=HISTORY_RESOLUTION, retention_days=HISTORY_RETENTION_DAYS) if HISTORY_PATH else None
+    return DatabaseInventory(db_client, query_cache, history_store, top_n=TOP_N, lookback=DISKSPACE_LOOKBACK)
+
+
+# Once per process, the metrics recorded while serving the dashboard are exposed on /metrics at METRICS_PORT
+@st.cache_resource
+def start_metrics_server():
+    try:
+        start_http_server(METRICS_PORT)
+    except OSError as e:
+        logging.getLogger(__name__).error(f'Error starting metrics server on port {METRICS_PORT}: {e}')
+
+
+# Once per process, altair is imported in the background while the first page loads its data
+@st.cache_resource
+def preload_charts():
+    charts.preload()
+
+
 # # print(db_client.execute_sql("SELECT * FROM DiskSpace"))
 # df = pd.read_sql("SELECT * FROM DiskSpace", db_client.get_connection())
 # print(df.loc[df['ComputerName'] == 'CALIBRA'])
@@ -17,46 +61,109 @@ db_client = DatabaseClient(database=DB_NAME, username=DB_USER, password=DB_PASS,
 # print(df)
 
 st.set_page_config(page_title="Server Inventory", layout="wide")
+timer = PhaseTimer().start()
+start_metrics_server()
+preload_charts()
 
 st.title("Server Inventory")
 
-disk_tab, other_tab = st.tabs(["Disk Space", "Other"])
+inventory = get_inventory()
+if not inventory.ready():
+    st.info('Waiting for the first snapshot from the collector')
+    st.stop()
+
+overview_tab, disk_tab, other_tab = st.tabs(["Overview", "Disk Space", "Other"])
+
+with overview_tab:
+    with phase('fleet_summary') as record:
+        fleet = inventory.fleet_summary()
+        record['rows'] = fleet['drive_count']
+
+    hosts_col, drives_col, total_col, used_col, free_col = st.columns(5)
+    hosts_col.metric('Hosts', f"{fleet['host_count']:,}")
+    drives_col.metric('Drives', f"{fleet['drive_count']:,}")
+    total_col.metric('Total', f"{fleet['total_gb']:,.0f} GB")
+    used_col.metric('Used', f"{fleet['used_gb']:,.0f} GB ({fleet['percent_used']:.1%})")
+    free_col.metric('Free', f"{fleet['free_gb']:,.0f} GB")
+
+    top_col, histogram_col = st.columns(2)
+
+    with top_col:
+        st.subheader(f'Top {TOP_N} fullest drives')
+        st.dataframe(fleet['top_drives'], hide_index=True, use_container_width=True, column_config={
+            'UsedSpace_GB': st.column_config.NumberColumn('Used', format='%.2f GB'),
+            'FreeSpace_GB': st.column_config.NumberColumn('Free', format='%.2f GB'),
+            'TotalSize_GB': st.column_config.NumberColumn('Total', format='%.2f GB'),
+            'ProcentageUsed': st.column_config.ProgressColumn('Used %', format='percent', min_value=0, max_value=1),
+            'UpdateTimeStamp': st.column_config.DatetimeColumn('Updated', format='DD/MM-YYYY HH:mm:ss')
+        })
+
+    with histogram_col:
+        with phase('histogram_chart'):
+            histogram_chart = percent_used_histogram(fleet['histogram'])
+        st.altair_chart(histogram_chart, use_container_width=True)
+
+    with phase('forecast') as record:
+        forecast_df = inventory.forecast()
+        record['rows'] = len(forecast_df) if forecast_df is not None else None
+    if forecast_df is not None:
+        st.subheader(f'Top {TOP_N} drives closest to full')
+        st.dataframe(forecast_df.nsmallest(TOP_N, 'DaysUntilFull'), hide_index=True, use_container_width=True, column_config={
+            'FreeSpace_GB': st.column_config.NumberColumn('Free', format='%.2f GB'),
+            'Growth_GB_per_day': st.column_config.NumberColumn('Growth', format='%.2f GB/day'),
+            'DaysUntilFull': st.column_config.NumberColumn('Days until full', format='%.0f')
+        })
 
 with disk_tab:
-    diskspace_df = pd.read_sql("SELECT * FROM DiskSpace", db_client.get_connection())
-    diskspace_df['TotalSize_GB'] = pd.to_numeric(diskspace_df['TotalSize_GB'])
-    diskspace_df['FreeSpace_GB'] = pd.to_numeric(diskspace_df['FreeSpace_GB'])
-    diskspace_df['UsedSpace_GB'] = diskspace_df['TotalSize_GB'] - diskspace_df['FreeSpace_GB']
-    diskspace_df['ProcentageUsed'] = diskspace_df['UsedSpace_GB'] / diskspace_df['TotalSize_GB'] #* 100
+    with phase('drives') as record:
+        drives = inventory.drives()
+        record['rows'] = len(drives)
+
+    search_col, percent_col, drive_col, stale_col, sort_col, page_size_col = st.columns(6)
+    search = search_col.text_input('Search hostname')
+    min_percent_used = percent_col.slider('Minimum % used', min_value=0, max_value=100, value=0, step=5)
+    drive = drive_col.selectbox('Drive', ['All'] + drives)
+    stale_hours = stale_col.number_input('Not updated for (hours)', min_value=0, value=0)
+    order_by = sort_col.selectbox('Sort by', list(HOST_ORDERS), format_func=SORT_OPTIONS.get)
+    page_size = page_size_col.selectbox('Hosts per page', PAGE_SIZES, index=1)
+
+    filters = {
+        'search': search.strip() or None,
+        'min_percent_used': min_percent_used / 100 if min_percent_used else None,
+        'drive': None if drive == 'All' else drive,
+        'stale_before': datetime.now().replace(minute=0, second=0, microsecond=0) - timedelta(hours=stale_hours) if stale_hours else None,
+        'order_by': order_by
+    }
 
-    for computer in diskspace_df['ComputerName'].unique():
-        computer_df = diskspace_df[diskspace_df['ComputerName'] == computer]
+    # Start from the first page whenever the filters change
+    if st.session_state.get('disk_filters') != (filters, page_size):
+        st.session_state['disk_filters'] = (filters, page_size)
+        st.session_state['disk_page'] = 1
 
-        update_time = computer_df.UpdateTimeStamp.mean().round('1s').strftime('%d/%m-%Y %H:%M:%S')
+    page = st.session_state.get('disk_page', 1)
+    with phase('page') as record:
+        page_df, host_count = inventory.page(page, page_size, **filters)
+        record['rows'] = len(page_df)
 
+    page_count = max(1, -(-host_count // page_size))
+    if page > page_count:
+        st.session_state['disk_page'] = 1
+        st.rerun()
+    st.number_input(f'Page (of {page_count}, {host_count} hosts)', min_value=1, max_value=page_count, key='disk_page')
+
+    for computer, chart, table_html in build_host_views(page_df):
         chart_col, table_col = st.columns(2)
 
         with chart_col:
-            melted_df = computer_df.melt(id_vars=['ComputerName', 'Drive'], value_vars=['UsedSpace_GB', 'FreeSpace_GB'], var_name='SpaceType', value_name='Space_GB')
-
-            chart = alt.Chart(melted_df).mark_bar().encode(
-                    x=alt.X('Drive:N', title='Drive'),
-                    y=alt.Y('sum(Space_GB):Q', title='Space (GB)'),
-                    color=alt.Color('SpaceType:N',
-                                    scale=alt.Scale(domain=['UsedSpace_GB', 'FreeSpace_GB'], range=['orange', 'green']),
-                                    legend=alt.Legend(title="Space Type"))
-                ).properties(
-                    title=f'{computer} - {update_time}',
-                    width=600,
-                    height=400
-                )
             st.altair_chart(chart, use_container_width=True)
 
         with table_col:
-            table_df = computer_df[['Drive', 'UsedSpace_GB', 'FreeSpace_GB', 'TotalSize_GB', 'ProcentageUsed']]
-            formatdict = {}
-            all_cols = ['UsedSpace_GB', 'FreeSpace_GB', 'TotalSize_GB']
-            for gb_col in all_cols:
-                formatdict[gb_col] = "{:,.2f} GB"
-            formatdict['ProcentageUsed'] = "{:.2%}"
-            st.markdown(table_df.style.format(formatdict).hide(axis="index").to_html(), unsafe_allow_html=True)
+            st.markdown(table_html, unsafe_allow_html=True)
+
+# Where the time of this rerun went, nested phases (SQL, pandas) only show up when the cache had to load them
+if DEBUG:
+    with st.sidebar.expander('Phase timings', expanded=True):
+        st.caption(f'Rerun took {timer.elapsed() * 1000:.0f} ms')
+        st.dataframe(timer.frame(), hide_index=True, use_container_width=True, column_config={
+            'Duration_ms': st.column_config.NumberColumn('Duration', format='%.1f ms')
+        })
@@ -1,10 +1,24 @@
+import os
+import json
 import time
 import base64
 import logging
+import tempfile
+import threading
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from utils.logging import api_retry_counter, api_throttle_wait_histogram, cache_hit_counter, cache_miss_counter
+from utils.json_stream import iter_json_array
+from utils.resilience import RetryPolicy, TokenBucket, CircuitBreaker, CircuitOpenError, parse_retry_after
+from utils.response_cache import ResponseCache
 
 
 class APIClient:
-    def __init__(self, base_url, api_key=None, realm=None, client_id=None, client_secret=None, username=None, password=None, cert_base64=None):
+    def __init__(self, base_url, api_key=None, realm=None, client_id=None, client_secret=None, username=None, password=None, cert_base64=None, pool_size=10, timeout=None,
+                 retry=None, rate_limit=None, circuit_breaker=False, name=None, refresh_margin=30, token_path=None, response_cache=None):
         self.base_url = base_url
         self.api_key = api_key
         self.realm = realm
@@ -19,11 +33,144 @@ class APIClient:
         self.refresh_token_expiry = None
         self.cert_data = None
 
+        # Tokens are refreshed refresh_margin seconds before they expire. When token_path is set the token
+        # is kept on disk, so a restarted client reuses it instead of requesting a new one
+        self.refresh_margin = refresh_margin
+        self.token_refresh_margin = 0
+        self.token_path = token_path
+        self._token_loaded = False
+        self._token_lock = threading.Lock()
+
         if cert_base64:
             self.cert_data = base64.b64decode(cert_base64)
 
+        self.pool_size = pool_size
+        self.timeout = timeout
+
+        self.session = None
+        self._session_lock = threading.Lock()
+
+        # name labels the metrics, rate_limit is in requests per second
+        self.name = name or urlparse(base_url).netloc or base_url
+        self.retry = retry if retry is not None else RetryPolicy()
+        self.rate_limiter = TokenBucket(rate_limit) if rate_limit else None
+        self.circuit_breaker = CircuitBreaker(self.name) if circuit_breaker else None
+
+        # Opt in GET response cache, True for an in memory cache or a ResponseCache (e.g. with a path)
+        self.response_cache = ResponseCache() if response_cache is True else response_cache
+
         self.logger = logging.getLogger(__name__)
 
+    # One session per client, so connections (and TLS handshakes) are kept alive and reused between requests.
+    # The PKCS#12 certificate is parsed once when its adapter is built, instead of on every request
+    def _get_session(self):
+        with self._session_lock:
+            if self.session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                session = requests.Session()
+                session.mount('http://', HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size))
+
+                if self.cert_data:
+                    from requests_pkcs12 import Pkcs12Adapter
+                    adapter = Pkcs12Adapter(pkcs12_data=self.cert_data, pkcs12_password=self.password, pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+                else:
+                    adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+                session.mount('https://', adapter)
+
+                self.session = session
+            return self.session
+
+    def close(self):
+        with self._session_lock:
+            if self.session is not None:
+                self.session.close()
+                self.session = None
+
+    def _token_valid(self):
+        return self.access_token and self.token_expiry and time.time() < self.token_expiry - self.token_refresh_margin
+
+    def _load_token(self):
+        try:
+            with open(self.token_path) as f:
+                data = json.load(f)
+            if data.get('key') != self._token_key():
+                return
+            self.access_token = data['access_token']
+            self.token_expiry = data['token_expiry']
+            self.refresh_token = data.get('refresh_token')
+            self.refresh_token_expiry = data.get('refresh_token_expiry')
+            self.token_refresh_margin = data.get('token_refresh_margin', 0)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            self.logger.error(f'Error loading token from {self.token_path}: {e}')
+
+    def _save_token(self):
+        data = {
+            'key': self._token_key(),
+            'access_token': self.access_token,
+            'token_expiry': self.token_expiry,
+            'refresh_token': self.refresh_token,
+            'refresh_token_expiry': self.refresh_token_expiry,
+            'token_refresh_margin': self.token_refresh_margin
+        }
+        try:
+            # A unique temporary file (created 0600), so clients in several pods sharing the token file never
+            # publish each other's half written file
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.token_path) or '.', prefix=f'.{os.path.basename(self.token_path)}.', suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(data, f)
+                os.replace(tmp_path, self.token_path)
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+        except Exception as e:
+            self.logger.error(f'Error saving token to {self.token_path}: {e}')
+
+    # Tokens are only reused by a client for the same server, realm, client and user
+    def _token_key(self):
+        return f'{self.base_url}|{self.realm}|{self.client_id}|{self.username}'
+
+    def _request_token(self, refresh_token):
+        tmp_url = f'{self.base_url}/auth/realms/{self.realm}/protocol/openid-connect/token'
+
+        tmp_headers = {
+            'Content-Type': 'application/x-www-form-urlencoded'
+        }
+
+        tmp_json_data = {
+            'client_id': self.client_id,
+            'client_secret': self.client_secret
+        }
+
+        if refresh_token:
+            tmp_json_data['grant_type'] = 'refresh_token'
+            tmp_json_data['refresh_token'] = self.refresh_token
+        elif self.username and self.password:
+            tmp_json_data['grant_type'] = 'password'
+            tmp_json_data['username'] = self.username
+            tmp_json_data['password'] = self.password
+        else:
+            tmp_json_data['grant_type'] = 'client_credentials'
+
+        now = time.time()
+
+        response = self._get_session().post(tmp_url, headers=tmp_headers, data=tmp_json_data)
+        response.raise_for_status()
+        data = response.json()
+
+        self.access_token = data['access_token']
+        self.token_expiry = now + data['expires_in']
+        # Refreshed a little before expiry, but never more than halfway through the token's lifetime
+        self.token_refresh_margin = min(self.refresh_margin, data['expires_in'] / 2)
+
+        if 'refresh_token' in data:
+            self.refresh_token = data['refresh_token']
+            self.refresh_token_expiry = now + data['refresh_expires_in']
+
     def _authenticate(self):
         if self.api_key:
             return {'Authorization': f'Bearer {self.api_key}'}
@@ -31,105 +178,279 @@ class APIClient:
             if not self.realm:
                 raise ValueError('Realm is required for client_id and client_secret authentication')
 
-            refresh_token = False
+            if self._token_valid():
+                return {'Authorization': f'Bearer {self.access_token}'}
 
-            if self.access_token:
-                if self.token_expiry:
-                    if time.time() < self.token_expiry:
-                        return {'Authorization': f'Bearer {self.access_token}'}
-                    else:
-                        if self.refresh_token:
-                            if self.refresh_token_expiry:
-                                if time.time() < self.refresh_token_expiry:
-                                    refresh_token = True
-
-            tmp_url = f'{self.base_url}/auth/realms/{self.realm}/protocol/openid-connect/token'
-
-            tmp_headers = {
-                'Content-Type': 'application/x-www-form-urlencoded'
-            }
-
-            tmp_json_data = {
-                'client_id': self.client_id,
-                'client_secret': self.client_secret
-            }
-
-            if refresh_token:
-                tmp_json_data['grant_type'] = 'refresh_token'
-                tmp_json_data['refresh_token'] = self.refresh_token
-            elif self.username and self.password:
-                tmp_json_data['grant_type'] = 'password'
-                tmp_json_data['username'] = self.username
-                tmp_json_data['password'] = self.password
-            else:
-                tmp_json_data['grant_type'] = 'client_credentials'
+            # Single flight: one thread fetches a new token while the others wait for it and reuse it
+            with self._token_lock:
+                if self.token_path and not self._token_loaded:
+                    self._token_loaded = True
+                    self._load_token()
 
-            now = time.time()
+                if not self._token_valid():
+                    if self.refresh_token and self.refresh_token_expiry and time.time() < self.refresh_token_expiry:
+                        try:
+                            self._request_token(refresh_token=True)
+                        except Exception as e:
+                            self.logger.warning(f'Refreshing token failed, requesting a new one: {e}')
+                            self._request_token(refresh_token=False)
+                    else:
+                        self._request_token(refresh_token=False)
 
-            import requests
+                    if self.token_path:
+                        self._save_token()
 
-            response = requests.post(tmp_url, headers=tmp_headers, data=tmp_json_data)
-            response.raise_for_status()
-            data = response.json()
+                return {'Authorization': f'Bearer {self.access_token}'}
+        else:
+            return {}
 
-            self.access_token = data['access_token']
-            self.token_expiry = now + data['expires_in']
+    # Builds the url, headers and method for a request from make_request style kwargs
+    def _prepare(self, kwargs):
+        if 'path' in kwargs:
+            if not isinstance(kwargs['path'], str):
+                raise ValueError('Path must be a string')
+            url = self.base_url.rstrip('/') + '/' + kwargs.pop('path').lstrip('/')
+        else:
+            url = self.base_url
 
-            if 'refresh_token' in data:
-                self.refresh_token = data['refresh_token']
-                self.refresh_token_expiry = now + data['refresh_expires_in']
+        if 'headers' in kwargs:
+            if not isinstance(kwargs['headers'], dict):
+                raise ValueError('Headers must be a dictionary')
+            kwargs['headers'] = kwargs['headers'] | self._authenticate()
+        else:
+            kwargs['headers'] = self._authenticate()
 
-            return {'Authorization': f'Bearer {self.access_token}'}
+        if not any(ele in kwargs for ele in ['method', 'json', 'data', 'files']):
+            method_string = 'GET'
+        elif 'method' in kwargs:
+            method_string = kwargs.pop('method').strip().upper()
         else:
-            return {}
+            method_string = 'POST'
+
+        if 'json' in kwargs:
+            kwargs['headers']['Content-Type'] = 'application/json'
+
+        if self.timeout is not None:
+            kwargs.setdefault('timeout', self.timeout)
+
+        return method_string, url, kwargs
 
     def make_request(self, **kwargs):
         try:
-            if self.cert_data:
-                import requests_pkcs12 as requests
-                kwargs['pkcs12_data'] = self.cert_data
-                kwargs['pkcs12_password'] = self.password
-            else:
-                import requests
+            session = self._get_session()
+            method_string, url, kwargs = self._prepare(kwargs)
 
-            if 'path' in kwargs:
-                if not isinstance(kwargs['path'], str):
-                    raise ValueError('Path must be a string')
-                url = self.base_url.rstrip('/') + '/' + kwargs.pop('path').lstrip('/')
-            else:
-                url = self.base_url
+            cache_key = None
+            entry = None
+            if self.response_cache and method_string == 'GET' and not kwargs.get('stream'):
+                params = kwargs.get('params')
+                cache_key = (url, tuple(sorted(params.items())) if isinstance(params, dict) else repr(params))
+                entry = self.response_cache.get(cache_key)
+                if entry:
+                    if ResponseCache.is_fresh(entry):
+                        cache_hit_counter.labels(f'api:{self.name}').inc()
+                        return entry['value']
+                    kwargs['headers'] = kwargs['headers'] | ResponseCache.validators(entry)
 
-            if 'headers' in kwargs:
-                if not isinstance(kwargs['headers'], dict):
-                    raise ValueError('Headers must be a dictionary')
-                kwargs['headers'] = kwargs['headers'] | self._authenticate()
-            else:
-                kwargs['headers'] = self._authenticate()
-
-            if not any(ele in kwargs for ele in ['method', 'json', 'data', 'files']):
-                method_string = 'GET'
-                method = requests.get
-            elif 'method' in kwargs:
-                method_string = kwargs.pop('method').strip().upper()
-                method = getattr(requests, method_string.lower())
-            else:
-                method_string = 'POST'
-                method = requests.post
+            response = self._send(session, method_string, url, **kwargs)
 
-            if 'json' in kwargs:
-                kwargs['headers']['Content-Type'] = 'application/json'
+            if entry and response.status_code == 304:
+                cache_hit_counter.labels(f'api:{self.name}').inc()
+                self.logger.debug(f'{method_string} request to {url} not modified, using cached response')
+                return self.response_cache.refresh(cache_key, entry, response.headers)['value']
 
-            response = method(url, **kwargs)
             response.raise_for_status()
 
             self.logger.info(f'{method_string} request to {url} successful')
 
             if 'application/json' in response.headers.get('Content-Type', ''):
-                return response.json()
+                value = response.json()
             else:
                 if not response.content:
                     return b' '
-                return response.content
+                value = response.content
+
+            if cache_key:
+                cache_miss_counter.labels(f'api:{self.name}').inc()
+                self.response_cache.store(cache_key, value, response.headers)
+            return value
 
         except Exception as e:
             self.logger.error(f'Request failed with error: {e.__class__} {e}')
+
+    # Sends the request through the circuit breaker and rate limiter, retrying connection errors and
+    # retryable statuses (429 and 5xx by default) with backoff, honouring Retry-After
+    def _send(self, session, method, url, **kwargs):
+        import requests
+
+        attempt = 0
+        while True:
+            if self.circuit_breaker and not self.circuit_breaker.allow():
+                raise CircuitOpenError(f"Circuit for '{self.name}' is open")
+
+            try:
+                if self.rate_limiter:
+                    api_throttle_wait_histogram.labels(self.name).observe(self.rate_limiter.acquire())
+
+                response = session.request(method, url, **kwargs)
+            except requests.RequestException as e:
+                if self.circuit_breaker:
+                    self.circuit_breaker.record_failure()
+                # Only connection errors and timeouts are retried, e.g. TooManyRedirects is raised as is
+                if not isinstance(e, (requests.ConnectionError, requests.Timeout)) or not self.retry.should_retry(method, attempt):
+                    raise
+                reason = 'timeout' if isinstance(e, requests.Timeout) else 'connection'
+                delay = self.retry.delay(attempt)
+            else:
+                status = response.status_code
+                if self.circuit_breaker:
+                    if isinstance(status, int) and status >= 500:
+                        self.circuit_breaker.record_failure()
+                    else:
+                        self.circuit_breaker.record_success()
+                if not self.retry.should_retry(method, attempt, status):
+                    return response
+                reason = str(status)
+                delay = self.retry.delay(attempt, parse_retry_after(response.headers.get('Retry-After')))
+                response.close()
+            finally:
+                if self.circuit_breaker:
+                    self.circuit_breaker.release()
+
+            api_retry_counter.labels(self.name, reason).inc()
+            self.logger.warning(f'{method} request to {url} failed ({reason}), retrying in {delay:.2f}s')
+            time.sleep(delay)
+            attempt += 1
+
+    # Yields the response body in chunks instead of holding it in memory. Unlike make_request errors are
+    # raised, as a partially consumed stream can not be returned as None
+    def stream(self, chunk_size=1024 * 1024, **kwargs):
+        try:
+            session = self._get_session()
+            method_string, url, kwargs = self._prepare(kwargs)
+            response = self._send(session, method_string, url, stream=True, **kwargs)
+        except Exception as e:
+            self.logger.error(f'Request failed with error: {e.__class__} {e}')
+            raise
+
+        try:
+            response.raise_for_status()
+            self.logger.info(f'{method_string} request to {url} successful, streaming response')
+            yield from response.iter_content(chunk_size)
+        finally:
+            response.close()
+
+    # Writes the response body to a file path, or to any writable file object (e.g. conn.open(path, 'wb')
+    # on an SFTP connection). Paths are written to a unique temporary file first, so a failed download leaves no
+    # partial file and concurrent downloads to the same path do not write into each other's file
+    def download(self, destination, chunk_size=1024 * 1024, **kwargs):
+        size = 0
+        if isinstance(destination, (str, os.PathLike)):
+            destination = os.fspath(destination)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(destination) or '.', prefix=f'.{os.path.basename(destination)}.', suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    for chunk in self.stream(chunk_size, **kwargs):
+                        size += f.write(chunk)
+                os.chmod(tmp_path, 0o644)
+                os.replace(tmp_path, destination)
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+        else:
+            for chunk in self.stream(chunk_size, **kwargs):
+                size += destination.write(chunk) or len(chunk)
+        return size
+
+    # Yields the records of a (large) JSON array response one at a time
+    def iter_json(self, records_key=None, chunk_size=64 * 1024, **kwargs):
+        yield from iter_json_array(self.stream(chunk_size, **kwargs), records_key)
+
+    def _get_page(self, path, params, timeout=None):
+        # timeout overrides the client's default for this request
+        kwargs = {'timeout': timeout} if timeout is not None else {}
+        data = self.make_request(path=path, params=params, **kwargs)
+        if data is None:
+            raise ConnectionError(f'Error fetching page {path} {params or ""}'.strip())
+        return data
+
+    def _relative_path(self, link):
+        if link.startswith(self.base_url):
+            return link[len(self.base_url):]
+        if link.startswith(('http://', 'https://')):
+            raise ValueError(f'Next link {link} is outside {self.base_url}')
+        return link
+
+    # Yields records from a paged endpoint, fetching up to prefetch pages ahead of the caller.
+    # offset pages are known up front and fetched concurrently, next_link and cursor pages depend on the
+    # previous page, so only the next page is fetched while the current one is consumed.
+    # offset paging ends on an empty page, or when the count at total_key (if the API reports one) is reached.
+    # timeout applies to each page request instead of the client's default
+    def paginate(self, path, pagination='next_link', records_key='items', params=None, page_size=100, prefetch=4,
+                 next_key='next', cursor_key='next_cursor', cursor_param='cursor', offset_param='offset', limit_param='limit', total_key='total',
+                 timeout=None):
+        if pagination not in ('next_link', 'offset', 'cursor'):
+            raise ValueError("Pagination must be one of 'next_link', 'offset' or 'cursor'")
+
+        def records(data):
+            return (lookup(data, records_key) if records_key else data) or []
+
+        executor = ThreadPoolExecutor(max_workers=max(1, prefetch), thread_name_prefix='api_page')
+        try:
+            if pagination == 'offset':
+                limit = page_size
+                next_offset = 0
+                probing = False
+                pending = deque()
+                while True:
+                    while len(pending) < (1 if probing else max(1, prefetch)):
+                        pending.append((next_offset, limit, executor.submit(self._get_page, path, (params or {}) | {offset_param: next_offset, limit_param: limit}, timeout)))
+                        next_offset += limit
+
+                    page_offset, page_limit, future = pending.popleft()
+                    data = future.result()
+                    page = records(data)
+                    yield from page
+
+                    total = lookup(data, total_key) if total_key and isinstance(data, dict) else None
+                    if not page or (total is not None and page_offset + len(page) >= total):
+                        return
+
+                    probing = len(page) < page_limit
+                    if probing:
+                        # Fewer records than asked for: either the last page or the server caps the limit. Pages
+                        # prefetched with the old step would skip records, so continue right after this page with
+                        # a single request using its length as the limit
+                        for _, _, prefetched in pending:
+                            prefetched.cancel()
+                        pending.clear()
+                        limit = len(page)
+                        next_offset = page_offset + limit
+            else:
+                future = executor.submit(self._get_page, path, params, timeout)
+                while future:
+                    data = future.result()
+                    future = None
+
+                    if pagination == 'next_link':
+                        link = lookup(data, next_key)
+                        if link:
+                            future = executor.submit(self._get_page, self._relative_path(link), None, timeout)
+                    else:
+                        cursor = lookup(data, cursor_key)
+                        if cursor:
+                            future = executor.submit(self._get_page, path, (params or {}) | {cursor_param: cursor}, timeout)
+
+                    yield from records(data)
+        finally:
+            # Abandoned iterators do not wait for pages nobody will read
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Looks up dotted keys, e.g. 'links.next', returning None when a part is missing
+def lookup(data, key):
+    for part in key.split('.'):
+        if not isinstance(data, dict):
+            return None
+        data = data.get(part)
+    return data
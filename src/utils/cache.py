@@ -0,0 +1,78 @@
+import time
+import logging
+import threading
+
+from collections import OrderedDict
+
+from utils.logging import cache_hit_counter, cache_miss_counter
+
+
+class QueryCache:
+    def __init__(self, ttl=60, max_entries=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.logger = logging.getLogger(__name__)
+
+        self._entries = OrderedDict()
+        self._key_locks = {}
+        self._lock = threading.Lock()
+
+    def _get_key_lock(self, key):
+        with self._lock:
+            if key not in self._key_locks:
+                self._key_locks[key] = threading.Lock()
+            return self._key_locks[key]
+
+    # Returns the cached value for key. Within the ttl the value is served as is, after the ttl the
+    # fingerprint (e.g. MAX(UpdateTimeStamp) and COUNT(*)) is checked and the loader only runs if it has changed.
+    # name is used as metric label, so keys built from query parameters do not create a series each
+    def get(self, key, loader, fingerprint=None, name=None):
+        name = name or str(key)
+        with self._get_key_lock(key):
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry:
+                    self._entries.move_to_end(key)
+            now = time.monotonic()
+
+            current_fingerprint = None
+            if entry:
+                if now - entry['checked'] < self.ttl:
+                    cache_hit_counter.labels(name).inc()
+                    return entry['value']
+
+                if fingerprint:
+                    current_fingerprint = fingerprint()
+                    if current_fingerprint is not None and current_fingerprint == entry['fingerprint']:
+                        entry['checked'] = now
+                        cache_hit_counter.labels(name).inc()
+                        return entry['value']
+            elif fingerprint:
+                current_fingerprint = fingerprint()
+
+            cache_miss_counter.labels(name).inc()
+
+            try:
+                value = loader()
+            except Exception as e:
+                if not entry:
+                    raise
+                self.logger.error(f"Error reloading '{key}', serving stale value: {e}")
+                return entry['value']
+
+            with self._lock:
+                self._entries[key] = {'value': value, 'fingerprint': current_fingerprint, 'checked': time.monotonic()}
+                self._entries.move_to_end(key)
+                # Least recently used entries are evicted first
+                while self.max_entries and len(self._entries) > self.max_entries:
+                    evicted_key, _ = self._entries.popitem(last=False)
+                    self._key_locks.pop(evicted_key, None)
+            return value
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+                self._key_locks.clear()
+            else:
+                self._entries.pop(key, None)
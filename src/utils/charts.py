@@ -0,0 +1,69 @@
+import threading
+import importlib
+
+from utils.timing import phase, timed
+
+
+SPACE_TYPES = ['UsedSpace_GB', 'FreeSpace_GB']
+GB_COLUMNS = ['UsedSpace_GB', 'FreeSpace_GB', 'TotalSize_GB']
+TABLE_COLUMNS = ['Drive', 'UsedSpace_GB', 'FreeSpace_GB', 'TotalSize_GB', 'ProcentageUsed']
+
+
+# altair is the slowest import of the dashboard, so it is imported on first use. preload() starts
+# the import in the background, so it overlaps with the first page loading its data
+def preload():
+    threading.Thread(target=importlib.import_module, args=('altair',), name='preload_altair', daemon=True).start()
+
+
+def space_chart(melted_df, title):
+    import altair as alt
+
+    return alt.Chart(melted_df).mark_bar().encode(
+        x=alt.X('Drive:N', title='Drive'),
+        y=alt.Y('sum(Space_GB):Q', title='Space (GB)'),
+        color=alt.Color('SpaceType:N',
+                        scale=alt.Scale(domain=SPACE_TYPES, range=['orange', 'green']),
+                        legend=alt.Legend(title="Space Type"))
+    ).properties(
+        title=title,
+        width=600,
+        height=400
+    )
+
+
+def percent_used_histogram(histogram_df):
+    import altair as alt
+
+    return alt.Chart(histogram_df).mark_bar(color='orange').encode(
+        x=alt.X('Bucket:N', title='Used', sort=None),
+        y=alt.Y('Drives:Q', title='Drives')
+    ).properties(
+        title='Drives by percentage used',
+        height=300
+    )
+
+
+def format_space_table(df):
+    table_df = df[['ComputerName'] + TABLE_COLUMNS].astype({'Drive': str})
+    for gb_col in GB_COLUMNS:
+        table_df[gb_col] = table_df[gb_col].map('{:,.2f} GB'.format)
+    table_df['ProcentageUsed'] = table_df['ProcentageUsed'].map('{:.2%}'.format)
+    return table_df
+
+
+# Builds the chart and table for every host in df in one pass: a single melt, a single formatting pass
+# and one groupby, instead of filtering the full frame once per host
+@timed('build_host_views', rows=len)
+def build_host_views(df):
+    melted_groups = dict(tuple(df.melt(id_vars=['ComputerName', 'Drive'], value_vars=SPACE_TYPES, var_name='SpaceType', value_name='Space_GB')
+                               .groupby('ComputerName', observed=True, sort=False)))
+    table_groups = dict(tuple(format_space_table(df).groupby('ComputerName', observed=True, sort=False)))
+    update_times = df.groupby('ComputerName', observed=True)['UpdateTimeStamp'].mean().dt.round('1s').dt.strftime('%d/%m-%Y %H:%M:%S')
+
+    # Hosts are rendered in the order they appear in df, which is the requested sort order
+    computers = df['ComputerName'].unique()
+    with phase('host_charts'):
+        charts = [space_chart(melted_groups[computer], f'{computer} - {update_times[computer]}') for computer in computers]
+    with phase('host_tables'):
+        tables = [table_groups[computer][TABLE_COLUMNS].to_html(index=False, border=0) for computer in computers]
+    return list(zip(computers, charts, tables))
@@ -8,12 +8,40 @@ load_dotenv()
 
 DEBUG = os.getenv('DEBUG', 'False') in ['True', 'true']
 PORT = os.getenv('PORT', '8080')
+# The dashboard serves its own metrics (query cache, connection pool, phase timings) on this port, Streamlit owns PORT
+METRICS_PORT = int(os.getenv('METRICS_PORT', '8000'))
 POD_NAME = os.getenv('POD_NAME', 'pod_name_not_set')
 
 DB_HOST = os.environ.get('DB_HOST')
 DB_USER = os.environ.get('DB_USER')
 DB_PASS = os.environ.get('DB_PASS')
 DB_NAME = os.environ.get('DB_NAME')
+DB_POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', '1'))
+DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', '5'))
+
+CACHE_TTL = int(os.getenv('CACHE_TTL', '60'))
+# Seconds re-fetched before the newest UpdateTimeStamp on every refresh, should cover the longest commit delay of the writers
+DISKSPACE_LOOKBACK = int(os.getenv('DISKSPACE_LOOKBACK', '900'))
+
+# Disk space history is only kept when a path (on an external mount) is set
+HISTORY_PATH = os.getenv('HISTORY_PATH')
+HISTORY_RESOLUTION = os.getenv('HISTORY_RESOLUTION', '1h')
+HISTORY_RETENTION_DAYS = int(os.getenv('HISTORY_RETENTION_DAYS', '90'))
+
+# When set the dashboard only reads the snapshot written here by collector.py
+SNAPSHOT_DIR = os.getenv('SNAPSHOT_DIR')
+COLLECT_INTERVAL = int(os.getenv('COLLECT_INTERVAL', '60'))
+EXPORT_INTERVAL = int(os.getenv('EXPORT_INTERVAL', '15'))
+
+# Disk space CSV drops ingested from SFTP by ingest.py, SFTP_KEY is a base64 encoded private key
+SFTP_HOST = os.environ.get('SFTP_HOST')
+SFTP_USER = os.environ.get('SFTP_USER')
+SFTP_PASS = os.environ.get('SFTP_PASS')
+SFTP_KEY = os.environ.get('SFTP_KEY')
+SFTP_KEY_PASS = os.environ.get('SFTP_KEY_PASS')
+INGEST_DIR = os.getenv('INGEST_DIR', '/')
+INGEST_STATE_PATH = os.getenv('INGEST_STATE_PATH')
+INGEST_INTERVAL = int(os.getenv('INGEST_INTERVAL', '300'))
 
 # DB_USER = os.environ["DB_USER"].strip()
 # DB_PASS = os.environ["DB_PASS"].strip()
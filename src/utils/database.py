@@ -1,38 +1,255 @@
-import pymssql
+import time
 import logging
+import pandas as pd
+
+from itertools import islice
+from contextlib import contextmanager
+from pandas.api.types import union_categoricals
+
+from utils.cache import QueryCache
+from utils.logging import db_query_duration_histogram, db_write_rows_counter, db_write_rows_per_s_gauge
+from utils.pool import ConnectionPool
 
 
 class DatabaseClient:
-    def __init__(self, database, username, password, host):
+    def __init__(self, database, username, password, host, pool_min_size=1, pool_max_size=5, pool_timeout=30):
         self.database = database
         self.username = username
         self.password = password
         self.host = host
         self.logger = logging.getLogger(__name__)
 
-        self.connection = None
-        self.cursor = None
+        self.pool = ConnectionPool(self._connect, name=str(database), min_size=pool_min_size, max_size=pool_max_size, timeout=pool_timeout)
+        self.pool.warm()
+
+        self._held_connection = None
+        self._held_cursor = None
+        self.statements = {}
+        self._statement_caches = {}
+
+    def _connect(self):
+        import pymssql
+
+        return pymssql.connect(host=self.host, user=self.username, password=self.password, database=self.database)
 
+    # Kept for existing callers: a connection checked out of the pool and held by the client until close(), so
+    # repeated calls share it. It is checked on every call and a broken one is replaced (with a new held cursor).
+    # New code should use connection() or cursor(), which return it to the pool
     def get_connection(self):
         try:
-            if not self.connection:
-                self.connection = pymssql.connect(host=self.host, user=self.username, password=self.password, database=self.database)
-            return self.connection
+            if self._held_connection and not self.pool.is_healthy(self._held_connection):
+                self.pool.release(self._held_connection, discard=True)
+                self._held_connection = None
+                self._held_cursor = None
+            if not self._held_connection:
+                self._held_connection = self.pool.acquire()
+            return self._held_connection
         except Exception as e:
             self.logger.error(f"Error connecting to database: {e}")
 
     def get_cursor(self):
         try:
-            if not self.cursor:
-                self.cursor = self.get_connection().cursor()
-            return self.cursor
+            connection = self.get_connection()
+            if not self._held_cursor:
+                self._held_cursor = connection.cursor()
+            return self._held_cursor
         except Exception as e:
             self.logger.error(f"Error getting cursor: {e}")
 
-    def execute_sql(self, sql):
+    def close(self):
+        if self._held_connection:
+            self.pool.release(self._held_connection, discard=True)
+            self._held_connection = None
+            self._held_cursor = None
+        self.pool.close()
+
+    def connection(self):
+        return self.pool.connection()
+
+    @contextmanager
+    def cursor(self):
+        with self.connection() as connection:
+            cursor = connection.cursor()
+            try:
+                yield cursor
+            finally:
+                cursor.close()
+
+    @contextmanager
+    def _execute(self, sql, params, name):
+        with self.cursor() as cur:
+            start = time.monotonic()
+            cur.execute(sql, params)
+            db_query_duration_histogram.labels(name, 'execute').observe(time.monotonic() - start)
+            yield cur
+
+    # Yields non empty batches, the time spent in fetchmany (not in the consumer) is recorded as fetch time
+    def _fetch(self, cur, batch_size, name):
+        fetch_time = 0
         try:
-            cur = self.get_cursor()
-            cur.execute(sql)
-            return cur.fetchall()
+            while True:
+                start = time.monotonic()
+                rows = cur.fetchmany(batch_size)
+                fetch_time += time.monotonic() - start
+                if not rows:
+                    break
+                yield rows
+        finally:
+            db_query_duration_histogram.labels(name, 'fetch').observe(fetch_time)
+
+    def _fetchall(self, sql, params, name):
+        with self._execute(sql, params, name) as cur:
+            start = time.monotonic()
+            rows = cur.fetchall()
+            db_query_duration_histogram.labels(name, 'fetch').observe(time.monotonic() - start)
+            return rows
+
+    def execute_sql(self, sql, params=None, name='adhoc'):
+        try:
+            return self._fetchall(sql, params, name)
         except Exception as e:
             self.logger.error(f"Error executing SQL: {e}")
+
+    # Yields lists of up to batch_size rows, only one batch is held in memory at a time
+    def stream(self, sql, params=None, batch_size=1000, name='adhoc'):
+        with self._execute(sql, params, name) as cur:
+            yield from self._fetch(cur, batch_size, name)
+
+    # Yields a DataFrame per batch, typed with dtypes (e.g. category/float32) so no chunk holds object columns
+    # for long. At least one, possibly empty, frame is yielded so the columns are always known.
+    def stream_frames(self, sql, params=None, batch_size=10000, dtypes=None, name='adhoc'):
+        with self._execute(sql, params, name) as cur:
+            columns = [column[0] for column in cur.description]
+            dtypes = {column: dtype for column, dtype in (dtypes or {}).items() if column in columns}
+
+            empty = True
+            for rows in self._fetch(cur, batch_size, name):
+                empty = False
+                yield pd.DataFrame.from_records(rows, columns=columns, coerce_float=True).astype(dtypes)
+            if empty:
+                yield pd.DataFrame.from_records([], columns=columns).astype(dtypes)
+
+    def read_frame(self, sql, params=None, batch_size=10000, dtypes=None, name='adhoc'):
+        frames = list(self.stream_frames(sql, params, batch_size, dtypes, name))
+        if len(frames) == 1:
+            return frames[0]
+
+        # Categories differ between chunks, union them instead of letting concat fall back to object
+        columns = {}
+        for column in frames[0].columns:
+            parts = [frame[column] for frame in frames]
+            if isinstance(parts[0].dtype, pd.CategoricalDtype):
+                columns[column] = pd.Series(union_categoricals(parts, ignore_order=True))
+            else:
+                columns[column] = pd.concat(parts, ignore_index=True)
+        return pd.DataFrame(columns)
+
+    # Named, reusable statements. Parameters are bound by pymssql (%s or %(name)s placeholders), results are
+    # cached per parameter set for cache_ttl seconds when set. Cached results are shared, do not modify them.
+    def prepare(self, name, sql, cache_ttl=None):
+        self.statements[name] = sql
+        if cache_ttl:
+            self._statement_caches[name] = QueryCache(ttl=cache_ttl, max_entries=1024)
+        else:
+            self._statement_caches.pop(name, None)
+
+    def _run_statement(self, name, key, run):
+        if name not in self.statements:
+            raise KeyError(f"Statement '{name}' has not been prepared")
+
+        def run_logged():
+            try:
+                return run(self.statements[name])
+            except Exception as e:
+                self.logger.error(f"Error executing statement '{name}': {e}")
+                raise
+
+        cache = self._statement_caches.get(name)
+        if cache:
+            return cache.get(key, run_logged, name=f'statement:{name}')
+        return run_logged()
+
+    def query(self, name, params=None):
+        return self._run_statement(name, ('rows', params_key(params)), lambda sql: self._fetchall(sql, params, name))
+
+    def query_frame(self, name, params=None, dtypes=None, batch_size=10000):
+        key = ('frame', params_key(params), params_key(dtypes))
+        return self._run_statement(name, key, lambda sql: self.read_frame(sql, params, batch_size, dtypes, name))
+
+    # Executes the statement built by batch_sql for every batch of up to batch_size rows. Pass a cursor to write
+    # as part of a larger transaction, otherwise all batches are written in one transaction
+    def _write_batches(self, batch_sql, rows, batch_size, cursor, name):
+        def write(cur):
+            count = 0
+            start = time.monotonic()
+            rows_iterator = iter(rows)
+            while True:
+                batch = list(islice(rows_iterator, batch_size))
+                if not batch:
+                    break
+
+                sql, batch = batch_sql(batch)
+                execute_start = time.monotonic()
+                cur.execute(sql, tuple(value for row in batch for value in row))
+                db_query_duration_histogram.labels(name, 'execute').observe(time.monotonic() - execute_start)
+                count += len(batch)
+
+            duration = time.monotonic() - start
+            db_write_rows_counter.labels(name).inc(count)
+            db_write_rows_per_s_gauge.labels(name).set(count / duration if duration else 0)
+            self.logger.debug(f"Wrote {count} rows with '{name}' in {duration:.2f}s")
+            return count
+
+        if cursor is not None:
+            return write(cursor)
+        with self.cursor() as cur:
+            return write(cur)
+
+    # Inserts a DataFrame or rows (tuples or dicts) with multi row INSERT ... VALUES statements of up to
+    # batch_size rows (1000 is the MSSQL maximum)
+    def insert_many(self, table, columns, rows, batch_size=1000, cursor=None, name=None):
+        row_sql = '(' + ', '.join(['%s'] * len(columns)) + ')'
+
+        def batch_sql(batch):
+            return f"INSERT INTO {table} ({', '.join(columns)}) VALUES " + ', '.join([row_sql] * len(batch)), batch
+
+        return self._write_batches(batch_sql, to_rows(rows, columns), batch_size, cursor, name or f'insert_{table}')
+
+    # Inserts or updates rows by key_columns with one MERGE per batch. Rows with the same key in a batch would make
+    # the MERGE fail, the last one is kept. With newer_column (e.g. UpdateTimeStamp) existing rows are only updated
+    # by rows with a newer value, so replaying old data does not overwrite newer data
+    def upsert_many(self, table, columns, rows, key_columns, batch_size=1000, cursor=None, name=None, newer_column=None):
+        row_sql = '(' + ', '.join(['%s'] * len(columns)) + ')'
+        key_indexes = [columns.index(column) for column in key_columns]
+        update_columns = [column for column in columns if column not in key_columns]
+
+        on_sql = ' AND '.join(f'target.{column} = source.{column}' for column in key_columns)
+        matched_sql = f'WHEN MATCHED AND (target.{newer_column} IS NULL OR source.{newer_column} > target.{newer_column})' if newer_column else 'WHEN MATCHED'
+        update_sql = f"{matched_sql} THEN UPDATE SET {', '.join(f'target.{column} = source.{column}' for column in update_columns)} " if update_columns else ''
+        insert_sql = f"WHEN NOT MATCHED THEN INSERT ({', '.join(columns)}) VALUES ({', '.join(f'source.{column}' for column in columns)});"
+
+        def batch_sql(batch):
+            batch = list({tuple(row[i] for i in key_indexes): row for row in batch}.values())
+            sql = (f"MERGE INTO {table} WITH (HOLDLOCK) AS target USING (VALUES {', '.join([row_sql] * len(batch))}) "
+                   f"AS source ({', '.join(columns)}) ON {on_sql} {update_sql}{insert_sql}")
+            return sql, batch
+
+        return self._write_batches(batch_sql, to_rows(rows, columns), batch_size, cursor, name or f'upsert_{table}')
+
+
+def params_key(params):
+    if params is None:
+        return ()
+    if isinstance(params, dict):
+        return tuple(sorted((key, str(value)) for key, value in params.items()))
+    if isinstance(params, (list, tuple)):
+        return tuple(params)
+    return (params,)
+
+
+# Rows as tuples in column order, from a DataFrame (missing values as None), dicts or sequences
+def to_rows(rows, columns):
+    if isinstance(rows, pd.DataFrame):
+        frame = rows[columns].astype(object)
+        return frame.where(frame.notna(), None).itertuples(index=False, name=None)
+    return (tuple(row[column] for column in columns) if isinstance(row, dict) else tuple(row) for row in rows)
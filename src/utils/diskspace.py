@@ -0,0 +1,253 @@
+import logging
+import threading
+import numpy as np
+import pandas as pd
+
+from utils.timing import timed
+
+
+DISKSPACE_SQL = "SELECT * FROM DiskSpace"
+# The checksum changes when rows are updated in place without a newer UpdateTimeStamp than MAX(UpdateTimeStamp),
+# e.g. by ingest.py merging an older CSV drop, which MAX and COUNT alone do not show
+FINGERPRINT_SQL = """SELECT MAX(UpdateTimeStamp), COUNT(*),
+    CHECKSUM_AGG(BINARY_CHECKSUM(ComputerName, Drive, TotalSize_GB, FreeSpace_GB, UpdateTimeStamp))
+FROM DiskSpace"""
+
+# Only the columns the dashboard uses, with used space and percentage computed by MSSQL.
+# REAL is 4 bytes on the wire and maps directly to float32.
+SUMMARY_SQL = """SELECT ComputerName, Drive,
+    CAST(TotalSize_GB AS real) AS TotalSize_GB,
+    CAST(FreeSpace_GB AS real) AS FreeSpace_GB,
+    CAST(CAST(TotalSize_GB AS float) - CAST(FreeSpace_GB AS float) AS real) AS UsedSpace_GB,
+    CAST((CAST(TotalSize_GB AS float) - CAST(FreeSpace_GB AS float)) / NULLIF(CAST(TotalSize_GB AS float), 0) AS real) AS ProcentageUsed,
+    UpdateTimeStamp
+FROM DiskSpace"""
+
+SUMMARY_DTYPES = {
+    'ComputerName': 'category',
+    'Drive': 'category',
+    'TotalSize_GB': 'float32',
+    'FreeSpace_GB': 'float32',
+    'UsedSpace_GB': 'float32',
+    'ProcentageUsed': 'float32'
+}
+
+KEY_COLUMNS = ['ComputerName', 'Drive']
+
+DRIVES_SQL = "SELECT DISTINCT Drive FROM DiskSpace ORDER BY Drive"
+
+HOST_ORDERS = {
+    'name': 'ComputerName',
+    'fullest': 'MAX(ProcentageUsed) DESC, ComputerName'
+}
+
+# Filters and pages on hosts, so a host's drives are never split across pages.
+# HostCount is the number of matching hosts before paging.
+PAGE_SQL = """WITH summary AS ({summary_sql}),
+filtered AS (SELECT * FROM summary{where}),
+hosts AS (
+    SELECT ComputerName, ROW_NUMBER() OVER (ORDER BY {order}) AS HostOrder, COUNT(*) OVER () AS HostCount
+    FROM filtered
+    GROUP BY ComputerName
+    ORDER BY {order}
+    OFFSET %s ROWS FETCH NEXT %s ROWS ONLY
+)
+SELECT filtered.*, hosts.HostCount
+FROM filtered
+JOIN hosts ON hosts.ComputerName = filtered.ComputerName
+ORDER BY hosts.HostOrder, filtered.Drive"""
+
+
+def derive_diskspace(df):
+    df['TotalSize_GB'] = pd.to_numeric(df['TotalSize_GB'])
+    df['FreeSpace_GB'] = pd.to_numeric(df['FreeSpace_GB'])
+    df['UsedSpace_GB'] = df['TotalSize_GB'] - df['FreeSpace_GB']
+    df['ProcentageUsed'] = df['UsedSpace_GB'] / df['TotalSize_GB']
+    return df
+
+
+def typed_diskspace(df):
+    return df.astype(SUMMARY_DTYPES)
+
+
+@timed('load_diskspace', rows=len)
+def load_diskspace(db_client, summary=False, since=None):
+    sql = SUMMARY_SQL if summary else DISKSPACE_SQL
+    params = None
+    if since is not None:
+        sql += " WHERE UpdateTimeStamp >= %s"
+        params = (since,)
+
+    if summary:
+        name = 'diskspace_summary' if since is None else 'diskspace_changes'
+        return typed_diskspace(db_client.read_frame(sql, params, dtypes=SUMMARY_DTYPES, name=name))
+
+    with db_client.connection() as conn:
+        return derive_diskspace(pd.read_sql(sql, conn, params=params))
+
+
+def escape_like(value):
+    return value.replace('[', '[[]').replace('%', '[%]').replace('_', '[_]')
+
+
+def build_page_query(page=1, page_size=25, search=None, min_percent_used=None, drive=None, stale_before=None, order_by='name'):
+    if order_by not in HOST_ORDERS:
+        raise ValueError(f'order_by must be one of {list(HOST_ORDERS)}')
+
+    conditions = []
+    params = []
+
+    if search:
+        conditions.append('ComputerName LIKE %s')
+        params.append(f'%{escape_like(search)}%')
+    if min_percent_used:
+        conditions.append('ProcentageUsed >= %s')
+        params.append(min_percent_used)
+    if drive:
+        conditions.append('Drive = %s')
+        params.append(drive)
+    if stale_before is not None:
+        conditions.append('UpdateTimeStamp < %s')
+        params.append(stale_before)
+
+    where = ' WHERE ' + ' AND '.join(conditions) if conditions else ''
+    params += [(page - 1) * page_size, page_size]
+
+    return PAGE_SQL.format(summary_sql=SUMMARY_SQL, where=where, order=HOST_ORDERS[order_by]), tuple(params)
+
+
+@timed('load_diskspace_page', rows=lambda result: len(result[0]))
+def load_diskspace_page(db_client, page=1, page_size=25, **filters):
+    sql, params = build_page_query(page, page_size, **filters)
+
+    df = db_client.read_frame(sql, params, dtypes=SUMMARY_DTYPES, name='diskspace_page')
+
+    host_count = int(df['HostCount'].iloc[0]) if not df.empty else 0
+    return typed_diskspace(df.drop(columns=['HostCount'])), host_count
+
+
+def load_drives(db_client):
+    res = db_client.execute_sql(DRIVES_SQL, name='diskspace_drives')
+    return [row[0] for row in res] if res else []
+
+
+def host_names(df):
+    return sorted(df['ComputerName'].unique())
+
+
+# In memory equivalents of the page query, used when serving from a snapshot
+def filter_diskspace(df, search=None, min_percent_used=None, drive=None, stale_before=None):
+    mask = pd.Series(True, index=df.index)
+    if search:
+        mask &= df['ComputerName'].str.contains(search, case=False, regex=False)
+    if min_percent_used:
+        mask &= df['ProcentageUsed'] >= min_percent_used
+    if drive:
+        mask &= df['Drive'] == drive
+    if stale_before is not None:
+        mask &= df['UpdateTimeStamp'] < stale_before
+    return df[mask]
+
+
+@timed('page_diskspace', rows=lambda result: len(result[0]))
+def page_diskspace(df, page=1, page_size=25, order_by='name', **filters):
+    if order_by not in HOST_ORDERS:
+        raise ValueError(f'order_by must be one of {list(HOST_ORDERS)}')
+
+    df = filter_diskspace(df, **filters)
+
+    if order_by == 'fullest':
+        fullest = df.groupby('ComputerName', observed=True)['ProcentageUsed'].max().reset_index()
+        hosts = fullest.sort_values(['ProcentageUsed', 'ComputerName'], ascending=[False, True])['ComputerName'].tolist()
+    else:
+        hosts = host_names(df)
+
+    visible_hosts = hosts[(page - 1) * page_size:page * page_size]
+    host_order = df['ComputerName'].map({host: i for i, host in enumerate(visible_hosts)}).astype('float64')
+    page_df = df.assign(HostOrder=host_order).dropna(subset=['HostOrder']).sort_values(['HostOrder', 'Drive'])
+    return page_df.drop(columns='HostOrder'), len(hosts)
+
+
+# Computed once per data refresh and cached, so the overview does not touch the full frame on reruns
+@timed('summarize_fleet', rows=lambda result: result['drive_count'])
+def summarize_fleet(df, top_n=20, bins=10):
+    total_gb = float(df['TotalSize_GB'].to_numpy(dtype='float64').sum())
+    free_gb = float(df['FreeSpace_GB'].to_numpy(dtype='float64').sum())
+
+    counts, edges = np.histogram(np.clip(df['ProcentageUsed'].dropna().to_numpy(), 0, 1), bins=bins, range=(0, 1))
+    histogram = pd.DataFrame({
+        'Bucket': [f'{lower:.0%}-{upper:.0%}' for lower, upper in zip(edges[:-1], edges[1:])],
+        'Drives': counts
+    })
+
+    top_drives = df.nlargest(top_n, 'ProcentageUsed')[['ComputerName', 'Drive', 'UsedSpace_GB', 'FreeSpace_GB', 'TotalSize_GB', 'ProcentageUsed', 'UpdateTimeStamp']]
+
+    return {
+        'host_count': int(df['ComputerName'].nunique()),
+        'drive_count': len(df),
+        'total_gb': total_gb,
+        'free_gb': free_gb,
+        'used_gb': total_gb - free_gb,
+        'percent_used': (total_gb - free_gb) / total_gb if total_gb else 0.0,
+        'top_drives': top_drives.reset_index(drop=True),
+        'histogram': histogram
+    }
+
+
+def diskspace_fingerprint(db_client):
+    res = db_client.execute_sql(FINGERPRINT_SQL, name='diskspace_fingerprint')
+    if not res:
+        return None
+    return tuple(res[0])
+
+
+# Keeps the DiskSpace frame current by fetching rows changed since the newest UpdateTimeStamp it has seen.
+# Rows committed late with an earlier timestamp are caught by re-fetching the last lookback seconds every time
+class IncrementalLoader:
+    def __init__(self, db_client, summary=False, lookback=900):
+        self.db_client = db_client
+        self.summary = summary
+        self.lookback = lookback
+        self.logger = logging.getLogger(__name__)
+
+        self.df = None
+        self.watermark = None
+        self.last_fingerprint = None
+        self.loaded_fingerprint = None
+        self._lock = threading.Lock()
+
+    def fingerprint(self):
+        self.last_fingerprint = diskspace_fingerprint(self.db_client)
+        return self.last_fingerprint
+
+    def load(self):
+        with self._lock:
+            if self.df is None or self.watermark is None:
+                df = load_diskspace(self.db_client, self.summary)
+            else:
+                since = self.watermark - pd.Timedelta(seconds=self.lookback)
+                changed_df = load_diskspace(self.db_client, self.summary, since=since)
+                self.logger.debug(f"Fetched {len(changed_df)} changed rows since {since}")
+
+                if changed_df.empty:
+                    df = self.df
+                else:
+                    # Concatenating categoricals with different categories falls back to object, so retype
+                    df = pd.concat([self.df, changed_df], ignore_index=True)
+                    if self.summary:
+                        df = typed_diskspace(df)
+                    df = df.drop_duplicates(subset=KEY_COLUMNS, keep='last').sort_values(KEY_COLUMNS, ignore_index=True)
+
+                # Rows deleted from DiskSpace do not move the watermark, the row count catches them. Rows updated
+                # in place below the watermark only change the checksum
+                if self.last_fingerprint and len(df) != self.last_fingerprint[1]:
+                    self.logger.info(f"Row count changed ({len(df)} != {self.last_fingerprint[1]}), doing a full reload")
+                    df = load_diskspace(self.db_client, self.summary)
+                elif self.loaded_fingerprint and self.last_fingerprint and self.last_fingerprint[0] == self.loaded_fingerprint[0] and self.last_fingerprint != self.loaded_fingerprint:
+                    self.logger.info("Rows changed without a newer UpdateTimeStamp, doing a full reload")
+                    df = load_diskspace(self.db_client, self.summary)
+
+            self.df = df
+            self.watermark = df['UpdateTimeStamp'].max() if not df.empty else None
+            self.loaded_fingerprint = self.last_fingerprint
+            return df
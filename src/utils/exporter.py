@@ -0,0 +1,62 @@
+import logging
+import threading
+import numpy as np
+
+from utils.logging import disk_total_bytes_gauge, disk_free_bytes_gauge, disk_used_ratio_gauge
+from utils.snapshot import read_snapshot, snapshot_fingerprint
+
+
+BYTES_PER_GB = 1024 ** 3
+
+
+# Sets a group of gauges sharing the same labels and removes label sets that are no longer reported,
+# so series for hosts that disappear do not live on forever
+class LabelledGauges:
+    def __init__(self, *gauges):
+        self.gauges = gauges
+        self.labels = set()
+        self._lock = threading.Lock()
+
+    def update(self, rows):
+        with self._lock:
+            labels = set()
+            for row_labels, values in rows:
+                for gauge, value in zip(self.gauges, values):
+                    gauge.labels(*row_labels).set(value)
+                labels.add(row_labels)
+
+            for stale in self.labels - labels:
+                for gauge in self.gauges:
+                    gauge.remove(*stale)
+            self.labels = labels
+
+
+class DiskMetricsExporter:
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+
+        self.gauges = LabelledGauges(disk_total_bytes_gauge, disk_free_bytes_gauge, disk_used_ratio_gauge)
+        self.last_fingerprint = None
+
+    def update(self, df):
+        total = df['TotalSize_GB'].to_numpy(dtype='float64') * BYTES_PER_GB
+        free = df['FreeSpace_GB'].to_numpy(dtype='float64') * BYTES_PER_GB
+        with np.errstate(divide='ignore', invalid='ignore'):
+            used_ratio = np.where(total > 0, (total - free) / total, np.nan)
+
+        labels = zip(df['ComputerName'].astype(str), df['Drive'].astype(str))
+        self.gauges.update(zip(labels, zip(total, free, used_ratio)))
+
+    # Reads the snapshot only when it has changed, scrapes are always served from the gauges
+    def refresh(self, snapshot_path):
+        fingerprint = snapshot_fingerprint(snapshot_path)
+        if fingerprint is None or fingerprint == self.last_fingerprint:
+            return False
+
+        try:
+            self.update(read_snapshot(snapshot_path))
+            self.last_fingerprint = fingerprint
+            return True
+        except Exception as e:
+            self.logger.error(f'Error exporting disk metrics from {snapshot_path}: {e}')
+            return False
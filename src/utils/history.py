@@ -0,0 +1,206 @@
+import os
+import logging
+import threading
+import numpy as np
+import pandas as pd
+
+from utils.logging import disk_days_until_full_gauge
+from utils.exporter import LabelledGauges
+from utils.snapshot import write_snapshot
+
+
+HISTORY_COLUMNS = ['ComputerName', 'Drive', 'TotalSize_GB', 'FreeSpace_GB', 'UsedSpace_GB', 'UpdateTimeStamp']
+HISTORY_DTYPES = {
+    'ComputerName': 'category',
+    'Drive': 'category',
+    'TotalSize_GB': 'float32',
+    'FreeSpace_GB': 'float32',
+    'UsedSpace_GB': 'float32'
+}
+KEY_COLUMNS = ['ComputerName', 'Drive']
+
+
+# History is kept as one Parquet file per bucket in the directory at path, so an append only rewrites the
+# current bucket. Older buckets are downsampled and expired when a new bucket is started, not on every append
+class HistoryStore:
+    def __init__(self, path, resolution='1h', retention_days=90, downsample_after_days=7, downsample_resolution='1D'):
+        self.path = path
+        self.resolution = resolution
+        self.retention_days = retention_days
+        self.downsample_after_days = downsample_after_days
+        self.downsample_resolution = downsample_resolution
+        self.logger = logging.getLogger(__name__)
+
+        self._lock = threading.Lock()
+        # path -> ((mtime, size), frame), so reads only load bucket files that changed since the last read
+        self._frames = {}
+
+    def _bucket_path(self, kind, bucket):
+        return os.path.join(self.path, f"{kind}-{bucket.strftime('%Y%m%dT%H%M%S')}.parquet")
+
+    # (kind, bucket start, path) for every bucket file, oldest first. kind is 'r' for resolution buckets and 'd' for downsampled ones
+    def _bucket_files(self):
+        if not os.path.isdir(self.path):
+            return []
+        files = []
+        for file_name in os.listdir(self.path):
+            if file_name.endswith('.parquet'):
+                kind, bucket = file_name[:-len('.parquet')].split('-', 1)
+                files.append((kind, pd.Timestamp(bucket), os.path.join(self.path, file_name)))
+        return sorted(files, key=lambda file: file[1])
+
+    def _empty(self):
+        return pd.DataFrame({column: pd.Series(dtype=HISTORY_DTYPES.get(column, 'datetime64[ns]')) for column in HISTORY_COLUMNS})
+
+    def _read_files(self, paths):
+        frames = [pd.read_parquet(path) for path in paths]
+        return pd.concat(frames, ignore_index=True) if frames else self._empty()
+
+    def _read_cached(self, path):
+        stat = os.stat(path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        cached = self._frames.get(path)
+        if cached is None or cached[0] != signature:
+            cached = (signature, pd.read_parquet(path))
+            self._frames[path] = cached
+        return cached[1]
+
+    def read(self):
+        paths = [path for _, _, path in self._bucket_files()]
+        self._frames = {path: self._frames[path] for path in paths if path in self._frames}
+        frames = []
+        for path in paths:
+            # Another writer may have merged or expired the file since it was listed
+            try:
+                frames.append(self._read_cached(path))
+            except FileNotFoundError:
+                pass
+
+        history = pd.concat(frames, ignore_index=True) if frames else self._empty()
+        return history.astype(HISTORY_DTYPES).sort_values('UpdateTimeStamp', kind='stable', ignore_index=True)
+
+    # Keeps one point per drive per resolution bucket, one per downsample_resolution bucket once older than
+    # downsample_after_days, and drops points older than retention_days
+    def compact(self, history, now=None):
+        now = pd.Timestamp.now() if now is None else now
+        history = history[history['UpdateTimeStamp'] >= now - pd.Timedelta(days=self.retention_days)]
+
+        old = history['UpdateTimeStamp'] < now - pd.Timedelta(days=self.downsample_after_days)
+        bucket = history['UpdateTimeStamp'].dt.floor(self.resolution).where(~old, history['UpdateTimeStamp'].dt.floor(self.downsample_resolution))
+
+        history = history.assign(Bucket=bucket).sort_values('UpdateTimeStamp')
+        history = history.drop_duplicates(subset=KEY_COLUMNS + ['Bucket'], keep='last').drop(columns='Bucket')
+        return history.astype(HISTORY_DTYPES).reset_index(drop=True)
+
+    # Merges resolution buckets older than downsample_after_days into downsample_resolution buckets and
+    # deletes buckets that are entirely older than retention_days
+    def _maintain(self, now):
+        downsample_before = now - pd.Timedelta(days=self.downsample_after_days)
+        expire_before = now - pd.Timedelta(days=self.retention_days)
+
+        groups = {}
+        for kind, bucket, path in self._bucket_files():
+            if kind == 'r' and bucket + pd.Timedelta(self.resolution) <= downsample_before:
+                groups.setdefault(bucket.floor(self.downsample_resolution), []).append(path)
+
+        for bucket, paths in groups.items():
+            target_path = self._bucket_path('d', bucket)
+            sources = paths + ([target_path] if os.path.exists(target_path) else [])
+            write_snapshot(self.compact(self._read_files(sources), now), target_path)
+            for path in paths:
+                os.remove(path)
+
+        for kind, bucket, path in self._bucket_files():
+            step = self.resolution if kind == 'r' else self.downsample_resolution
+            if bucket + pd.Timedelta(step) <= expire_before:
+                os.remove(path)
+
+    # A history written by earlier versions as a single Parquet file at path is split into bucket files
+    def _migrate(self, now):
+        legacy = pd.read_parquet(self.path).astype({'ComputerName': str, 'Drive': str})
+        os.replace(self.path, f'{self.path}.legacy')
+        os.makedirs(self.path)
+        self._write_buckets(self.compact(legacy, now))
+        os.remove(f'{self.path}.legacy')
+        self.logger.info(f'Migrated history at {self.path} to bucket files')
+
+    # Writes df into its resolution buckets, keeping the last point per drive. Returns True if a bucket was started
+    def _write_buckets(self, df):
+        started = False
+        buckets = df['UpdateTimeStamp'].dt.floor(self.resolution)
+        for bucket, bucket_df in df.groupby(buckets, sort=True):
+            path = self._bucket_path('r', bucket)
+            if os.path.exists(path):
+                bucket_df = pd.concat([self._read_files([path]), bucket_df], ignore_index=True)
+            else:
+                started = True
+            bucket_df = bucket_df.sort_values('UpdateTimeStamp', kind='stable').drop_duplicates(subset=KEY_COLUMNS, keep='last')
+            write_snapshot(bucket_df.astype(HISTORY_DTYPES), path)
+        return started
+
+    def append(self, df, now=None):
+        now = pd.Timestamp.now() if now is None else now
+        with self._lock:
+            if os.path.isfile(self.path):
+                self._migrate(now)
+            os.makedirs(self.path, exist_ok=True)
+
+            if self._write_buckets(df[HISTORY_COLUMNS].astype({'ComputerName': str, 'Drive': str})):
+                try:
+                    self._maintain(now)
+                except FileNotFoundError as e:
+                    self.logger.warning(f'History at {self.path} was maintained by another writer: {e}')
+
+            history = self.read()
+            self.logger.debug(f'History at {self.path} has {len(history)} points')
+            return history
+
+
+# Least squares fit of used space over time for every drive at once, using per drive sums (np.bincount)
+# instead of a fit per drive. Drives with fewer than min_points points or no growth get inf days.
+def forecast_days_until_full(history, min_points=3):
+    if history.empty:
+        return pd.DataFrame({
+            'ComputerName': pd.Series(dtype='category'), 'Drive': pd.Series(dtype='category'),
+            'FreeSpace_GB': pd.Series(dtype='float64'), 'Growth_GB_per_day': pd.Series(dtype='float64'), 'DaysUntilFull': pd.Series(dtype='float64')
+        })
+
+    history = history.sort_values('UpdateTimeStamp')
+    groups = history.groupby(KEY_COLUMNS, observed=True, sort=True)
+    codes = groups.ngroup().to_numpy()
+
+    timestamps = history['UpdateTimeStamp'].to_numpy(dtype='datetime64[ns]')
+    x = (timestamps - timestamps.min()) / np.timedelta64(1, 'D')
+    y = history['UsedSpace_GB'].to_numpy(dtype='float64')
+
+    n = np.bincount(codes).astype('float64')
+    sum_x = np.bincount(codes, weights=x)
+    sum_y = np.bincount(codes, weights=y)
+    sum_xx = np.bincount(codes, weights=x * x)
+    sum_xy = np.bincount(codes, weights=x * y)
+
+    denominator = n * sum_xx - sum_x * sum_x
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = np.where((n >= min_points) & (denominator > 0), (n * sum_xy - sum_x * sum_y) / denominator, np.nan)
+
+    latest = groups.last()
+    free = latest['FreeSpace_GB'].to_numpy(dtype='float64')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        days = np.where(slope > 0, free / slope, np.inf)
+
+    return pd.DataFrame({
+        'FreeSpace_GB': free,
+        'Growth_GB_per_day': slope,
+        'DaysUntilFull': days
+    }, index=latest.index).reset_index()
+
+
+_forecast_gauges = LabelledGauges(disk_days_until_full_gauge)
+
+
+def export_forecast(forecast_df):
+    finite = np.isfinite(forecast_df['DaysUntilFull'].to_numpy(dtype='float64'))
+    forecast_df = forecast_df[finite]
+
+    labels = zip(forecast_df['ComputerName'].astype(str), forecast_df['Drive'].astype(str))
+    _forecast_gauges.update(zip(labels, zip(forecast_df['DaysUntilFull'])))
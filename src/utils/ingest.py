@@ -0,0 +1,161 @@
+import io
+import os
+import json
+import stat
+import time
+import fnmatch
+import itertools
+import logging
+import posixpath
+import pandas as pd
+
+from utils.diskspace import KEY_COLUMNS
+from utils.logging import ingest_files_counter, ingest_rows_counter, ingest_throughput_gauge, ingest_lag_gauge
+
+
+DISKSPACE_COLUMNS = ['ComputerName', 'Drive', 'TotalSize_GB', 'FreeSpace_GB', 'UpdateTimeStamp']
+SFTP_REQUEST_SIZE = 32768
+
+
+# Reads a remote file one window at a time. Each window is fetched with pipelined requests (readv), and the next
+# one is only requested once the current one has been consumed, so at most one window of the file is buffered
+# however slow the reader is. Plain prefetch() keeps every completed read until it is consumed
+class _WindowedReader(io.RawIOBase):
+    def __init__(self, f, size, window, max_requests):
+        self.f = f
+        self.size = size
+        self.window = window
+        self.max_requests = max_requests
+        self.offset = 0
+        self.buffer = memoryview(b'')
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        if not self.buffer:
+            if self.offset >= self.size:
+                return 0
+            length = min(self.window, self.size - self.offset)
+            data = b''.join(self.f.readv([(self.offset, length)], max_concurrent_prefetch_requests=self.max_requests))
+            if not data:
+                return 0
+            self.offset += len(data)
+            self.buffer = memoryview(data)
+
+        n = min(len(b), len(self.buffer))
+        b[:n] = self.buffer[:n]
+        self.buffer = self.buffer[n:]
+        return n
+
+
+# Remembers ingested files by modification time and size, so a file is ingested again only when it changes
+class SeenFiles:
+    def __init__(self, path=None):
+        self.path = path
+        self.logger = logging.getLogger(__name__)
+
+        self.files = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path) as f:
+                    self.files = json.load(f)
+            except Exception as e:
+                self.logger.error(f'Error reading ingest state from {path}: {e}')
+
+    def is_new(self, remote_path, mtime, size):
+        return self.files.get(remote_path) != [mtime, size]
+
+    def mark(self, remote_path, mtime, size):
+        self.files[remote_path] = [mtime, size]
+        if self.path:
+            tmp_path = f'{self.path}.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(self.files, f)
+            os.replace(tmp_path, self.path)
+
+
+# Ingests disk space CSV drops from an SFTP directory into DiskSpace. Files are parsed in chunks straight from
+# the SFTP stream and each file is upserted on ComputerName and Drive in a single transaction, so a failed
+# file is retried as a whole and a changed file replaces its earlier rows.
+# The transaction stays open while the rest of the file is read, so the key range locks taken by the MERGE
+# (HOLDLOCK) are held for the transfer time of the file. Keep drops small or chunk_size large to limit that
+class CSVIngester:
+    def __init__(self, sftp_client, db_client, remote_dir, seen_files=None, pattern='*.csv', chunk_size=10000, column_map=None, settle_time=60, table='DiskSpace', max_requests=16):
+        self.sftp_client = sftp_client
+        self.db_client = db_client
+        self.remote_dir = remote_dir
+        self.seen_files = seen_files or SeenFiles()
+        self.pattern = pattern
+        self.chunk_size = chunk_size
+        self.column_map = column_map or {}
+        # Files modified within settle_time seconds may still be being written and are left for the next run
+        self.settle_time = settle_time
+        self.table = table
+        # Reads in flight ahead of pandas (32 KB each). A file is read in windows of max_requests reads, which bounds
+        # the memory buffered per file to about max_requests * 32 KB
+        self.max_requests = max_requests
+        self.logger = logging.getLogger(__name__)
+
+        self.source = f'sftp://{sftp_client.host}{remote_dir}'
+
+    def list_new(self):
+        with self.sftp_client.session() as connection:
+            attrs = connection.sftp_client.listdir_attr(self.remote_dir)
+
+        settled_before = time.time() - self.settle_time
+        new_files = [attr for attr in attrs if self._is_new(attr, settled_before)]
+        return sorted(new_files, key=lambda attr: attr.st_mtime)
+
+    def _is_new(self, attr, settled_before):
+        if not stat.S_ISREG(attr.st_mode) or not fnmatch.fnmatch(attr.filename, self.pattern):
+            return False
+        if attr.st_mtime > settled_before:
+            return False
+        return self.seen_files.is_new(posixpath.join(self.remote_dir, attr.filename), attr.st_mtime, attr.st_size)
+
+    def _prepare(self, chunk, mtime):
+        chunk = chunk.rename(columns=self.column_map)
+        if 'UpdateTimeStamp' not in chunk.columns:
+            chunk['UpdateTimeStamp'] = pd.Timestamp.fromtimestamp(mtime)
+        else:
+            chunk['UpdateTimeStamp'] = pd.to_datetime(chunk['UpdateTimeStamp'])
+
+        return chunk[DISKSPACE_COLUMNS]
+
+    def ingest_file(self, attr):
+        remote_path = posixpath.join(self.remote_dir, attr.filename)
+        start = time.monotonic()
+        rows = 0
+
+        with self.sftp_client.session() as connection:
+            with connection.sftp_client.open(remote_path, 'rb') as f:
+                reader = io.BufferedReader(_WindowedReader(f, attr.st_size, self.max_requests * SFTP_REQUEST_SIZE, self.max_requests))
+                chunks = (self._prepare(chunk, attr.st_mtime) for chunk in pd.read_csv(reader, chunksize=self.chunk_size))
+
+                # The first chunk is parsed before the transaction is opened, so files that can not be parsed take no locks
+                first_chunk = next(chunks, None)
+                if first_chunk is not None:
+                    with self.db_client.cursor() as cur:
+                        for chunk in itertools.chain([first_chunk], chunks):
+                            rows += self.db_client.upsert_many(self.table, DISKSPACE_COLUMNS, chunk, KEY_COLUMNS, cursor=cur, name='ingest_diskspace', newer_column='UpdateTimeStamp')
+
+        duration = time.monotonic() - start
+        ingest_rows_counter.labels(self.source).inc(rows)
+        ingest_throughput_gauge.labels(self.source).set(rows / duration if duration else 0)
+        ingest_lag_gauge.labels(self.source).set(time.time() - attr.st_mtime)
+
+        self.seen_files.mark(remote_path, attr.st_mtime, attr.st_size)
+        self.logger.info(f'Ingested {rows} rows from {remote_path} in {duration:.2f}s')
+        return rows
+
+    def run_once(self):
+        rows = 0
+        for attr in self.list_new():
+            try:
+                rows += self.ingest_file(attr)
+                ingest_files_counter.labels(self.source, 'success').inc()
+            except Exception as e:
+                ingest_files_counter.labels(self.source, 'failure').inc()
+                self.logger.error(f'Error ingesting {posixpath.join(self.remote_dir, attr.filename)}: {e}')
+        return rows
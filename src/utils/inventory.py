@@ -0,0 +1,71 @@
+import os
+
+from utils.diskspace import IncrementalLoader, load_diskspace_page, load_drives, diskspace_fingerprint, summarize_fleet, page_diskspace
+from utils.history import forecast_days_until_full, export_forecast
+from utils.snapshot import DISKSPACE_FILE, FORECAST_FILE, read_snapshot, snapshot_fingerprint
+
+
+# Serves the dashboard straight from MSSQL, caching results in the shared QueryCache
+class DatabaseInventory:
+    def __init__(self, db_client, cache, history_store=None, top_n=20, lookback=900):
+        self.db_client = db_client
+        self.cache = cache
+        self.history_store = history_store
+        self.top_n = top_n
+
+        self.loader = IncrementalLoader(db_client, summary=True, lookback=lookback)
+
+    def ready(self):
+        return True
+
+    def fleet_summary(self):
+        return self.cache.get('fleet_summary', lambda: summarize_fleet(self.loader.load(), top_n=self.top_n), self.loader.fingerprint)
+
+    def drives(self):
+        return self.cache.get('drives', lambda: load_drives(self.db_client), lambda: diskspace_fingerprint(self.db_client))
+
+    def page(self, page, page_size, **filters):
+        key = ('diskspace_page', page, page_size, tuple(sorted(filters.items())))
+        return self.cache.get(key, lambda: load_diskspace_page(self.db_client, page, page_size, **filters), lambda: diskspace_fingerprint(self.db_client), name='diskspace_page')
+
+    # Runs once per data refresh: adds the current data to the history and forecasts every drive
+    def _refresh_forecast(self):
+        forecast_df = forecast_days_until_full(self.history_store.append(self.loader.load()))
+        export_forecast(forecast_df)
+        return forecast_df
+
+    def forecast(self):
+        if self.history_store:
+            return self.cache.get('forecast', self._refresh_forecast, self.loader.fingerprint)
+
+
+# Serves the dashboard from the snapshot written by the collector, so sessions never run SQL themselves
+class SnapshotInventory:
+    def __init__(self, snapshot_dir, cache, top_n=20):
+        self.diskspace_path = os.path.join(snapshot_dir, DISKSPACE_FILE)
+        self.forecast_path = os.path.join(snapshot_dir, FORECAST_FILE)
+        self.cache = cache
+        self.top_n = top_n
+
+    def ready(self):
+        return os.path.exists(self.diskspace_path)
+
+    def _fingerprint(self):
+        return snapshot_fingerprint(self.diskspace_path)
+
+    def _snapshot(self):
+        return self.cache.get('snapshot', lambda: read_snapshot(self.diskspace_path), self._fingerprint)
+
+    def fleet_summary(self):
+        return self.cache.get('fleet_summary', lambda: summarize_fleet(self._snapshot(), top_n=self.top_n), self._fingerprint)
+
+    def drives(self):
+        return self.cache.get('drives', lambda: sorted(self._snapshot()['Drive'].unique()), self._fingerprint)
+
+    def page(self, page, page_size, **filters):
+        key = ('diskspace_page', page, page_size, tuple(sorted(filters.items())))
+        return self.cache.get(key, lambda: page_diskspace(self._snapshot(), page, page_size, **filters), self._fingerprint, name='diskspace_page')
+
+    def forecast(self):
+        if os.path.exists(self.forecast_path):
+            return self.cache.get('forecast', lambda: read_snapshot(self.forecast_path), lambda: snapshot_fingerprint(self.forecast_path))
@@ -0,0 +1,90 @@
+import json
+import codecs
+
+
+WHITESPACE = ' \t\r\n'
+
+
+# Yields the records of a JSON array one at a time from an iterable of byte chunks, so only the records
+# currently being parsed are held in memory. With records_key the array is read from that key of a top level object
+def iter_json_array(chunks, records_key=None):
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    chunks = iter(chunks)
+
+    buffer = ''
+    pos = 0
+    eof = False
+
+    def more():
+        nonlocal buffer, pos, eof
+        if eof:
+            return False
+        try:
+            text = text_decoder.decode(next(chunks))
+        except StopIteration:
+            eof = True
+            text = text_decoder.decode(b'', final=True)
+        buffer = buffer[pos:] + text
+        pos = 0
+        return True
+
+    def peek():
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in WHITESPACE:
+                pos += 1
+            if pos < len(buffer):
+                return buffer[pos]
+            if not more():
+                return None
+
+    def expect(chars):
+        nonlocal pos
+        char = peek()
+        if char is None or char not in chars:
+            raise ValueError(f'Expected one of {chars!r} in JSON stream, got {char!r}')
+        pos += 1
+
+    def value():
+        nonlocal pos
+        peek()
+        while True:
+            try:
+                obj, end = decoder.raw_decode(buffer, pos)
+                # A value ending with the buffer (e.g. a number) may continue in the next chunk
+                if end < len(buffer) or eof:
+                    pos = end
+                    return obj
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            more()
+
+    if records_key is not None:
+        expect('{')
+        while True:
+            char = peek()
+            if char in ('}', None):
+                return
+            if char == ',':
+                pos += 1
+                continue
+
+            key = value()
+            expect(':')
+            if key == records_key and peek() == '[':
+                break
+            value()
+
+    expect('[')
+    while True:
+        char = peek()
+        if char == ']':
+            return
+        if char is None:
+            raise ValueError('Unexpected end of JSON array')
+        if char == ',':
+            pos += 1
+            continue
+        yield value()
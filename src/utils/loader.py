@@ -0,0 +1,138 @@
+import io
+import time
+import logging
+import pandas as pd
+
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from utils.diskspace import load_diskspace
+from utils.logging import is_available_gauge, source_load_duration_histogram
+
+
+KEY_COLUMN = 'ComputerName'
+
+
+class InventorySource:
+    def __init__(self, name, load, timeout=30, columns=None):
+        self.name = name
+        self.load = load
+        self.timeout = timeout
+        # Added as empty columns when the source is unavailable, so the merged frame keeps its shape
+        self.columns = columns or []
+
+
+def database_source(db_client, name='diskspace', timeout=30):
+    return InventorySource(name, lambda: load_diskspace(db_client, summary=True), timeout)
+
+
+# The source timeout is also used as the request timeout, so a hung upstream releases its worker
+def api_source(api_client, name, path, records_key=None, key_field=KEY_COLUMN, timeout=30, columns=None, pagination=None):
+    def load():
+        if pagination:
+            # Without records_key paginate's own default applies
+            kwargs = {'records_key': records_key} if records_key else {}
+            return pd.json_normalize(list(api_client.paginate(path, pagination, timeout=timeout, **kwargs))).rename(columns={key_field: KEY_COLUMN})
+
+        data = api_client.make_request(path=path, timeout=timeout)
+        if data is None:
+            raise ConnectionError(f'Request to {path} failed')
+
+        df = pd.json_normalize(data[records_key] if records_key else data)
+        return df.rename(columns={key_field: KEY_COLUMN})
+
+    return InventorySource(name, load, timeout, columns)
+
+
+# The source timeout is set as the socket timeout while downloading, and the pooled session's own is restored after
+def sftp_csv_source(sftp_client, name, remote_path, key_field=KEY_COLUMN, timeout=30, columns=None):
+    def load():
+        buffer = io.BytesIO()
+        with sftp_client.session() as conn:
+            previous_timeout = conn.timeout
+            conn.timeout = timeout
+            try:
+                conn.getfo(remote_path, buffer)
+            finally:
+                conn.timeout = previous_timeout
+        buffer.seek(0)
+        return pd.read_csv(buffer).rename(columns={key_field: KEY_COLUMN})
+
+    return InventorySource(name, load, timeout, columns)
+
+
+# Loads every source concurrently and outer merges them on ComputerName.
+# A source that fails or times out is left out of the merge instead of failing the whole load.
+# A source whose previous load is still running is not submitted again, the next load waits for that run instead,
+# so a hung source holds at most one worker and can not starve the others
+class MultiSourceLoader:
+    def __init__(self, sources, max_workers=None):
+        self.sources = sources
+        self.logger = logging.getLogger(__name__)
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers or len(sources), thread_name_prefix='inventory_source')
+        self._running = {}
+
+    def _run(self, source):
+        start = time.monotonic()
+        try:
+            return source.load()
+        finally:
+            source_load_duration_histogram.labels(source.name).observe(time.monotonic() - start)
+
+    def _submit(self, source):
+        future = self._running.get(source.name)
+        if future is None or future.done():
+            future = self._executor.submit(self._run, source)
+            self._running[source.name] = future
+        else:
+            self.logger.warning(f"Source '{source.name}' is still loading, waiting for the running load")
+        return future
+
+    def load_sources(self):
+        start = time.monotonic()
+        futures = [(source, self._submit(source)) for source in self.sources]
+
+        frames = {}
+        for source, future in futures:
+            try:
+                # Timeouts count from submission, so slow sources wait in parallel rather than one after another
+                df = future.result(timeout=max(0, source.timeout - (time.monotonic() - start)))
+                if KEY_COLUMN not in df.columns:
+                    raise KeyError(f'{KEY_COLUMN} column missing')
+                frames[source.name] = df
+                is_available_gauge.labels(source.name).set(1)
+            except TimeoutError:
+                # The worker can not be interrupted, it finishes in the background and its result is dropped
+                self.logger.error(f"Timed out loading source '{source.name}' after {source.timeout}s")
+                is_available_gauge.labels(source.name).set(0)
+            except Exception as e:
+                self.logger.error(f"Error loading source '{source.name}': {e}")
+                is_available_gauge.labels(source.name).set(0)
+        return frames
+
+    def load(self):
+        frames = self.load_sources()
+        return merge_sources(self.sources, frames)
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Frames are merged in source order, colliding columns from later sources get the source name as suffix
+def merge_sources(sources, frames):
+    merged = None
+    for source in sources:
+        df = frames.get(source.name)
+        if df is None:
+            df = pd.DataFrame(columns=[KEY_COLUMN] + [column for column in source.columns if column != KEY_COLUMN])
+
+        # Categorical keys would turn into object on merge anyway
+        df = df.astype({KEY_COLUMN: 'object'})
+        if merged is None:
+            merged = df
+        else:
+            merged = merged.merge(df, on=KEY_COLUMN, how='outer', suffixes=('', f'_{source.name}'))
+
+    if merged is None:
+        return pd.DataFrame(columns=[KEY_COLUMN])
+    return merged.sort_values(KEY_COLUMN, ignore_index=True)
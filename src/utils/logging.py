@@ -2,8 +2,7 @@ import sys
 import logging
 import re
 
-from werkzeug import serving
-from prometheus_client import Gauge, Counter, Summary
+from prometheus_client import Gauge, Counter, Summary, Histogram
 
 from utils.config import DEBUG
 
@@ -15,12 +14,48 @@ last_updated_gauge = Gauge('last_updated_ms', "Timestamp in milliseconds of the
 
 # Dependency metrics
 is_available_gauge = Gauge('is_available', '1 - dependency is available, 0 - dependency is not available', labelnames=['dependency_name'])
+source_load_duration_histogram = Histogram('source_load_duration_s', 'Time spent loading an inventory source in seconds', labelnames=['dependency_name'])
 
 # Job metrics
 job_start_counter = Counter('job_start', 'Number of times a job has started', labelnames=['job_name'])
 job_complete_counter = Counter('job_complete', 'Number of times a job has completed', labelnames=['job_name', 'status'])
 job_duration_summary = Summary('job_duration_s', 'Duration of a job in seconds', labelnames=['job_name', 'status'])
 
+# Connection pool metrics, kind is e.g. database or sftp
+pool_size_gauge = Gauge('pool_size', 'Number of open connections in the pool', labelnames=['kind', 'pool'])
+pool_max_size_gauge = Gauge('pool_max_size', 'Maximum number of connections in the pool', labelnames=['kind', 'pool'])
+pool_in_use_gauge = Gauge('pool_in_use', 'Number of connections checked out of the pool', labelnames=['kind', 'pool'])
+pool_wait_histogram = Histogram('pool_wait_s', 'Time spent waiting for a connection from the pool in seconds', labelnames=['kind', 'pool'])
+
+# Database metrics
+db_query_duration_histogram = Histogram('db_query_duration_s', 'Time spent executing and fetching a database statement in seconds', labelnames=['statement', 'phase'])
+db_write_rows_counter = Counter('db_write_rows', 'Number of rows written by bulk database statements', labelnames=['statement'])
+db_write_rows_per_s_gauge = Gauge('db_write_rows_per_s', 'Rows per second written by the last bulk database write', labelnames=['statement'])
+
+# API metrics
+api_retry_counter = Counter('api_retry', 'Number of times an API request was retried', labelnames=['client', 'reason'])
+api_throttle_wait_histogram = Histogram('api_throttle_wait_s', 'Time spent waiting for the client side rate limiter in seconds', labelnames=['client'])
+api_circuit_state_gauge = Gauge('api_circuit_state', '0 - circuit is closed, 1 - circuit is half open, 2 - circuit is open', labelnames=['client'])
+
+# Disk metrics
+disk_total_bytes_gauge = Gauge('disk_total_bytes', 'Total size of the drive in bytes', labelnames=['computer', 'drive'])
+disk_free_bytes_gauge = Gauge('disk_free_bytes', 'Free space on the drive in bytes', labelnames=['computer', 'drive'])
+disk_used_ratio_gauge = Gauge('disk_used_ratio', 'Used space on the drive as a ratio of its size', labelnames=['computer', 'drive'])
+disk_days_until_full_gauge = Gauge('disk_days_until_full', 'Forecasted number of days until the drive is full', labelnames=['computer', 'drive'])
+
+# Ingest metrics
+ingest_files_counter = Counter('ingest_files', 'Number of files ingested', labelnames=['source', 'status'])
+ingest_rows_counter = Counter('ingest_rows', 'Number of rows ingested', labelnames=['source'])
+ingest_throughput_gauge = Gauge('ingest_rows_per_s', 'Rows per second inserted while ingesting the last file', labelnames=['source'])
+ingest_lag_gauge = Gauge('ingest_lag_s', 'Seconds between the last ingested file being written and it being ingested', labelnames=['source'])
+
+# Cache metrics
+cache_hit_counter = Counter('cache_hit', 'Number of times a cached value was served', labelnames=['cache_key'])
+cache_miss_counter = Counter('cache_miss', 'Number of times a cached value had to be (re)loaded', labelnames=['cache_key'])
+
+# Timing metrics
+phase_duration_histogram = Histogram('phase_duration_s', 'Time spent in a phase of loading or rendering the dashboard in seconds', labelnames=['phase'])
+
 
 # Logging configuration
 def set_logging_configuration():
@@ -29,7 +64,10 @@ def set_logging_configuration():
     disable_endpoint_logs(('/metrics', '/healthz'))
 
 
+# werkzeug is only imported here, so processes that never serve Flask do not pay for it
 def disable_endpoint_logs(disabled_endpoints):
+    from werkzeug import serving
+
     parent_log_request = serving.WSGIRequestHandler.log_request
 
     def log_request(self, *args, **kwargs):
@@ -0,0 +1,179 @@
+import time
+import logging
+import threading
+
+from collections import deque
+from contextlib import contextmanager
+
+from utils.logging import pool_size_gauge, pool_max_size_gauge, pool_in_use_gauge, pool_wait_histogram
+
+
+class ConnectionPool:
+    def __init__(self, connect, name, kind='database', min_size=1, max_size=5, timeout=30, health_check_interval=30, max_idle_time=300, connect_retries=3, connect_backoff=0.5, is_healthy=None):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError('Pool sizes must satisfy 0 <= min_size <= max_size and max_size >= 1')
+
+        self.connect = connect
+        self.name = name
+        # Metric label telling database pools from e.g. SFTP session pools
+        self.kind = kind
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self.max_idle_time = max_idle_time
+        self.connect_retries = connect_retries
+        self.connect_backoff = connect_backoff
+        # Checks idle connections before reuse, defaults to a SELECT 1 round trip
+        self.is_healthy = is_healthy or self._is_healthy
+        self.logger = logging.getLogger(__name__)
+
+        self._idle = deque()  # (connection, last used)
+        self._size = 0
+        self._in_use = 0
+        self._condition = threading.Condition()
+
+        pool_max_size_gauge.labels(self.kind, self.name).set(self.max_size)
+
+    def _update_gauges(self):
+        pool_size_gauge.labels(self.kind, self.name).set(self._size)
+        pool_in_use_gauge.labels(self.kind, self.name).set(self._in_use)
+
+    def _create_connection(self):
+        delay = self.connect_backoff
+        for attempt in range(1, self.connect_retries + 1):
+            try:
+                return self.connect()
+            except Exception as e:
+                if attempt == self.connect_retries:
+                    raise
+                self.logger.warning(f"Connection attempt {attempt} to {self.name} failed: {e}, retrying in {delay}s")
+                time.sleep(delay)
+                delay *= 2
+
+    def _is_healthy(self, connection):
+        try:
+            cursor = connection.cursor()
+            cursor.execute('SELECT 1')
+            cursor.fetchall()
+            cursor.close()
+            return True
+        except Exception as e:
+            self.logger.warning(f"Discarding broken connection to {self.name}: {e}")
+            return False
+
+    def _close_connection(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    # Opens connections up to min_size up front, so the first requests do not wait for a handshake.
+    # Failures are logged, the pool then opens connections on demand as usual
+    def warm(self):
+        while True:
+            with self._condition:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+
+            try:
+                connection = self._create_connection()
+            except Exception as e:
+                with self._condition:
+                    self._size -= 1
+                    self._update_gauges()
+                self.logger.error(f"Error opening connection to {self.name}: {e}")
+                return
+
+            with self._condition:
+                self._idle.append((connection, time.monotonic()))
+                self._update_gauges()
+                self._condition.notify()
+
+    def acquire(self):
+        start = time.monotonic()
+        connection = None
+
+        with self._condition:
+            while True:
+                if self._idle:
+                    connection, last_used = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    last_used = None
+                    self._size += 1
+                    break
+                remaining = start + self.timeout - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"Timed out after {self.timeout}s waiting for a connection to {self.name}")
+                self._condition.wait(remaining)
+            self._in_use += 1
+            self._update_gauges()
+
+        try:
+            if connection is not None and time.monotonic() - last_used > self.health_check_interval and not self.is_healthy(connection):
+                self._close_connection(connection)
+                connection = None
+            if connection is None:
+                connection = self._create_connection()
+        except Exception:
+            with self._condition:
+                self._size -= 1
+                self._in_use -= 1
+                self._update_gauges()
+                self._condition.notify()
+            raise
+
+        pool_wait_histogram.labels(self.kind, self.name).observe(time.monotonic() - start)
+        return connection
+
+    def release(self, connection, discard=False):
+        now = time.monotonic()
+        expired = []
+
+        with self._condition:
+            self._in_use -= 1
+            if discard:
+                self._size -= 1
+                expired.append(connection)
+            else:
+                self._idle.append((connection, now))
+
+            # Close connections idle for too long, oldest first, but keep min_size open
+            while self._size > self.min_size and self._idle and now - self._idle[0][1] > self.max_idle_time:
+                expired.append(self._idle.popleft()[0])
+                self._size -= 1
+
+            self._update_gauges()
+            self._condition.notify()
+
+        for expired_connection in expired:
+            self._close_connection(expired_connection)
+
+    @contextmanager
+    def connection(self):
+        connection = self.acquire()
+        try:
+            yield connection
+            connection.commit()
+        # BaseException so connections are also returned when a generator using them is closed early
+        except BaseException:
+            discard = False
+            try:
+                connection.rollback()
+            except Exception:
+                discard = True
+            self.release(connection, discard=discard)
+            raise
+        self.release(connection)
+
+    def close(self):
+        with self._condition:
+            idle = [connection for connection, _ in self._idle]
+            self._idle.clear()
+            self._size -= len(idle)
+            self._update_gauges()
+
+        for connection in idle:
+            self._close_connection(connection)
@@ -0,0 +1,141 @@
+import time
+import random
+import logging
+import threading
+
+from email.utils import parsedate_to_datetime
+
+from utils.logging import api_circuit_state_gauge
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class RetryPolicy:
+    def __init__(self, retries=3, backoff=0.5, max_backoff=30, jitter=True, statuses=(429, 500, 502, 503, 504), methods=('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE')):
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.statuses = statuses
+        self.methods = methods
+
+    def should_retry(self, method, attempt, status=None):
+        if attempt >= self.retries:
+            return False
+        # A 429 means the request was not processed, so even POSTs can be sent again
+        if status == 429:
+            return True
+        if method not in self.methods:
+            return False
+        return status is None or status in self.statuses
+
+    # Exponential backoff with full jitter, a Retry-After from the server takes precedence
+    def delay(self, attempt, retry_after=None):
+        if retry_after is not None:
+            return min(retry_after, self.max_backoff)
+        delay = min(self.backoff * 2 ** attempt, self.max_backoff)
+        return random.uniform(0, delay) if self.jitter else delay
+
+
+def parse_retry_after(value):
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+# Allows rate requests per second on average with bursts of up to capacity requests
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1, rate)
+
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    # Blocks until a token is available and returns the time waited in seconds
+    def acquire(self):
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                wait = (1 - self._tokens) / self.rate
+
+            time.sleep(wait)
+            waited += wait
+
+
+# Stops calls to an upstream after failure_threshold consecutive failures. After reset_timeout a single
+# trial call is let through (half open), which closes the circuit on success and opens it again on failure
+class CircuitBreaker:
+    CLOSED = 0
+    HALF_OPEN = 1
+    OPEN = 2
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.logger = logging.getLogger(__name__)
+
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+        api_circuit_state_gauge.labels(name).set(self.state)
+
+    def _set_state(self, state):
+        if state != self.state:
+            self.logger.info(f"Circuit for '{self.name}' changed from {self.state} to {state}")
+        self.state = state
+        api_circuit_state_gauge.labels(self.name).set(state)
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self._set_state(self.HALF_OPEN)
+
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    # Frees the half open trial when the request ended without an outcome (e.g. KeyboardInterrupt), so the
+    # next request can be the trial instead of the circuit staying half open for good
+    def release(self):
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._trial_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._trial_in_flight = False
+            self._set_state(self.CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                self._set_state(self.OPEN)
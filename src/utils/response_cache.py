@@ -0,0 +1,136 @@
+import os
+import time
+import pickle
+import hashlib
+import logging
+import tempfile
+import threading
+
+from collections import OrderedDict
+
+
+def parse_cache_control(value):
+    directives = {}
+    for part in (value or '').split(','):
+        name, _, argument = part.strip().partition('=')
+        if name:
+            directives[name.lower()] = argument.strip('"') or True
+    return directives
+
+
+# Caches parsed API responses with their validators (ETag / Last-Modified). Entries are kept in an in memory
+# LRU and, when a path is set, in one file per entry, so a restarted client can still revalidate instead of downloading
+class ResponseCache:
+    def __init__(self, max_entries=256, path=None):
+        self.max_entries = max_entries
+        self.path = path
+        self.logger = logging.getLogger(__name__)
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        if path:
+            os.makedirs(path, exist_ok=True)
+
+    def _file(self, key):
+        return os.path.join(self.path, hashlib.sha256(repr(key).encode()).hexdigest() + '.pickle')
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry:
+                self._entries.move_to_end(key)
+                return entry
+
+        if self.path:
+            try:
+                with open(self._file(key), 'rb') as f:
+                    entry = pickle.load(f)
+                self._remember(key, entry)
+                return entry
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                self.logger.error(f'Error reading cached response for {key}: {e}')
+        return None
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    # Returns False when the response may not be cached (no-store, or nothing to revalidate or expire with)
+    def store(self, key, value, headers):
+        cache_control = parse_cache_control(headers.get('Cache-Control'))
+        if 'no-store' in cache_control:
+            return False
+
+        entry = {
+            'value': value,
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+            'expires': self._expires(cache_control)
+        }
+        if not (entry['etag'] or entry['last_modified'] or entry['expires']):
+            return False
+
+        self._remember(key, entry)
+        if self.path:
+            self._write(key, entry)
+        return True
+
+    # After a 304 the cached value is kept and only its freshness is updated
+    def refresh(self, key, entry, headers):
+        cache_control = parse_cache_control(headers.get('Cache-Control'))
+        entry = entry | {'expires': self._expires(cache_control), 'etag': headers.get('ETag') or entry['etag']}
+        self._remember(key, entry)
+        if self.path:
+            self._write(key, entry)
+        return entry
+
+    # Wall clock time, so entries on disk stay valid across restarts
+    def _expires(self, cache_control):
+        if 'no-cache' in cache_control:
+            return None
+        try:
+            return time.time() + int(cache_control['max-age'])
+        except (KeyError, ValueError, TypeError):
+            return None
+
+    # Through a unique temporary file, so processes sharing the cache directory never publish each other's half written entry
+    def _write(self, key, entry):
+        file = self._file(key)
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.path, prefix=f'.{os.path.basename(file)}.', suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    pickle.dump(entry, f)
+                os.replace(tmp_path, file)
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+        except Exception as e:
+            self.logger.error(f'Error writing cached response for {key}: {e}')
+
+    @staticmethod
+    def is_fresh(entry):
+        return entry['expires'] is not None and time.time() < entry['expires']
+
+    @staticmethod
+    def validators(entry):
+        headers = {}
+        if entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.path:
+            for name in os.listdir(self.path):
+                if name.endswith('.pickle'):
+                    os.remove(os.path.join(self.path, name))
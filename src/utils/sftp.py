@@ -1,13 +1,23 @@
 import base64
 import io
 import logging
-import paramiko
-import pysftp
 import warnings
 
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 
+from utils.pool import ConnectionPool
+
+
+# Supress warning about trusting all host keys - bad practice!
+warnings.filterwarnings('ignore', '.*Failed to load HostKeys.*')
+
+
+# paramiko and pysftp are imported when a client is created, importing this module does not load them
 class SFTPClient:
-    def __init__(self, host, username, password=None, key_base64=None, key_pass=None):
+    def __init__(self, host, username, password=None, key_base64=None, key_pass=None, pool_size=4, keepalive=30, pool_timeout=60):
+        import pysftp
+
         self.host = host
         self.username = username
         self.password = password
@@ -22,20 +32,93 @@ class SFTPClient:
         else:
             self.key = None
 
+        self.keepalive = keepalive
         self.logger = logging.getLogger(__name__)
 
+        # Sessions are opened on demand and kept alive, so bulk transfers only pay the SSH handshake once per session
+        self.pool = ConnectionPool(self._connect, name=f'sftp://{host}', kind='sftp', min_size=0, max_size=pool_size, timeout=pool_timeout, is_healthy=self._is_healthy)
+
     def _make_key(self, key_base64, key_pass=None):
+        import paramiko
+
         decoded_key = base64.b64decode(key_base64).decode("utf-8")
         private_key_file = io.StringIO()
         private_key_file.write(decoded_key)
         private_key_file.seek(0)
         return paramiko.RSAKey.from_private_key(private_key_file, password=key_pass)
 
+    def _connect(self):
+        import pysftp
+
+        connection = pysftp.Connection(host=self.host, username=self.username, password=self.password, private_key=self.key, cnopts=self.cnopts)
+        if self.keepalive:
+            connection.sftp_client.get_channel().get_transport().set_keepalive(self.keepalive)
+        return connection
+
+    def _is_healthy(self, connection):
+        try:
+            connection.pwd
+            return True
+        except Exception as e:
+            self.logger.warning(f"Discarding broken SFTP session to {self.host}: {e}")
+            return False
+
+    # A connection of its own outside the pool, closed by the caller, or None when connecting fails.
+    # New code should use session(), which reuses the pooled sessions
     def get_connection(self):
         try:
-            # Supress warning about trusting all host keys - bad practice!
-            warnings.filterwarnings('ignore', '.*Failed to load HostKeys.*')
-            return pysftp.Connection(host=self.host, username=self.username, password=self.password, private_key=self.key, cnopts=self.cnopts)
+            return self._connect()
         except Exception as e:
             self.logger.error(e)
             return None
+
+    # Borrows a pooled session. Sessions are closed instead of returned after SSH or socket errors (or an interrupted
+    # transfer), errors in the caller's own code and missing or forbidden remote files leave the session usable
+    @contextmanager
+    def session(self):
+        import paramiko
+
+        connection = self.pool.acquire()
+        try:
+            yield connection
+        except (FileNotFoundError, PermissionError):
+            self.pool.release(connection)
+            raise
+        except Exception as e:
+            self.pool.release(connection, discard=isinstance(e, (OSError, EOFError, paramiko.SSHException)))
+            raise
+        except BaseException:
+            self.pool.release(connection, discard=True)
+            raise
+        self.pool.release(connection)
+
+    def _transfer_many(self, files, transfer, action, max_workers=None):
+        def run(source, destination):
+            try:
+                with self.session() as connection:
+                    transfer(connection.sftp_client, source, destination)
+                return source
+            except Exception as e:
+                self.logger.error(f'Error {action} {source}: {e}')
+                return None
+
+        with ThreadPoolExecutor(max_workers=max_workers or self.pool.max_size, thread_name_prefix='sftp_transfer') as executor:
+            results = executor.map(lambda pair: run(*pair), files)
+            transferred = [source for source in results if source is not None]
+
+        self.logger.info(f'Finished {action} {len(transferred)} of {len(files)} files')
+        return transferred
+
+    # Downloads (remote_path, local_path) pairs concurrently across the pooled sessions and returns the remote
+    # paths that were downloaded. paramiko pipelines the reads (prefetch), so each file streams without per block round trips
+    def get_many(self, files, max_workers=None):
+        files = list(files)
+        return self._transfer_many(files, lambda sftp, remote_path, local_path: sftp.get(remote_path, local_path, prefetch=True), 'downloading', max_workers)
+
+    # Uploads (local_path, remote_path) pairs concurrently and returns the local paths that were uploaded
+    def put_many(self, files, max_workers=None):
+        files = list(files)
+        return self._transfer_many(files, lambda sftp, local_path, remote_path: sftp.put(local_path, remote_path), 'uploading', max_workers)
+
+    def close(self):
+        self.pool.close()
@@ -0,0 +1,33 @@
+import os
+import tempfile
+import pandas as pd
+
+
+DISKSPACE_FILE = 'diskspace.parquet'
+FORECAST_FILE = 'forecast.parquet'
+
+
+# Writes to a temporary file and renames it, so readers never see a half written file. The temporary file
+# is unique, so concurrent writers (e.g. several dashboard replicas) do not write into each other's file
+def write_snapshot(df, path):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix=f'.{os.path.basename(path)}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            df.to_parquet(f, index=False)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def read_snapshot(path):
+    return pd.read_parquet(path)
+
+
+def snapshot_fingerprint(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
@@ -0,0 +1,69 @@
+import time
+import functools
+import contextvars
+import pandas as pd
+
+from contextlib import contextmanager
+
+from utils.logging import phase_duration_histogram
+
+
+_current_timer = contextvars.ContextVar('phase_timer', default=None)
+
+
+# Collects the phases of one unit of work (e.g. a Streamlit rerun) for the debug panel. Phases are always
+# recorded in phase_duration_histogram (served on METRICS_PORT by main.py), and in the timer last started in the current thread
+class PhaseTimer:
+    def __init__(self):
+        self.phases = []
+        self.depth = 0
+        self.started = time.perf_counter()
+
+    def start(self):
+        _current_timer.set(self)
+        return self
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    # One row per phase in the order they started, nested phases are marked with a dot per level
+    def frame(self):
+        return pd.DataFrame({
+            'Phase': ['· ' * record['depth'] + record['phase'] for record in self.phases],
+            'Duration_ms': [record['duration_s'] * 1000 if record['duration_s'] is not None else None for record in self.phases],
+            'Rows': pd.array([record['rows'] for record in self.phases], dtype='Int64')
+        })
+
+
+# Times the block as phase name. The yielded record can be given a row count, e.g. record['rows'] = len(df)
+@contextmanager
+def phase(name, rows=None):
+    timer = _current_timer.get()
+    record = {'phase': name, 'depth': 0, 'duration_s': None, 'rows': rows}
+    if timer:
+        record['depth'] = timer.depth
+        timer.phases.append(record)
+        timer.depth += 1
+
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record['duration_s'] = time.perf_counter() - start
+        phase_duration_histogram.labels(name).observe(record['duration_s'])
+        if timer:
+            timer.depth -= 1
+
+
+# Decorator timing every call as phase name, rows is an optional function giving the row count of the result
+def timed(name, rows=None):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with phase(name) as record:
+                result = func(*args, **kwargs)
+                if rows:
+                    record['rows'] = rows(result)
+                return result
+        return wrapper
+    return decorator
@@ -1,9 +1,15 @@
+import io
+import os
+import json
+import time
 import pytest
 import base64
+import threading
 
 from unittest.mock import MagicMock, patch
 
-from utils.api_requests import APIClient
+from utils.api_requests import APIClient, lookup
+from utils.resilience import RetryPolicy
 
 
 def test_init():
@@ -21,7 +27,7 @@ def test_authenticate_api_key():
 
 
 @patch('time.time')
-@patch('requests.post')
+@patch('requests.Session.post')
 def test_authenticate_client_credentials(mock_post, mock_time):
     api_client = APIClient('http://testurl.com', client_id='test_id', client_secret='test_secret', realm='test_realm')
 
@@ -42,7 +48,7 @@ def test_authenticate_client_credentials(mock_post, mock_time):
 
 
 @patch('time.time')
-@patch('requests.post')
+@patch('requests.Session.post')
 def test_authenticate_user_password(mock_post, mock_time):
     api_client = APIClient('http://testurl.com', client_id='test_id', client_secret='test_secret', realm='test_realm', username='test_user', password='test_pass')
 
@@ -68,7 +74,7 @@ def test_authenticate_cert():
 
 
 @patch('time.time')
-@patch('requests.post')
+@patch('requests.Session.post')
 def test_authenticate_refresh_token(mock_post, mock_time):
     api_client = APIClient('http://testurl.com', client_id='test_id', client_secret='test_secret', realm='test_realm')
     api_client.access_token = 'test_token'
@@ -100,7 +106,7 @@ def test_authenticate_no_realm():
 # make_request tests
 
 
-@patch('requests.get')
+@patch('requests.Session.request')
 def test_make_request_get(mock_get):
     api_client = APIClient('http://testurl.com', api_key='test_key')
 
@@ -111,10 +117,10 @@ def test_make_request_get(mock_get):
     mock_get.return_value = res
 
     assert api_client.make_request(path='/test') == {'test': 'test'}
-    mock_get.assert_called_once_with('http://testurl.com/test', headers={'Authorization': 'Bearer test_key'})
+    mock_get.assert_called_once_with('GET', 'http://testurl.com/test', headers={'Authorization': 'Bearer test_key'})
 
 
-@patch('requests.post')
+@patch('requests.Session.request')
 def test_make_request_post(mock_get):
     api_client = APIClient('http://testurl.com', api_key='test_key')
 
@@ -124,10 +130,10 @@ def test_make_request_post(mock_get):
     mock_get.return_value = res
 
     assert api_client.make_request(path='/test', json={'test': 'test'}) == b' '
-    mock_get.assert_called_once_with('http://testurl.com/test', headers={'Authorization': 'Bearer test_key', 'Content-Type': 'application/json'}, json={'test': 'test'})
+    mock_get.assert_called_once_with('POST', 'http://testurl.com/test', headers={'Authorization': 'Bearer test_key', 'Content-Type': 'application/json'}, json={'test': 'test'})
 
 
-@patch('requests.put')
+@patch('requests.Session.request')
 def test_make_request_put(mock_get):
     api_client = APIClient('http://testurl.com', api_key='test_key')
 
@@ -137,10 +143,10 @@ def test_make_request_put(mock_get):
     mock_get.return_value = res
 
     assert api_client.make_request(method='put', headers={'custom': 'header'}, data='test') == b'ok'
-    mock_get.assert_called_once_with('http://testurl.com', headers={'Authorization': 'Bearer test_key', 'custom': 'header'}, data='test')
+    mock_get.assert_called_once_with('PUT', 'http://testurl.com', headers={'Authorization': 'Bearer test_key', 'custom': 'header'}, data='test')
 
 
-@patch('requests.delete')
+@patch('requests.Session.request')
 def test_make_request_delete(mock_get):
     api_client = APIClient('http://testurl.com', api_key='test_key')
 
@@ -150,11 +156,12 @@ def test_make_request_delete(mock_get):
     mock_get.return_value = res
 
     assert api_client.make_request(method='DELETE', path='/test', data='test') == b'ok'
-    mock_get.assert_called_once_with('http://testurl.com/test', headers={'Authorization': 'Bearer test_key'}, data='test')
+    mock_get.assert_called_once_with('DELETE', 'http://testurl.com/test', headers={'Authorization': 'Bearer test_key'}, data='test')
 
 
-@patch('requests_pkcs12.post')
-def test_make_request_get_cert(mock_get):
+@patch('requests_pkcs12.Pkcs12Adapter')
+@patch('requests.Session.request')
+def test_make_request_get_cert(mock_get, mock_adapter):
     test_base64 = base64.b64encode(b'test_cert')
     api_client = APIClient('http://testurl.com', cert_base64=test_base64, password='test_pass')
 
@@ -164,7 +171,8 @@ def test_make_request_get_cert(mock_get):
     mock_get.return_value = res
 
     assert api_client.make_request(path='/test', json={'test': 'test'}) == b'ok'
-    mock_get.assert_called_once_with('http://testurl.com/test', json={'test': 'test'}, pkcs12_data=b'test_cert', pkcs12_password='test_pass', headers={'Content-Type': 'application/json'})
+    mock_get.assert_called_once_with('POST', 'http://testurl.com/test', json={'test': 'test'}, headers={'Content-Type': 'application/json'})
+    mock_adapter.assert_called_once_with(pkcs12_data=b'test_cert', pkcs12_password='test_pass', pool_connections=10, pool_maxsize=10)
 
 
 def test_make_request_wrong_path():
@@ -179,3 +187,520 @@ def test_make_request_wrong_headers():
     api_client.logger = MagicMock()
     assert api_client.make_request(headers='not a dict') is None
     api_client.logger.error.assert_called_once_with("Request failed with error: <class 'ValueError'> Headers must be a dictionary")
+
+
+# session tests
+
+
+@patch('requests.Session.request')
+def test_make_request_reuses_session(mock_request):
+    api_client = APIClient('https://testurl.com', api_key='test_key', timeout=10)
+
+    res = MagicMock()
+    res.content = b'ok'
+    mock_request.return_value = res
+
+    api_client.make_request(path='/a')
+    session = api_client.session
+    api_client.make_request(path='/b')
+
+    assert api_client.session is session
+    assert mock_request.call_count == 2
+    mock_request.assert_called_with('GET', 'https://testurl.com/b', headers={'Authorization': 'Bearer test_key'}, timeout=10)
+
+
+@patch('requests_pkcs12.Pkcs12Adapter')
+@patch('requests.Session.request')
+def test_make_request_cert_adapter_built_once(mock_request, mock_adapter):
+    api_client = APIClient('https://testurl.com', cert_base64=base64.b64encode(b'test_cert'), password='test_pass', pool_size=4)
+    mock_request.return_value.content = b'ok'
+
+    api_client.make_request(path='/a')
+    api_client.make_request(path='/b')
+
+    mock_adapter.assert_called_once_with(pkcs12_data=b'test_cert', pkcs12_password='test_pass', pool_connections=4, pool_maxsize=4)
+    assert api_client.session.get_adapter('https://testurl.com') is mock_adapter.return_value
+
+
+def test_close():
+    api_client = APIClient('https://testurl.com')
+    session = api_client._get_session()
+
+    with patch.object(session, 'close') as mock_close:
+        api_client.close()
+        mock_close.assert_called_once()
+    assert api_client.session is None
+
+
+# paginate tests
+
+
+def test_paginate_next_link():
+    api_client = APIClient('https://testurl.com/api')
+    pages = {
+        '/vms': {'items': [1, 2], 'links': {'next': 'https://testurl.com/api/vms?page=2'}},
+        '/vms?page=2': {'items': [3], 'links': {'next': None}}
+    }
+
+    with patch.object(api_client, 'make_request', side_effect=lambda path, params: pages[path]) as mock_request:
+        assert list(api_client.paginate('/vms', next_key='links.next')) == [1, 2, 3]
+        assert mock_request.call_count == 2
+
+
+def test_paginate_cursor():
+    api_client = APIClient('https://testurl.com')
+    pages = {None: {'items': [1], 'next_cursor': 'a'}, 'a': {'items': [2], 'next_cursor': None}}
+
+    with patch.object(api_client, 'make_request', side_effect=lambda path, params: pages[(params or {}).get('cursor')]):
+        assert list(api_client.paginate('/vms', pagination='cursor', params={'state': 'on'})) == [1, 2]
+
+
+def test_paginate_offset_prefetches_concurrently():
+    api_client = APIClient('https://testurl.com')
+    records = list(range(25))
+    calls = []
+
+    def make_request(path, params):
+        calls.append(params['offset'])
+        return {'items': records[params['offset']:params['offset'] + params['limit']]}
+
+    with patch.object(api_client, 'make_request', side_effect=make_request):
+        assert list(api_client.paginate('/vms', pagination='offset', page_size=10, prefetch=3)) == records
+
+    # The third page is short, so at most the prefetched pages after it are requested
+    assert sorted(calls)[:3] == [0, 10, 20]
+    assert len(calls) <= 6
+
+
+def test_paginate_offset_server_caps_limit():
+    api_client = APIClient('https://testurl.com')
+    records = list(range(250))
+
+    def make_request(path, params):
+        return {'items': records[params['offset']:params['offset'] + min(params['limit'], 50)]}
+
+    with patch.object(api_client, 'make_request', side_effect=make_request):
+        assert list(api_client.paginate('/vms', pagination='offset', page_size=100, prefetch=3)) == records
+
+
+def test_paginate_offset_total():
+    api_client = APIClient('https://testurl.com')
+    calls = []
+
+    def make_request(path, params):
+        calls.append(params['offset'])
+        return {'items': list(range(params['offset'], min(params['offset'] + params['limit'], 15))), 'total': 15}
+
+    with patch.object(api_client, 'make_request', side_effect=make_request):
+        assert list(api_client.paginate('/vms', pagination='offset', page_size=10, prefetch=1)) == list(range(15))
+
+    assert calls == [0, 10]
+
+
+def test_paginate_stops_early():
+    api_client = APIClient('https://testurl.com')
+
+    with patch.object(api_client, 'make_request', side_effect=lambda path, params: {'items': list(range(params['offset'], params['offset'] + 10))}):
+        iterator = api_client.paginate('/vms', pagination='offset', page_size=10, prefetch=2)
+        assert [next(iterator) for _ in range(15)] == list(range(15))
+        iterator.close()
+
+
+def test_paginate_failed_page():
+    api_client = APIClient('https://testurl.com')
+
+    with patch.object(api_client, 'make_request', return_value=None):
+        with pytest.raises(ConnectionError):
+            list(api_client.paginate('/vms'))
+
+
+def test_paginate_next_link_outside_base_url():
+    api_client = APIClient('https://testurl.com')
+
+    with patch.object(api_client, 'make_request', return_value={'items': [], 'next': 'https://other.com/vms'}):
+        with pytest.raises(ValueError):
+            list(api_client.paginate('/vms'))
+
+
+def test_lookup():
+    assert lookup({'a': {'b': 1}}, 'a.b') == 1
+    assert lookup({'a': None}, 'a.b') is None
+
+
+# retry, rate limit and circuit breaker tests
+
+
+def make_response(status_code, headers=None):
+    res = MagicMock()
+    res.status_code = status_code
+    res.headers = headers or {}
+    res.content = b'ok'
+    return res
+
+
+@patch('utils.api_requests.api_retry_counter')
+@patch('time.sleep')
+@patch('requests.Session.request')
+def test_make_request_retries_retry_after(mock_request, mock_sleep, mock_retry_counter):
+    api_client = APIClient('https://testurl.com', name='cmdb')
+    mock_request.side_effect = [make_response(429, {'Retry-After': '2'}), make_response(503), make_response(200)]
+
+    with patch('random.uniform', return_value=0.7):
+        assert api_client.make_request(path='/test') == b'ok'
+
+    assert mock_request.call_count == 3
+    assert [c.args for c in mock_sleep.call_args_list] == [(2,), (0.7,)]
+    mock_retry_counter.labels.assert_any_call('cmdb', '429')
+    mock_retry_counter.labels.assert_any_call('cmdb', '503')
+
+
+@patch('time.sleep')
+@patch('requests.Session.request')
+def test_make_request_retries_connection_errors(mock_request, mock_sleep):
+    import requests
+
+    api_client = APIClient('https://testurl.com', retry=RetryPolicy(retries=2))
+    api_client.logger = MagicMock()
+    mock_request.side_effect = requests.ConnectionError('refused')
+
+    assert api_client.make_request(path='/test') is None
+    assert mock_request.call_count == 3
+    api_client.logger.error.assert_called_once()
+
+
+@patch('time.sleep')
+@patch('requests.Session.request')
+def test_make_request_does_not_retry_post(mock_request, mock_sleep):
+    api_client = APIClient('https://testurl.com')
+    api_client.logger = MagicMock()
+    mock_request.return_value = make_response(503)
+    mock_request.return_value.raise_for_status.side_effect = Exception('503 Server Error')
+
+    assert api_client.make_request(path='/test', json={}) is None
+    assert mock_request.call_count == 1
+    mock_sleep.assert_not_called()
+
+
+@patch('time.sleep')
+@patch('requests.Session.request')
+def test_make_request_circuit_breaker(mock_request, mock_sleep):
+    api_client = APIClient('https://testurl.com', retry=RetryPolicy(retries=0), circuit_breaker=True)
+    api_client.circuit_breaker.failure_threshold = 2
+    api_client.logger = MagicMock()
+    mock_request.return_value = make_response(500)
+    mock_request.return_value.raise_for_status.side_effect = Exception('500 Server Error')
+
+    for _ in range(3):
+        assert api_client.make_request(path='/test') is None
+
+    assert mock_request.call_count == 2
+    api_client.logger.error.assert_called_with("Request failed with error: <class 'utils.resilience.CircuitOpenError'> Circuit for 'testurl.com' is open")
+
+
+@patch('time.monotonic')
+@patch('requests.Session.request')
+def test_make_request_circuit_breaker_trial_other_error(mock_request, mock_monotonic):
+    import requests
+
+    mock_monotonic.return_value = 0
+    api_client = APIClient('https://testurl.com', retry=RetryPolicy(retries=0), circuit_breaker=True)
+    api_client.circuit_breaker.failure_threshold = 1
+    mock_request.side_effect = requests.ConnectionError('down')
+    assert api_client.make_request(path='/test') is None
+
+    # The half open trial fails with an error that is not retried, the circuit must open again, not stay stuck
+    mock_monotonic.return_value = 60
+    mock_request.side_effect = requests.TooManyRedirects('redirects')
+    assert api_client.make_request(path='/test') is None
+    assert api_client.circuit_breaker.state == api_client.circuit_breaker.OPEN
+
+    mock_monotonic.return_value = 120
+    mock_request.side_effect = KeyboardInterrupt()
+    with pytest.raises(KeyboardInterrupt):
+        api_client.make_request(path='/test')
+
+    # The interrupted trial is released, so the next request is let through as the trial
+    mock_request.side_effect = None
+    mock_request.return_value = make_response(200)
+    assert api_client.make_request(path='/test') == b'ok'
+    assert api_client.circuit_breaker.state == api_client.circuit_breaker.CLOSED
+
+
+@patch('utils.api_requests.api_throttle_wait_histogram')
+@patch('requests.Session.request')
+def test_make_request_rate_limited(mock_request, mock_histogram):
+    api_client = APIClient('https://testurl.com', rate_limit=5)
+    mock_request.return_value = make_response(200)
+
+    with patch.object(api_client.rate_limiter, 'acquire', return_value=0.2) as mock_acquire:
+        api_client.make_request(path='/test')
+
+    mock_acquire.assert_called_once()
+    mock_histogram.labels.return_value.observe.assert_called_once_with(0.2)
+
+
+# token refresh tests
+
+
+def make_token_response(access_token='test_token', expires_in=300):
+    res = MagicMock()
+    res.json.return_value = {'access_token': access_token, 'expires_in': expires_in, 'refresh_token': 'test_refresh_token', 'refresh_expires_in': 1800}
+    return res
+
+
+@patch('requests.Session.post')
+def test_authenticate_single_flight(mock_post):
+    api_client = APIClient('http://testurl.com', client_id='test_id', client_secret='test_secret', realm='test_realm')
+
+    def post(*args, **kwargs):
+        time.sleep(0.1)
+        return make_token_response()
+    mock_post.side_effect = post
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(api_client._authenticate())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert mock_post.call_count == 1
+    assert results == [{'Authorization': 'Bearer test_token'}] * 8
+
+
+@patch('time.time')
+@patch('requests.Session.post')
+def test_authenticate_refreshes_before_expiry(mock_post, mock_time):
+    api_client = APIClient('http://testurl.com', client_id='test_id', client_secret='test_secret', realm='test_realm', refresh_margin=30)
+    mock_post.side_effect = [make_token_response('first'), make_token_response('second')]
+
+    mock_time.return_value = 0
+    assert api_client._authenticate() == {'Authorization': 'Bearer first'}
+    mock_time.return_value = 269
+    assert api_client._authenticate() == {'Authorization': 'Bearer first'}
+    mock_time.return_value = 270
+    assert api_client._authenticate() == {'Authorization': 'Bearer second'}
+
+    assert mock_post.call_args.kwargs['data']['grant_type'] == 'refresh_token'
+
+
+@patch('time.time')
+@patch('requests.Session.post')
+def test_authenticate_short_lived_token_margin(mock_post, mock_time):
+    api_client = APIClient('http://testurl.com', client_id='test_id', client_secret='test_secret', realm='test_realm', refresh_margin=30)
+    mock_post.return_value = make_token_response(expires_in=10)
+    mock_time.return_value = 0
+
+    api_client._authenticate()
+    api_client._authenticate()
+
+    assert mock_post.call_count == 1
+    assert api_client.token_refresh_margin == 5
+
+
+@patch('time.time')
+@patch('requests.Session.post')
+def test_authenticate_refresh_failure_falls_back(mock_post, mock_time):
+    api_client = APIClient('http://testurl.com', client_id='test_id', client_secret='test_secret', realm='test_realm')
+    api_client.access_token = 'old_token'
+    api_client.token_expiry = 10
+    api_client.refresh_token = 'revoked_token'
+    api_client.refresh_token_expiry = 100
+    mock_time.return_value = 50
+
+    revoked = MagicMock()
+    revoked.raise_for_status.side_effect = Exception('400 Bad Request')
+    mock_post.side_effect = [revoked, make_token_response()]
+
+    assert api_client._authenticate() == {'Authorization': 'Bearer test_token'}
+    assert [c.kwargs['data']['grant_type'] for c in mock_post.call_args_list] == ['refresh_token', 'client_credentials']
+
+
+@patch('requests.Session.post')
+def test_authenticate_persists_token(mock_post, tmp_path):
+    token_path = str(tmp_path / 'token.json')
+    mock_post.return_value = make_token_response()
+
+    api_client = APIClient('http://testurl.com', client_id='test_id', client_secret='test_secret', realm='test_realm', token_path=token_path)
+    assert api_client._authenticate() == {'Authorization': 'Bearer test_token'}
+
+    with open(token_path) as f:
+        assert json.load(f)['access_token'] == 'test_token'
+
+    restarted_client = APIClient('http://testurl.com', client_id='test_id', client_secret='test_secret', realm='test_realm', token_path=token_path)
+    assert restarted_client._authenticate() == {'Authorization': 'Bearer test_token'}
+
+    other_client = APIClient('http://testurl.com', client_id='other_id', client_secret='test_secret', realm='test_realm', token_path=token_path)
+    other_client._authenticate()
+
+    assert mock_post.call_count == 2
+    assert os.stat(token_path).st_mode & 0o777 == 0o600
+    assert os.listdir(tmp_path) == ['token.json']
+
+
+def test_save_token_concurrent_writers(tmp_path):
+    token_path = str(tmp_path / 'token.json')
+    clients = [APIClient('http://testurl.com', client_id='test_id', client_secret='test_secret', realm='test_realm', token_path=token_path) for _ in range(4)]
+    for i, client in enumerate(clients):
+        client.access_token = f'token_{i}'
+        client.logger = MagicMock()
+
+    def save(client):
+        for _ in range(50):
+            client._save_token()
+    threads = [threading.Thread(target=save, args=(client,)) for client in clients]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for client in clients:
+        client.logger.error.assert_not_called()
+    with open(token_path) as f:
+        assert json.load(f)['access_token'] in {'token_0', 'token_1', 'token_2', 'token_3'}
+    assert os.listdir(tmp_path) == ['token.json']
+
+
+# response cache tests
+
+
+@patch('requests.Session.request')
+def test_make_request_revalidates_cached_response(mock_request):
+    api_client = APIClient('https://testurl.com', api_key='test_key', response_cache=True)
+
+    first = make_response(200, {'Content-Type': 'application/json', 'ETag': '"v1"'})
+    first.json.return_value = {'hosts': ['A']}
+    not_modified = make_response(304)
+    mock_request.side_effect = [first, not_modified]
+
+    assert api_client.make_request(path='/hosts', params={'site': 'dk'}) == {'hosts': ['A']}
+    assert api_client.make_request(path='/hosts', params={'site': 'dk'}) == {'hosts': ['A']}
+
+    assert mock_request.call_args.kwargs['headers'] == {'Authorization': 'Bearer test_key', 'If-None-Match': '"v1"'}
+    not_modified.json.assert_not_called()
+
+
+@patch('requests.Session.request')
+def test_make_request_fresh_cached_response(mock_request):
+    api_client = APIClient('https://testurl.com', response_cache=True)
+
+    res = make_response(200, {'Cache-Control': 'max-age=60'})
+    mock_request.return_value = res
+
+    assert api_client.make_request(path='/hosts') == b'ok'
+    assert api_client.make_request(path='/hosts') == b'ok'
+    assert api_client.make_request(path='/hosts', params={'page': 2}) == b'ok'
+
+    assert mock_request.call_count == 2
+
+
+@patch('requests.Session.request')
+def test_make_request_cache_only_gets(mock_request):
+    api_client = APIClient('https://testurl.com', response_cache=True)
+    mock_request.return_value = make_response(200, {'Cache-Control': 'max-age=60'})
+
+    api_client.make_request(path='/hosts', json={})
+    api_client.make_request(path='/hosts', json={})
+
+    assert mock_request.call_count == 2
+
+
+# streaming tests
+
+
+def make_stream_response(chunks):
+    res = make_response(200)
+    res.iter_content.return_value = iter(chunks)
+    return res
+
+
+@patch('requests.Session.request')
+def test_stream(mock_request):
+    api_client = APIClient('https://testurl.com', api_key='test_key')
+    res = make_stream_response([b'ab', b'cd'])
+    mock_request.return_value = res
+
+    assert list(api_client.stream(chunk_size=2, path='/export')) == [b'ab', b'cd']
+
+    mock_request.assert_called_once_with('GET', 'https://testurl.com/export', stream=True, headers={'Authorization': 'Bearer test_key'})
+    res.iter_content.assert_called_once_with(2)
+    res.close.assert_called_once()
+
+
+@patch('requests.Session.request')
+def test_stream_raises(mock_request):
+    api_client = APIClient('https://testurl.com')
+    mock_request.return_value = make_stream_response([])
+    mock_request.return_value.raise_for_status.side_effect = Exception('404 Not Found')
+
+    with pytest.raises(Exception):
+        list(api_client.stream(path='/export'))
+    mock_request.return_value.close.assert_called_once()
+
+
+@patch('requests.Session.request')
+def test_download_to_path(mock_request, tmp_path):
+    api_client = APIClient('https://testurl.com')
+    mock_request.return_value = make_stream_response([b'ab', b'cd'])
+    destination = tmp_path / 'export.bin'
+
+    assert api_client.download(str(destination), path='/export') == 4
+    assert destination.read_bytes() == b'abcd'
+    assert list(tmp_path.iterdir()) == [destination]
+
+
+@patch('requests.Session.request')
+def test_download_concurrent_to_same_path(mock_request, tmp_path):
+    api_client = APIClient('https://testurl.com')
+    mock_request.side_effect = lambda *args, **kwargs: make_stream_response([b'ab', b'cd'])
+    destination = str(tmp_path / 'export.bin')
+    errors = []
+
+    def download():
+        try:
+            for _ in range(20):
+                api_client.download(destination, path='/export')
+        except Exception as e:
+            errors.append(e)
+    threads = [threading.Thread(target=download) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert os.listdir(tmp_path) == ['export.bin']
+
+
+@patch('requests.Session.request')
+def test_download_failure_leaves_no_file(mock_request, tmp_path):
+    api_client = APIClient('https://testurl.com')
+
+    def chunks():
+        yield b'ab'
+        raise ConnectionError('connection reset')
+    res = make_response(200)
+    res.iter_content.return_value = chunks()
+    mock_request.return_value = res
+
+    with pytest.raises(ConnectionError):
+        api_client.download(str(tmp_path / 'export.bin'), path='/export')
+    assert list(tmp_path.iterdir()) == []
+
+
+@patch('requests.Session.request')
+def test_download_to_file_object(mock_request):
+    api_client = APIClient('https://testurl.com')
+    mock_request.return_value = make_stream_response([b'ab', b'cd'])
+    destination = io.BytesIO()
+
+    assert api_client.download(destination, path='/export') == 4
+    assert destination.getvalue() == b'abcd'
+
+
+@patch('requests.Session.request')
+def test_iter_json(mock_request):
+    api_client = APIClient('https://testurl.com')
+    mock_request.return_value = make_stream_response([b'{"assets": [{"id"', b': 1}, {"id": 2}]}'])
+
+    assert list(api_client.iter_json(records_key='assets', path='/assets')) == [{'id': 1}, {'id': 2}]
@@ -0,0 +1,101 @@
+import pytest
+
+from unittest.mock import MagicMock, patch
+
+from utils.cache import QueryCache
+
+
+def test_get_loads_once_within_ttl():
+    cache = QueryCache(ttl=60)
+    loader = MagicMock(return_value='value')
+
+    assert cache.get('key', loader) == 'value'
+    assert cache.get('key', loader) == 'value'
+    loader.assert_called_once()
+
+
+@patch('time.monotonic')
+def test_get_fingerprint_unchanged(mock_time):
+    cache = QueryCache(ttl=10)
+    loader = MagicMock(return_value='value')
+    fingerprint = MagicMock(return_value=('2024-01-01', 10))
+
+    mock_time.return_value = 0
+    assert cache.get('key', loader, fingerprint) == 'value'
+
+    mock_time.return_value = 20
+    assert cache.get('key', loader, fingerprint) == 'value'
+
+    loader.assert_called_once()
+    assert fingerprint.call_count == 2
+
+
+@patch('time.monotonic')
+def test_get_fingerprint_changed(mock_time):
+    cache = QueryCache(ttl=10)
+    loader = MagicMock(side_effect=['old', 'new'])
+    fingerprint = MagicMock(side_effect=[('2024-01-01', 10), ('2024-01-02', 10)])
+
+    mock_time.return_value = 0
+    assert cache.get('key', loader, fingerprint) == 'old'
+
+    mock_time.return_value = 20
+    assert cache.get('key', loader, fingerprint) == 'new'
+    assert loader.call_count == 2
+
+
+@patch('time.monotonic')
+def test_get_serves_stale_on_error(mock_time):
+    cache = QueryCache(ttl=10)
+    loader = MagicMock(side_effect=['value', Exception('DB down')])
+
+    mock_time.return_value = 0
+    assert cache.get('key', loader) == 'value'
+
+    mock_time.return_value = 20
+    cache.logger = MagicMock()
+    assert cache.get('key', loader) == 'value'
+    cache.logger.error.assert_called_once_with("Error reloading 'key', serving stale value: DB down")
+
+
+def test_get_raises_without_entry():
+    cache = QueryCache(ttl=10)
+
+    with pytest.raises(Exception) as excinfo:
+        cache.get('key', MagicMock(side_effect=Exception('DB down')))
+    assert 'DB down' in str(excinfo.value)
+
+
+def test_invalidate():
+    cache = QueryCache(ttl=60)
+    loader = MagicMock(return_value='value')
+
+    cache.get('key', loader)
+    cache.invalidate('key')
+    cache.get('key', loader)
+    assert loader.call_count == 2
+
+
+@patch('utils.cache.cache_miss_counter')
+@patch('utils.cache.cache_hit_counter')
+def test_get_metrics(mock_hit_counter, mock_miss_counter):
+    cache = QueryCache(ttl=60)
+
+    cache.get('key', lambda: 'value')
+    cache.get('key', lambda: 'value')
+
+    mock_miss_counter.labels.assert_called_once_with('key')
+    mock_hit_counter.labels.assert_called_once_with('key')
+
+
+def test_max_entries_evicts_least_recently_used():
+    cache = QueryCache(ttl=60, max_entries=2)
+    loader = MagicMock(return_value='value')
+
+    cache.get('a', loader)
+    cache.get('b', loader)
+    cache.get('a', loader)
+    cache.get('c', loader)
+
+    assert list(cache._entries) == ['a', 'c']
+    assert loader.call_count == 3
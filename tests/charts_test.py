@@ -0,0 +1,40 @@
+import pandas as pd
+
+from utils.charts import build_host_views, format_space_table
+
+
+def make_df():
+    return pd.DataFrame({
+        'ComputerName': pd.Categorical(['A', 'A', 'B']),
+        'Drive': pd.Categorical(['C', 'D', 'C']),
+        'TotalSize_GB': [100.0, 2000.0, 10.0],
+        'FreeSpace_GB': [25.0, 1000.0, 5.0],
+        'UsedSpace_GB': [75.0, 1000.0, 5.0],
+        'ProcentageUsed': [0.75, 0.5, 0.5],
+        'UpdateTimeStamp': [pd.Timestamp('2024-01-01 10:00:00'), pd.Timestamp('2024-01-01 12:00:00'), pd.Timestamp('2024-01-02 08:30:00')]
+    })
+
+
+def test_format_space_table():
+    table_df = format_space_table(make_df())
+
+    assert table_df['TotalSize_GB'].tolist() == ['100.00 GB', '2,000.00 GB', '10.00 GB']
+    assert table_df['ProcentageUsed'].tolist() == ['75.00%', '50.00%', '50.00%']
+
+
+def test_build_host_views():
+    views = build_host_views(make_df())
+
+    assert [computer for computer, _, _ in views] == ['A', 'B']
+
+    computer, chart, table_html = views[0]
+    assert chart.title == 'A - 01/01-2024 11:00:00'
+    assert len(chart.data) == 4
+    assert '2,000.00 GB' in table_html
+    assert 'ComputerName' not in table_html
+
+
+def test_build_host_views_keeps_order():
+    df = make_df().sort_values('ComputerName', ascending=False)
+
+    assert [computer for computer, _, _ in build_host_views(df)] == ['B', 'A']
@@ -0,0 +1,54 @@
+import pandas as pd
+
+from unittest.mock import MagicMock, patch
+
+from collector import SnapshotCollector, JOB_NAME
+
+
+def make_loader(fingerprints):
+    loader = MagicMock()
+    loader.fingerprint.side_effect = fingerprints
+    loader.load.return_value = pd.DataFrame({'ComputerName': ['A'], 'Drive': ['C']})
+    return loader
+
+
+@patch('collector.write_snapshot')
+def test_run_once_writes_snapshot_on_change(mock_write_snapshot):
+    loader = make_loader([('2024-01-01', 1), ('2024-01-01', 1), ('2024-01-02', 1)])
+    collector = SnapshotCollector(loader, '/snapshots')
+
+    assert collector.run_once()
+    assert collector.run_once()
+    assert collector.run_once()
+
+    assert loader.load.call_count == 2
+    mock_write_snapshot.assert_called_with(loader.load.return_value, '/snapshots/diskspace.parquet')
+
+
+@patch('collector.export_forecast')
+@patch('collector.forecast_days_until_full')
+@patch('collector.write_snapshot')
+def test_run_once_with_history(mock_write_snapshot, mock_forecast, mock_export_forecast):
+    history_store = MagicMock()
+    collector = SnapshotCollector(make_loader([('2024-01-01', 1)]), '/snapshots', history_store)
+
+    assert collector.run_once()
+
+    history_store.append.assert_called_once()
+    mock_export_forecast.assert_called_once_with(mock_forecast.return_value)
+    mock_write_snapshot.assert_called_with(mock_forecast.return_value, '/snapshots/forecast.parquet')
+
+
+@patch('collector.job_duration_summary')
+@patch('collector.job_complete_counter')
+@patch('collector.job_start_counter')
+def test_run_once_failure_metrics(mock_start_counter, mock_complete_counter, mock_duration_summary):
+    loader = MagicMock()
+    loader.fingerprint.side_effect = Exception('DB down')
+    collector = SnapshotCollector(loader, '/snapshots')
+
+    assert not collector.run_once()
+
+    mock_start_counter.labels.assert_called_once_with(JOB_NAME)
+    mock_complete_counter.labels.assert_called_once_with(JOB_NAME, 'failure')
+    mock_duration_summary.labels.assert_called_once_with(JOB_NAME, 'failure')
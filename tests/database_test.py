@@ -1,6 +1,8 @@
 import pytest
+import numpy as np
+import pandas as pd
 from unittest.mock import patch, MagicMock
-from utils.database import DatabaseClient
+from utils.database import DatabaseClient, ConnectionPool, params_key, to_rows
 
 
 def test_invalid_db_type():
@@ -90,3 +92,383 @@ def test_execute_sql_failure(mock_create_engine):
         result = client.execute_sql(sql)
         assert result is None
         mock_logger_error.assert_any_call('Error executing SQL: SQL error')
+
+
+# ConnectionPool tests
+
+
+def test_pool_reuses_connection():
+    connect = MagicMock()
+    pool = ConnectionPool(connect, 'test', max_size=2)
+
+    with pool.connection() as conn:
+        first = conn
+    with pool.connection() as conn:
+        assert conn == first
+
+    connect.assert_called_once()
+    first.commit.assert_called()
+
+
+def test_pool_invalid_sizes():
+    with pytest.raises(ValueError):
+        ConnectionPool(MagicMock(), 'test', min_size=3, max_size=2)
+
+
+def test_pool_timeout():
+    pool = ConnectionPool(MagicMock(), 'test', max_size=1, timeout=0.01)
+
+    pool.acquire()
+    with pytest.raises(TimeoutError):
+        pool.acquire()
+
+
+@patch('time.sleep')
+def test_pool_connect_retry(mock_sleep):
+    connect = MagicMock(side_effect=[Exception('down'), Exception('down'), 'conn'])
+    pool = ConnectionPool(connect, 'test', connect_retries=3, connect_backoff=0.5)
+
+    assert pool.acquire() == 'conn'
+    assert [c.args[0] for c in mock_sleep.call_args_list] == [0.5, 1.0]
+
+
+def test_pool_connect_failure_frees_slot():
+    connect = MagicMock(side_effect=Exception('down'))
+    pool = ConnectionPool(connect, 'test', max_size=1, connect_retries=1)
+
+    with pytest.raises(Exception):
+        pool.acquire()
+    assert pool._size == 0
+
+
+def test_pool_health_check_replaces_dead_connection():
+    dead = MagicMock()
+    dead.cursor.side_effect = Exception('connection lost')
+    connect = MagicMock(side_effect=[dead, 'new_conn'])
+    pool = ConnectionPool(connect, 'test', health_check_interval=-1)
+
+    pool.release(pool.acquire())
+
+    assert pool.acquire() == 'new_conn'
+    dead.close.assert_called_once()
+
+
+def test_pool_rollback_on_error():
+    conn = MagicMock()
+    pool = ConnectionPool(MagicMock(return_value=conn), 'test')
+
+    with pytest.raises(ValueError):
+        with pool.connection():
+            raise ValueError('failed')
+
+    conn.rollback.assert_called_once()
+    assert pool._in_use == 0
+    assert len(pool._idle) == 1
+
+
+def test_pool_discards_on_failed_rollback():
+    conn = MagicMock()
+    conn.rollback.side_effect = Exception('connection lost')
+    pool = ConnectionPool(MagicMock(return_value=conn), 'test')
+
+    with pytest.raises(ValueError):
+        with pool.connection():
+            raise ValueError('failed')
+
+    assert pool._size == 0
+    assert len(pool._idle) == 0
+
+
+def test_pool_warm():
+    connect = MagicMock()
+    pool = ConnectionPool(connect, 'test', min_size=2, max_size=3)
+
+    pool.warm()
+
+    assert connect.call_count == 2
+    assert len(pool._idle) == 2
+
+
+def test_pool_warm_failure():
+    pool = ConnectionPool(MagicMock(side_effect=Exception('down')), 'test', min_size=2, connect_retries=1)
+
+    pool.warm()
+
+    assert pool._size == 0
+
+
+@patch('pymssql.connect')
+def test_get_connection_held(mock_connect):
+    client = DatabaseClient('database', 'username', 'password', 'host', pool_min_size=0)
+
+    assert client.get_connection() is client.get_connection()
+    assert client.get_cursor() is client.get_cursor()
+    assert client.pool._in_use == 1
+
+    client.close()
+    assert client.pool._in_use == 0
+    mock_connect.return_value.close.assert_called_once()
+
+
+@patch('pymssql.connect')
+def test_get_connection_replaces_broken_held_connection(mock_connect):
+    broken, fresh = MagicMock(), MagicMock()
+    mock_connect.side_effect = [broken, fresh]
+    client = DatabaseClient('database', 'username', 'password', 'host', pool_min_size=0)
+
+    assert client.get_connection() is broken
+    cursor = client.get_cursor()
+    broken.cursor.side_effect = Exception('connection reset')
+
+    assert client.get_connection() is fresh
+    assert client.get_cursor() is not cursor
+    assert client.pool._in_use == 1
+    broken.close.assert_called_once()
+
+
+@patch('pymssql.connect')
+def test_execute_sql_pooled(mock_connect):
+    mock_connect.return_value.cursor.return_value.fetchall.return_value = [(1,)]
+
+    client = DatabaseClient('database', 'username', 'password', 'host')
+
+    assert client.execute_sql('SELECT 1') == [(1,)]
+    assert client.execute_sql('SELECT 1') == [(1,)]
+    mock_connect.assert_called_once_with(host='host', user='username', password='password', database='database')
+
+
+@patch('pymssql.connect')
+def test_execute_sql_pooled_failure(mock_connect):
+    mock_connect.return_value.cursor.return_value.execute.side_effect = Exception('SQL error')
+
+    client = DatabaseClient('database', 'username', 'password', 'host')
+    with patch.object(client.logger, 'error') as mock_logger_error:
+        assert client.execute_sql('SELECT 1') is None
+        mock_logger_error.assert_called_with('Error executing SQL: SQL error')
+
+
+# Streaming tests
+
+
+def make_streaming_client(mock_connect, batches, columns=('ComputerName', 'TotalSize_GB')):
+    cursor = mock_connect.return_value.cursor.return_value
+    cursor.description = [(column,) for column in columns]
+    cursor.fetchmany.side_effect = batches + [[]]
+    return DatabaseClient('database', 'username', 'password', 'host'), cursor
+
+
+@patch('pymssql.connect')
+def test_stream(mock_connect):
+    client, cursor = make_streaming_client(mock_connect, [[('A', 1)], [('B', 2)]])
+
+    assert list(client.stream('SELECT * FROM t WHERE a = %s', ('x',), batch_size=1)) == [[('A', 1)], [('B', 2)]]
+    cursor.execute.assert_called_once_with('SELECT * FROM t WHERE a = %s', ('x',))
+    cursor.fetchmany.assert_called_with(1)
+    assert client.pool._in_use == 0
+
+
+@patch('pymssql.connect')
+def test_stream_closed_early_releases_connection(mock_connect):
+    client, _ = make_streaming_client(mock_connect, [[('A', 1)], [('B', 2)]])
+
+    rows = client.stream('SELECT * FROM t')
+    next(rows)
+    assert client.pool._in_use == 1
+    rows.close()
+
+    assert client.pool._in_use == 0
+    mock_connect.return_value.rollback.assert_called_once()
+
+
+@patch('pymssql.connect')
+def test_stream_frames_typed(mock_connect):
+    client, _ = make_streaming_client(mock_connect, [[('A', 1)], [('B', 2)]])
+
+    frames = list(client.stream_frames('SELECT * FROM t', dtypes={'ComputerName': 'category', 'TotalSize_GB': 'float32', 'Missing': 'int8'}))
+
+    assert len(frames) == 2
+    assert frames[1]['ComputerName'].dtype == 'category'
+    assert frames[1]['TotalSize_GB'].dtype == 'float32'
+
+
+@patch('pymssql.connect')
+def test_stream_frames_empty(mock_connect):
+    client, _ = make_streaming_client(mock_connect, [])
+
+    frames = list(client.stream_frames('SELECT * FROM t'))
+
+    assert len(frames) == 1
+    assert frames[0].empty
+    assert list(frames[0].columns) == ['ComputerName', 'TotalSize_GB']
+
+
+@patch('pymssql.connect')
+def test_read_frame_unions_categories(mock_connect):
+    client, _ = make_streaming_client(mock_connect, [[('A', 1), ('B', 2)], [('C', 3)]])
+
+    df = client.read_frame('SELECT * FROM t', batch_size=2, dtypes={'ComputerName': 'category', 'TotalSize_GB': 'float32'})
+
+    assert df['ComputerName'].dtype == 'category'
+    assert df['ComputerName'].tolist() == ['A', 'B', 'C']
+    assert df['TotalSize_GB'].dtype == 'float32'
+
+
+# Statement tests
+
+
+@patch('pymssql.connect')
+def test_query_prepared_statement(mock_connect):
+    cursor = mock_connect.return_value.cursor.return_value
+    cursor.fetchall.return_value = [('A', 'C')]
+    client = DatabaseClient('database', 'username', 'password', 'host')
+    client.prepare('drives_for_host', 'SELECT ComputerName, Drive FROM DiskSpace WHERE ComputerName = %s')
+
+    assert client.query('drives_for_host', ('A',)) == [('A', 'C')]
+    assert client.query('drives_for_host', ('A',)) == [('A', 'C')]
+
+    cursor.execute.assert_called_with('SELECT ComputerName, Drive FROM DiskSpace WHERE ComputerName = %s', ('A',))
+    assert cursor.execute.call_count == 2
+
+
+@patch('pymssql.connect')
+def test_query_cached_per_params(mock_connect):
+    cursor = mock_connect.return_value.cursor.return_value
+    cursor.fetchall.side_effect = [[('A',)], [('B',)]]
+    client = DatabaseClient('database', 'username', 'password', 'host')
+    client.prepare('host', 'SELECT ComputerName FROM DiskSpace WHERE ComputerName = %(name)s', cache_ttl=60)
+
+    assert client.query('host', {'name': 'A'}) == [('A',)]
+    assert client.query('host', {'name': 'A'}) == [('A',)]
+    assert client.query('host', {'name': 'B'}) == [('B',)]
+    assert cursor.execute.call_count == 2
+
+
+def test_query_not_prepared():
+    client = DatabaseClient('database', 'username', 'password', 'host')
+
+    with pytest.raises(KeyError):
+        client.query('missing')
+
+
+@patch('pymssql.connect')
+def test_query_raises_and_logs(mock_connect):
+    mock_connect.return_value.cursor.return_value.execute.side_effect = Exception('SQL error')
+    client = DatabaseClient('database', 'username', 'password', 'host')
+    client.prepare('broken', 'SELECT * FROM missing')
+
+    with patch.object(client.logger, 'error') as mock_logger_error:
+        with pytest.raises(Exception):
+            client.query('broken')
+        mock_logger_error.assert_called_once_with("Error executing statement 'broken': SQL error")
+
+
+@patch('utils.database.db_query_duration_histogram')
+@patch('pymssql.connect')
+def test_query_frame_records_latency(mock_connect, mock_histogram):
+    client, _ = make_streaming_client(mock_connect, [[('A', 1)]])
+    client.prepare('sizes', 'SELECT ComputerName, TotalSize_GB FROM DiskSpace')
+
+    df = client.query_frame('sizes', dtypes={'TotalSize_GB': 'float32'})
+
+    assert df['TotalSize_GB'].dtype == 'float32'
+    mock_histogram.labels.assert_any_call('sizes', 'execute')
+    mock_histogram.labels.assert_any_call('sizes', 'fetch')
+
+
+def test_params_key():
+    assert params_key(None) == ()
+    assert params_key(['a', 1]) == ('a', 1)
+    assert params_key({'b': 2, 'a': 1}) == (('a', '1'), ('b', '2'))
+    assert params_key('a') == ('a',)
+
+
+# insert_many tests
+
+
+@patch('pymssql.connect')
+def test_insert_many_batches(mock_connect):
+    cursor = mock_connect.return_value.cursor.return_value
+    client = DatabaseClient('database', 'username', 'password', 'host')
+
+    rows = iter([('A', 'C'), ('A', 'D'), ('B', 'C')])
+    assert client.insert_many('DiskSpace', ['ComputerName', 'Drive'], rows, batch_size=2) == 3
+
+    assert cursor.execute.call_args_list[0].args == ('INSERT INTO DiskSpace (ComputerName, Drive) VALUES (%s, %s), (%s, %s)', ('A', 'C', 'A', 'D'))
+    assert cursor.execute.call_args_list[1].args == ('INSERT INTO DiskSpace (ComputerName, Drive) VALUES (%s, %s)', ('B', 'C'))
+    mock_connect.return_value.commit.assert_called_once()
+
+
+@patch('pymssql.connect')
+def test_insert_many_with_cursor(mock_connect):
+    client = DatabaseClient('database', 'username', 'password', 'host')
+    cursor = MagicMock()
+
+    assert client.insert_many('DiskSpace', ['ComputerName'], [], cursor=cursor) == 0
+    assert client.insert_many('DiskSpace', ['ComputerName'], [('A',)], cursor=cursor) == 1
+    cursor.execute.assert_called_once_with('INSERT INTO DiskSpace (ComputerName) VALUES (%s)', ('A',))
+
+
+# upsert_many tests
+
+
+@patch('utils.database.db_write_rows_counter')
+@patch('pymssql.connect')
+def test_upsert_many(mock_connect, mock_rows_counter):
+    cursor = mock_connect.return_value.cursor.return_value
+    client = DatabaseClient('database', 'username', 'password', 'host')
+    rows = [('A', 'C', 10.0), ('A', 'D', 20.0), ('A', 'C', 15.0), ('B', 'C', 30.0)]
+
+    assert client.upsert_many('DiskSpace', ['ComputerName', 'Drive', 'FreeSpace_GB'], rows, ['ComputerName', 'Drive'], batch_size=3) == 3
+
+    sql, params = cursor.execute.call_args_list[0].args
+    assert sql == ('MERGE INTO DiskSpace WITH (HOLDLOCK) AS target USING (VALUES (%s, %s, %s), (%s, %s, %s)) '
+                   'AS source (ComputerName, Drive, FreeSpace_GB) ON target.ComputerName = source.ComputerName AND target.Drive = source.Drive '
+                   'WHEN MATCHED THEN UPDATE SET target.FreeSpace_GB = source.FreeSpace_GB '
+                   'WHEN NOT MATCHED THEN INSERT (ComputerName, Drive, FreeSpace_GB) VALUES (source.ComputerName, source.Drive, source.FreeSpace_GB);')
+    assert params == ('A', 'C', 15.0, 'A', 'D', 20.0)
+    assert cursor.execute.call_args_list[1].args[1] == ('B', 'C', 30.0)
+    mock_connect.return_value.commit.assert_called_once()
+    mock_rows_counter.labels.assert_called_once_with('upsert_DiskSpace')
+    mock_rows_counter.labels.return_value.inc.assert_called_once_with(3)
+
+
+@patch('pymssql.connect')
+def test_upsert_many_newer_column(mock_connect):
+    client = DatabaseClient('database', 'username', 'password', 'host')
+    cursor = MagicMock()
+
+    client.upsert_many('DiskSpace', ['ComputerName', 'Drive', 'UpdateTimeStamp'], [('A', 'C', '2024-01-01')], ['ComputerName', 'Drive'], cursor=cursor, newer_column='UpdateTimeStamp')
+
+    assert ('WHEN MATCHED AND (target.UpdateTimeStamp IS NULL OR source.UpdateTimeStamp > target.UpdateTimeStamp) '
+            'THEN UPDATE SET target.UpdateTimeStamp = source.UpdateTimeStamp ') in cursor.execute.call_args.args[0]
+
+
+@patch('pymssql.connect')
+def test_upsert_many_keys_only(mock_connect):
+    client = DatabaseClient('database', 'username', 'password', 'host')
+    cursor = MagicMock()
+
+    client.upsert_many('Hosts', ['ComputerName'], [{'ComputerName': 'A'}], ['ComputerName'], cursor=cursor)
+
+    assert 'WHEN MATCHED' not in cursor.execute.call_args.args[0]
+
+
+@patch('pymssql.connect')
+def test_upsert_many_rolls_back(mock_connect):
+    cursor = mock_connect.return_value.cursor.return_value
+    cursor.execute.side_effect = [None, Exception('deadlock')]
+    client = DatabaseClient('database', 'username', 'password', 'host')
+
+    with pytest.raises(Exception):
+        client.upsert_many('DiskSpace', ['ComputerName', 'Drive'], [('A', 'C'), ('B', 'C')], ['ComputerName', 'Drive'], batch_size=1)
+
+    mock_connect.return_value.rollback.assert_called_once()
+    mock_connect.return_value.commit.assert_not_called()
+
+
+def test_to_rows():
+    df = pd.DataFrame({'ComputerName': pd.Categorical(['A', 'B']), 'FreeSpace_GB': [1.5, np.nan], 'Extra': [1, 2]})
+
+    assert list(to_rows(df, ['ComputerName', 'FreeSpace_GB'])) == [('A', 1.5), ('B', None)]
+    assert list(to_rows([{'a': 1, 'b': 2}], ['b', 'a'])) == [(2, 1)]
+    assert list(to_rows([[1, 2]], ['a', 'b'])) == [(1, 2)]
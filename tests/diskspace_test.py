@@ -0,0 +1,244 @@
+import pytest
+import pandas as pd
+
+from unittest.mock import MagicMock, patch
+
+from utils.diskspace import SUMMARY_DTYPES, derive_diskspace, typed_diskspace, load_diskspace, load_diskspace_page, build_page_query, diskspace_fingerprint, page_diskspace, summarize_fleet, IncrementalLoader
+
+
+def make_raw_df(rows):
+    return pd.DataFrame(rows, columns=['ComputerName', 'Drive', 'TotalSize_GB', 'FreeSpace_GB', 'UpdateTimeStamp'])
+
+
+def test_derive_diskspace():
+    df = pd.DataFrame({'ComputerName': ['A', 'A'], 'Drive': ['C', 'D'], 'TotalSize_GB': ['100', '50'], 'FreeSpace_GB': ['25', '50']})
+
+    df = derive_diskspace(df)
+
+    assert df['UsedSpace_GB'].tolist() == [75, 0]
+    assert df['ProcentageUsed'].tolist() == [0.75, 0]
+
+
+def test_diskspace_fingerprint():
+    db_client = MagicMock()
+    db_client.execute_sql.return_value = [('2024-01-01', 10, 1234)]
+
+    assert diskspace_fingerprint(db_client) == ('2024-01-01', 10, 1234)
+
+
+def test_diskspace_fingerprint_error():
+    db_client = MagicMock()
+    db_client.execute_sql.return_value = None
+
+    assert diskspace_fingerprint(db_client) is None
+
+
+@patch('pandas.read_sql')
+def test_incremental_loader_merge(mock_read_sql):
+    db_client = MagicMock()
+    db_client.execute_sql.return_value = [(pd.Timestamp('2024-01-02'), 3)]
+    mock_read_sql.side_effect = [
+        make_raw_df([('A', 'C', 100, 50, pd.Timestamp('2024-01-01')), ('B', 'C', 100, 10, pd.Timestamp('2024-01-01'))]),
+        make_raw_df([('A', 'C', 100, 40, pd.Timestamp('2024-01-02')), ('B', 'D', 10, 5, pd.Timestamp('2024-01-02'))])
+    ]
+
+    loader = IncrementalLoader(db_client)
+    df = loader.load()
+    assert len(df) == 2
+    assert loader.watermark == pd.Timestamp('2024-01-01')
+
+    loader.fingerprint()
+    df = loader.load()
+
+    assert mock_read_sql.call_args.kwargs['params'] == (pd.Timestamp('2023-12-31 23:45'),)
+    assert list(zip(df['ComputerName'], df['Drive'], df['FreeSpace_GB'])) == [('A', 'C', 40), ('B', 'C', 10), ('B', 'D', 5)]
+    assert loader.watermark == pd.Timestamp('2024-01-02')
+
+
+@patch('pandas.read_sql')
+def test_incremental_loader_deleted_rows(mock_read_sql):
+    db_client = MagicMock()
+    db_client.execute_sql.return_value = [(pd.Timestamp('2024-01-01'), 1)]
+    mock_read_sql.side_effect = [
+        make_raw_df([('A', 'C', 100, 50, pd.Timestamp('2024-01-01')), ('B', 'C', 100, 10, pd.Timestamp('2024-01-01'))]),
+        make_raw_df([]),
+        make_raw_df([('A', 'C', 100, 50, pd.Timestamp('2024-01-01'))])
+    ]
+
+    loader = IncrementalLoader(db_client)
+    loader.load()
+    loader.fingerprint()
+    df = loader.load()
+
+    assert mock_read_sql.call_count == 3
+    assert df['ComputerName'].tolist() == ['A']
+
+
+@patch('utils.diskspace.load_diskspace')
+def test_incremental_loader_rows_updated_below_watermark(mock_load_diskspace):
+    db_client = MagicMock()
+    db_client.execute_sql.return_value = [(pd.Timestamp('2024-01-02'), 2, 1)]
+    rows = [('A', 'C', 100, 50, pd.Timestamp('2024-01-02')), ('B', 'C', 100, 10, pd.Timestamp('2023-12-01'))]
+    updated_rows = [rows[0], ('B', 'C', 100, 20, pd.Timestamp('2023-12-02'))]
+    mock_load_diskspace.side_effect = [
+        derive_diskspace(make_raw_df(rows)),
+        derive_diskspace(make_raw_df(rows[:1])),
+        derive_diskspace(make_raw_df(updated_rows))
+    ]
+
+    loader = IncrementalLoader(db_client)
+    loader.fingerprint()
+    loader.load()
+
+    # An older CSV drop merged into B only changes the checksum
+    db_client.execute_sql.return_value = [(pd.Timestamp('2024-01-02'), 2, 2)]
+    loader.fingerprint()
+    df = loader.load()
+
+    assert mock_load_diskspace.call_args_list[-1].kwargs == {}
+    assert df['FreeSpace_GB'].tolist() == [50, 20]
+
+
+def test_load_diskspace_summary():
+    db_client = MagicMock()
+    db_client.read_frame.return_value = pd.DataFrame({
+        'ComputerName': ['A', 'A'], 'Drive': ['C', 'D'],
+        'TotalSize_GB': [100.0, 50.0], 'FreeSpace_GB': [25.0, 50.0], 'UsedSpace_GB': [75.0, 0.0], 'ProcentageUsed': [0.75, 0.0],
+        'UpdateTimeStamp': [pd.Timestamp('2024-01-01')] * 2
+    })
+
+    df = load_diskspace(db_client, summary=True, since=pd.Timestamp('2024-01-01'))
+
+    sql, params = db_client.read_frame.call_args.args
+    assert sql.startswith('SELECT ComputerName, Drive,')
+    assert sql.endswith('WHERE UpdateTimeStamp >= %s')
+    assert params == (pd.Timestamp('2024-01-01'),)
+    assert db_client.read_frame.call_args.kwargs['dtypes'] == SUMMARY_DTYPES
+    assert df['ComputerName'].dtype == 'category'
+    assert df['Drive'].dtype == 'category'
+    assert df['UsedSpace_GB'].dtype == 'float32'
+    assert df['ProcentageUsed'].dtype == 'float32'
+
+
+@patch('utils.diskspace.load_diskspace')
+def test_incremental_loader_summary_keeps_dtypes(mock_load_diskspace):
+    db_client = MagicMock()
+    mock_load_diskspace.side_effect = [
+        typed_diskspace(derive_diskspace(make_raw_df([('A', 'C', 100, 50, pd.Timestamp('2024-01-01'))]))),
+        typed_diskspace(derive_diskspace(make_raw_df([('B', 'D', 10, 5, pd.Timestamp('2024-01-02'))])))
+    ]
+
+    loader = IncrementalLoader(db_client, summary=True)
+    loader.load()
+    df = loader.load()
+
+    assert df['ComputerName'].dtype == 'category'
+    assert df['ComputerName'].tolist() == ['A', 'B']
+    mock_load_diskspace.assert_called_with(db_client, True, since=pd.Timestamp('2023-12-31 23:45'))
+
+
+@patch('utils.diskspace.load_diskspace')
+def test_incremental_loader_late_rows(mock_load_diskspace):
+    db_client = MagicMock()
+    mock_load_diskspace.side_effect = [
+        derive_diskspace(make_raw_df([('A', 'C', 100, 50, pd.Timestamp('2024-01-01 12:00'))])),
+        # Committed after the first load, but stamped before its watermark
+        derive_diskspace(make_raw_df([('A', 'C', 100, 50, pd.Timestamp('2024-01-01 12:00')), ('B', 'C', 100, 10, pd.Timestamp('2024-01-01 11:58'))]))
+    ]
+
+    loader = IncrementalLoader(db_client, lookback=300)
+    loader.load()
+    df = loader.load()
+
+    mock_load_diskspace.assert_called_with(db_client, False, since=pd.Timestamp('2024-01-01 11:55'))
+    assert df['ComputerName'].tolist() == ['A', 'B']
+    assert loader.watermark == pd.Timestamp('2024-01-01 12:00')
+
+
+def test_page_diskspace():
+    df = derive_diskspace(make_raw_df([(name, drive, 100, free, pd.Timestamp('2024-01-01')) for name, free in [('C', 10), ('A', 50), ('B', 90)] for drive in ['D', 'C']]))
+
+    page_df, host_count = page_diskspace(df, page=1, page_size=2)
+    assert host_count == 3
+    assert list(zip(page_df['ComputerName'], page_df['Drive'])) == [('A', 'C'), ('A', 'D'), ('B', 'C'), ('B', 'D')]
+
+    page_df, host_count = page_diskspace(df, page=2, page_size=2)
+    assert page_df['ComputerName'].unique().tolist() == ['C']
+
+    page_df, host_count = page_diskspace(df, page=1, page_size=2, order_by='fullest')
+    assert page_df['ComputerName'].unique().tolist() == ['C', 'A']
+
+
+def test_page_diskspace_filters():
+    df = derive_diskspace(make_raw_df([
+        ('web01', 'C', 100, 5, pd.Timestamp('2024-01-01')),
+        ('WEB02', 'D', 100, 5, pd.Timestamp('2024-01-03')),
+        ('web03', 'C', 100, 50, pd.Timestamp('2024-01-01')),
+        ('db01', 'C', 100, 5, pd.Timestamp('2024-01-01'))
+    ]))
+
+    page_df, host_count = page_diskspace(df, search='web', min_percent_used=0.9, drive='C', stale_before=pd.Timestamp('2024-01-02'))
+
+    assert host_count == 1
+    assert page_df['ComputerName'].tolist() == ['web01']
+    assert page_diskspace(df, search='WEB')[1] == 3
+
+
+def test_build_page_query_no_filters():
+    sql, params = build_page_query(page=3, page_size=25)
+
+    assert 'WHERE' not in sql
+    assert 'OFFSET %s ROWS FETCH NEXT %s ROWS ONLY' in sql
+    assert params == (50, 25)
+
+
+def test_build_page_query_filters():
+    sql, params = build_page_query(search='web_01%', min_percent_used=0.9, drive='C', stale_before=pd.Timestamp('2024-01-01'), order_by='fullest')
+
+    assert 'WHERE ComputerName LIKE %s AND ProcentageUsed >= %s AND Drive = %s AND UpdateTimeStamp < %s' in sql
+    assert 'ORDER BY MAX(ProcentageUsed) DESC, ComputerName' in sql
+    assert params == ('%web[_]01[%]%', 0.9, 'C', pd.Timestamp('2024-01-01'), 0, 25)
+
+
+def test_build_page_query_invalid_order():
+    with pytest.raises(ValueError):
+        build_page_query(order_by='ProcentageUsed; DROP TABLE DiskSpace')
+
+
+def test_load_diskspace_page():
+    db_client = MagicMock()
+    db_client.read_frame.return_value = derive_diskspace(make_raw_df([('A', 'C', 100, 50, pd.Timestamp('2024-01-01'))])).assign(HostCount=42)
+
+    df, host_count = load_diskspace_page(db_client, page=1, page_size=10, drive='C')
+
+    assert host_count == 42
+    assert 'HostCount' not in df.columns
+    assert db_client.read_frame.call_args.args[1] == ('C', 0, 10)
+
+
+def test_load_diskspace_page_empty():
+    db_client = MagicMock()
+    db_client.read_frame.return_value = make_raw_df([]).assign(UsedSpace_GB=[], ProcentageUsed=[], HostCount=[])
+
+    df, host_count = load_diskspace_page(db_client, page=5, page_size=10)
+
+    assert host_count == 0
+    assert df.empty
+
+
+def test_summarize_fleet():
+    df = derive_diskspace(make_raw_df([
+        ('A', 'C', 100, 5, pd.Timestamp('2024-01-01')),
+        ('A', 'D', 100, 50, pd.Timestamp('2024-01-01')),
+        ('B', 'C', 200, 190, pd.Timestamp('2024-01-01'))
+    ]))
+
+    fleet = summarize_fleet(df, top_n=2)
+
+    assert fleet['host_count'] == 2
+    assert fleet['drive_count'] == 3
+    assert fleet['total_gb'] == 400
+    assert fleet['used_gb'] == 155
+    assert fleet['top_drives'][['ComputerName', 'Drive']].values.tolist() == [['A', 'C'], ['A', 'D']]
+    assert fleet['histogram']['Drives'].tolist() == [1, 0, 0, 0, 0, 1, 0, 0, 0, 1]
+    assert fleet['histogram']['Bucket'].iloc[-1] == '90%-100%'
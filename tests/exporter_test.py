@@ -0,0 +1,64 @@
+import pandas as pd
+
+from unittest.mock import MagicMock, patch
+
+from utils.exporter import LabelledGauges, DiskMetricsExporter, BYTES_PER_GB
+from utils.snapshot import write_snapshot
+
+
+def make_df(computers):
+    return pd.DataFrame({
+        'ComputerName': pd.Categorical(computers), 'Drive': pd.Categorical(['C'] * len(computers)),
+        'TotalSize_GB': [100.0] * len(computers), 'FreeSpace_GB': [25.0] * len(computers)
+    })
+
+
+def test_labelled_gauges_removes_stale_labels():
+    gauge_a, gauge_b = MagicMock(), MagicMock()
+    gauges = LabelledGauges(gauge_a, gauge_b)
+
+    gauges.update([(('A', 'C'), (1, 2)), (('B', 'C'), (3, 4))])
+    gauge_a.labels.assert_any_call('B', 'C')
+    gauge_b.labels.return_value.set.assert_called_with(4)
+
+    gauges.update([(('A', 'C'), (1, 2))])
+    gauge_a.remove.assert_called_once_with('B', 'C')
+    gauge_b.remove.assert_called_once_with('B', 'C')
+    assert gauges.labels == {('A', 'C')}
+
+
+def test_disk_metrics_exporter_update():
+    exporter = DiskMetricsExporter()
+    total_gauge, free_gauge, ratio_gauge = MagicMock(), MagicMock(), MagicMock()
+    exporter.gauges = LabelledGauges(total_gauge, free_gauge, ratio_gauge)
+
+    exporter.update(make_df(['A']))
+
+    total_gauge.labels.assert_called_once_with('A', 'C')
+    total_gauge.labels.return_value.set.assert_called_once_with(100 * BYTES_PER_GB)
+    free_gauge.labels.return_value.set.assert_called_once_with(25 * BYTES_PER_GB)
+    ratio_gauge.labels.return_value.set.assert_called_once_with(0.75)
+
+
+def test_disk_metrics_exporter_refresh(tmp_path):
+    path = str(tmp_path / 'diskspace.parquet')
+    exporter = DiskMetricsExporter()
+
+    with patch.object(exporter, 'update') as mock_update:
+        assert not exporter.refresh(path)
+
+        write_snapshot(make_df(['A', 'B']), path)
+        assert exporter.refresh(path)
+        assert not exporter.refresh(path)
+        mock_update.assert_called_once()
+
+
+def test_disk_metrics_exporter_refresh_error(tmp_path):
+    path = str(tmp_path / 'diskspace.parquet')
+    write_snapshot(make_df(['A']), path)
+    exporter = DiskMetricsExporter()
+    exporter.logger = MagicMock()
+
+    with patch.object(exporter, 'update', side_effect=Exception('bad snapshot')):
+        assert not exporter.refresh(path)
+    exporter.logger.error.assert_called_once_with(f'Error exporting disk metrics from {path}: bad snapshot')
@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+
+from unittest.mock import MagicMock, patch
+
+from utils.exporter import LabelledGauges
+from utils.history import HistoryStore, forecast_days_until_full, export_forecast
+
+
+def make_snapshot(timestamp, used, total=100.0, computer='A', drive='C'):
+    return pd.DataFrame({
+        'ComputerName': [computer], 'Drive': [drive], 'TotalSize_GB': [total], 'FreeSpace_GB': [total - used],
+        'UsedSpace_GB': [used], 'ProcentageUsed': [used / total], 'UpdateTimeStamp': [pd.Timestamp(timestamp)]
+    })
+
+
+def test_history_store_append(tmp_path):
+    store = HistoryStore(str(tmp_path / 'history'), resolution='1h')
+    now = pd.Timestamp('2024-01-02 12:00')
+
+    store.append(make_snapshot('2024-01-02 10:05', 10), now)
+    store.append(make_snapshot('2024-01-02 10:35', 11), now)
+    history = store.append(make_snapshot('2024-01-02 11:05', 12), now)
+
+    assert history['UsedSpace_GB'].tolist() == [11, 12]
+    assert history['ComputerName'].dtype == 'category'
+    assert history['UsedSpace_GB'].dtype == 'float32'
+    assert store.read()['UsedSpace_GB'].tolist() == [11, 12]
+    assert sorted(file.name for file in (tmp_path / 'history').iterdir()) == ['r-20240102T100000.parquet', 'r-20240102T110000.parquet']
+
+
+def test_history_store_downsamples_at_bucket_boundary(tmp_path):
+    store = HistoryStore(str(tmp_path / 'history'), resolution='1h', retention_days=30, downsample_after_days=7)
+
+    store.append(make_snapshot('2024-01-01 10:00', 1), pd.Timestamp('2024-01-01 10:00'))
+    store.append(make_snapshot('2024-01-01 14:00', 2), pd.Timestamp('2024-01-01 14:00'))
+    store.append(make_snapshot('2024-01-09 10:00', 3), pd.Timestamp('2024-01-09 10:00'))
+    assert sorted(file.name for file in (tmp_path / 'history').iterdir()) == ['d-20240101T000000.parquet', 'r-20240109T100000.parquet']
+
+    history = store.append(make_snapshot('2024-02-05 10:00', 4), pd.Timestamp('2024-02-05 10:00'))
+    assert history['UsedSpace_GB'].tolist() == [3, 4]
+
+
+def test_history_store_migrates_single_file(tmp_path):
+    path = str(tmp_path / 'history.parquet')
+    make_snapshot('2024-01-02 10:05', 10)[['ComputerName', 'Drive', 'TotalSize_GB', 'FreeSpace_GB', 'UsedSpace_GB', 'UpdateTimeStamp']].to_parquet(path)
+    store = HistoryStore(path, resolution='1h')
+
+    history = store.append(make_snapshot('2024-01-02 11:05', 12), pd.Timestamp('2024-01-02 12:00'))
+
+    assert history['UsedSpace_GB'].tolist() == [10, 12]
+    assert (tmp_path / 'history.parquet').is_dir()
+
+
+def test_history_store_downsample_and_retention(tmp_path):
+    store = HistoryStore(str(tmp_path / 'history'), resolution='1h', retention_days=30, downsample_after_days=7)
+    now = pd.Timestamp('2024-02-01 12:00')
+    history = pd.concat([
+        make_snapshot('2023-12-01 10:00', 1),
+        make_snapshot('2024-01-10 10:00', 2),
+        make_snapshot('2024-01-10 14:00', 3),
+        make_snapshot('2024-01-31 10:00', 4),
+        make_snapshot('2024-01-31 14:00', 5)
+    ], ignore_index=True)
+
+    history = store.compact(history, now)
+
+    assert history['UsedSpace_GB'].tolist() == [3, 4, 5]
+
+
+def test_forecast_days_until_full():
+    snapshots = [make_snapshot(f'2024-01-0{day}', 10 + 2 * day) for day in range(1, 6)]
+    snapshots += [make_snapshot(f'2024-01-0{day}', 50, computer='B') for day in range(1, 6)]
+    snapshots.append(make_snapshot('2024-01-01', 50, computer='C'))
+    history = pd.concat(snapshots, ignore_index=True)
+
+    forecast = forecast_days_until_full(history).set_index('ComputerName')
+
+    assert np.isclose(forecast.loc['A', 'Growth_GB_per_day'], 2)
+    assert np.isclose(forecast.loc['A', 'DaysUntilFull'], 40)
+    assert forecast.loc['B', 'DaysUntilFull'] == np.inf
+    assert forecast.loc['C', 'DaysUntilFull'] == np.inf
+    assert np.isnan(forecast.loc['C', 'Growth_GB_per_day'])
+
+
+def test_forecast_days_until_full_empty():
+    forecast = forecast_days_until_full(make_snapshot('2024-01-01', 1).iloc[0:0])
+
+    assert forecast.empty
+    assert forecast['DaysUntilFull'].dtype == 'float64'
+
+
+def test_export_forecast_skips_infinite():
+    mock_gauge = MagicMock()
+    with patch('utils.history._forecast_gauges', LabelledGauges(mock_gauge)):
+        export_forecast(pd.DataFrame({'ComputerName': pd.Categorical(['A', 'B']), 'Drive': ['C', 'C'], 'DaysUntilFull': [10, np.inf]}))
+
+    mock_gauge.labels.assert_called_once_with('A', 'C')
+    mock_gauge.labels.return_value.set.assert_called_once_with(10)
@@ -0,0 +1,22 @@
+import os
+import sys
+import pytest
+import subprocess
+
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+
+# Heavy dependencies must only be imported when they are used, see scripts/import_time.py
+@pytest.mark.parametrize('module, lazy_modules', [
+    ('utils.logging', ['werkzeug']),
+    ('utils.charts', ['altair']),
+    ('utils.database', ['pymssql']),
+    ('utils.sftp', ['paramiko', 'pysftp']),
+    ('utils.api_requests', ['requests', 'requests_pkcs12'])
+])
+def test_import_is_lazy(module, lazy_modules):
+    code = f'import sys, {module}; print(",".join(m for m in {lazy_modules!r} if m in sys.modules))'
+    process = subprocess.run([sys.executable, '-c', code], cwd=SRC_DIR, capture_output=True, text=True, check=True)
+
+    assert process.stdout.strip() == ''
@@ -0,0 +1,150 @@
+import io
+import json
+import stat
+import time
+import pytest
+import paramiko
+import pandas as pd
+
+from contextlib import contextmanager
+from unittest.mock import MagicMock, patch
+
+from utils.ingest import CSVIngester, SeenFiles, DISKSPACE_COLUMNS, _WindowedReader
+
+
+class RemoteFile(io.BytesIO):
+    def __init__(self, data):
+        super().__init__(data)
+        self.windows = []
+
+    def readv(self, chunks, max_concurrent_prefetch_requests=None):
+        assert max_concurrent_prefetch_requests is not None
+        self.windows.extend(chunks)
+        for offset, size in chunks:
+            self.seek(offset)
+            yield self.read(size)
+
+
+def make_attr(filename, mtime, size=100, mode=stat.S_IFREG):
+    attr = paramiko.SFTPAttributes()
+    attr.filename = filename
+    attr.st_mtime = mtime
+    attr.st_size = size
+    attr.st_mode = mode
+    return attr
+
+
+def make_ingester(files, attrs=None, **kwargs):
+    connection = MagicMock()
+    connection.sftp_client.listdir_attr.return_value = attrs or []
+    connection.sftp_client.open.side_effect = lambda path, mode: RemoteFile(files[path].encode())
+
+    sftp_client = MagicMock()
+    sftp_client.host = 'sftp'
+
+    @contextmanager
+    def session():
+        yield connection
+    sftp_client.session.side_effect = session
+
+    db_client = MagicMock()
+    db_client.upsert_many.side_effect = lambda table, columns, rows, key_columns, **kw: len(rows)
+    return CSVIngester(sftp_client, db_client, '/drops', **kwargs), db_client
+
+
+def test_seen_files(tmp_path):
+    path = str(tmp_path / 'seen.json')
+    seen_files = SeenFiles(path)
+
+    assert seen_files.is_new('/drops/a.csv', 1, 10)
+    seen_files.mark('/drops/a.csv', 1, 10)
+
+    restored = SeenFiles(path)
+    assert not restored.is_new('/drops/a.csv', 1, 10)
+    assert restored.is_new('/drops/a.csv', 2, 10)
+    assert restored.is_new('/drops/a.csv', 1, 11)
+
+
+def test_list_new():
+    now = time.time()
+    attrs = [
+        make_attr('b.csv', now - 300),
+        make_attr('a.csv', now - 600),
+        make_attr('writing.csv', now - 5),
+        make_attr('notes.txt', now - 600),
+        make_attr('archive', now - 600, mode=stat.S_IFDIR),
+        make_attr('seen.csv', now - 600)
+    ]
+    seen_files = SeenFiles()
+    seen_files.mark('/drops/seen.csv', now - 600, 100)
+    ingester, _ = make_ingester({}, attrs, seen_files=seen_files)
+
+    assert [attr.filename for attr in ingester.list_new()] == ['a.csv', 'b.csv']
+
+
+def test_ingest_file_in_chunks():
+    csv = 'Host,Drive,TotalSize_GB,FreeSpace_GB\nA,C,100,50\nA,D,200,\nB,C,50,10\n'
+    ingester, db_client = make_ingester({'/drops/a.csv': csv}, chunk_size=2, column_map={'Host': 'ComputerName'})
+    attr = make_attr('a.csv', 1700000000)
+
+    with patch('utils.ingest.ingest_rows_counter') as mock_rows_counter:
+        assert ingester.ingest_file(attr) == 3
+
+    assert db_client.upsert_many.call_count == 2
+    assert db_client.cursor.call_count == 1
+    table, columns, rows, key_columns = db_client.upsert_many.call_args_list[0].args
+    assert (table, columns, key_columns) == ('DiskSpace', DISKSPACE_COLUMNS, ['ComputerName', 'Drive'])
+    assert db_client.upsert_many.call_args.kwargs['newer_column'] == 'UpdateTimeStamp'
+    assert rows['UpdateTimeStamp'].tolist() == [pd.Timestamp.fromtimestamp(1700000000)] * 2
+    mock_rows_counter.labels.assert_called_once_with('sftp://sftp/drops')
+    mock_rows_counter.labels.return_value.inc.assert_called_once_with(3)
+    assert not ingester.seen_files.is_new('/drops/a.csv', 1700000000, 100)
+
+
+def test_windowed_reader_reads_one_window_at_a_time():
+    data = bytes(range(256)) * 40
+    f = RemoteFile(data)
+    reader = _WindowedReader(f, len(data), 4096, 4)
+
+    assert reader.read(100) == data[:100]
+    assert f.windows == [(0, 4096)]
+    assert io.BufferedReader(reader).read() == data[100:]
+    assert f.windows == [(0, 4096), (4096, 4096), (8192, 2048)]
+
+
+def test_windowed_reader_stops_at_end_of_file():
+    f = RemoteFile(b'abc')
+    assert io.BufferedReader(_WindowedReader(f, 100, 4096, 4)).read() == b'abc'
+
+
+def test_ingest_file_unparseable_takes_no_transaction():
+    ingester, db_client = make_ingester({'/drops/a.csv': 'Host,Size\nA,1\n'})
+
+    with pytest.raises(KeyError):
+        ingester.ingest_file(make_attr('a.csv', 1700000000))
+
+    db_client.cursor.assert_not_called()
+
+
+def test_prepare():
+    ingester, _ = make_ingester({})
+    chunk = pd.read_csv(io.StringIO('ComputerName,Drive,TotalSize_GB,FreeSpace_GB,UpdateTimeStamp\nA,C,100,,2024-01-01 10:00\n'))
+
+    assert ingester._prepare(chunk, 0)['UpdateTimeStamp'].tolist() == [pd.Timestamp('2024-01-01 10:00')]
+
+
+@patch('utils.ingest.ingest_files_counter')
+def test_run_once_failed_file_is_retried(mock_files_counter, tmp_path):
+    now = time.time()
+    files = {'/drops/a.csv': 'ComputerName,Drive,TotalSize_GB,FreeSpace_GB\nA,C,100,50\n', '/drops/b.csv': 'not,a,diskspace,file\n1,2,3,4\n'}
+    seen_files = SeenFiles(str(tmp_path / 'seen.json'))
+    ingester, _ = make_ingester(files, [make_attr('a.csv', now - 600), make_attr('b.csv', now - 300)], seen_files=seen_files)
+    ingester.logger = MagicMock()
+
+    assert ingester.run_once() == 1
+
+    ingester.logger.error.assert_called_once()
+    mock_files_counter.labels.assert_any_call('sftp://sftp/drops', 'failure')
+    with open(tmp_path / 'seen.json') as f:
+        assert list(json.load(f)) == ['/drops/a.csv']
+    assert [attr.filename for attr in ingester.list_new()] == ['b.csv']
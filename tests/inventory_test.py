@@ -0,0 +1,45 @@
+import pandas as pd
+
+from unittest.mock import MagicMock, patch
+
+from utils.cache import QueryCache
+from utils.inventory import DatabaseInventory, SnapshotInventory
+from utils.snapshot import write_snapshot
+
+
+def make_df():
+    return pd.DataFrame({
+        'ComputerName': pd.Categorical(['A', 'B']), 'Drive': pd.Categorical(['C', 'D']),
+        'TotalSize_GB': [100.0, 100.0], 'FreeSpace_GB': [10.0, 50.0], 'UsedSpace_GB': [90.0, 50.0], 'ProcentageUsed': [0.9, 0.5],
+        'UpdateTimeStamp': [pd.Timestamp('2024-01-01')] * 2
+    })
+
+
+@patch('utils.inventory.load_diskspace_page')
+@patch('utils.inventory.diskspace_fingerprint')
+def test_database_inventory_page_cached(mock_fingerprint, mock_load_page):
+    mock_load_page.return_value = (make_df(), 2)
+    inventory = DatabaseInventory(MagicMock(), QueryCache(ttl=60))
+
+    assert inventory.page(1, 10, drive='C')[1] == 2
+    assert inventory.page(1, 10, drive='C')[1] == 2
+    inventory.page(1, 10, drive='D')
+
+    assert mock_load_page.call_count == 2
+
+
+def test_database_inventory_no_forecast_without_history():
+    assert DatabaseInventory(MagicMock(), QueryCache(ttl=60)).forecast() is None
+
+
+def test_snapshot_inventory(tmp_path):
+    inventory = SnapshotInventory(str(tmp_path), QueryCache(ttl=0))
+    assert not inventory.ready()
+
+    write_snapshot(make_df(), str(tmp_path / 'diskspace.parquet'))
+
+    assert inventory.ready()
+    assert inventory.fleet_summary()['host_count'] == 2
+    assert inventory.drives() == ['C', 'D']
+    assert inventory.page(1, 10, order_by='fullest', min_percent_used=0.8)[0]['ComputerName'].tolist() == ['A']
+    assert inventory.forecast() is None
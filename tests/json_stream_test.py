@@ -0,0 +1,49 @@
+import json
+import pytest
+
+from utils.json_stream import iter_json_array
+
+
+def chunked(text, size):
+    data = text.encode('utf-8')
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize('size', [1, 3, 7, 1024])
+def test_iter_json_array(size):
+    records = [{'name': 'VM-æøå', 'disks': [1, 2.5, None]}, 12345, 'text, with ] and [', True, [], {}]
+
+    assert list(iter_json_array(chunked(json.dumps(records), size))) == records
+
+
+@pytest.mark.parametrize('size', [1, 5, 1024])
+def test_iter_json_array_records_key(size):
+    body = json.dumps({'total': 2, 'meta': {'items': [0]}, 'items': [{'id': 1}, {'id': 2}], 'next': None}, indent=2)
+
+    assert list(iter_json_array(chunked(body, size), records_key='items')) == [{'id': 1}, {'id': 2}]
+
+
+def test_iter_json_array_missing_key():
+    assert list(iter_json_array(chunked('{"total": 0}', 4), records_key='items')) == []
+
+
+def test_iter_json_array_empty():
+    assert list(iter_json_array(chunked(' [ ] ', 2))) == []
+
+
+def test_iter_json_array_is_lazy():
+    def chunks():
+        yield b'[{"id": 1}, '
+        raise AssertionError('read too far')
+
+    assert next(iter_json_array(chunks())) == {'id': 1}
+
+
+def test_iter_json_array_truncated():
+    with pytest.raises(ValueError):
+        list(iter_json_array(chunked('[{"id": 1}, {"id"', 4)))
+
+
+def test_iter_json_array_not_an_array():
+    with pytest.raises(ValueError):
+        list(iter_json_array(chunked('{"id": 1}', 4)))
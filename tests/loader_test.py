@@ -0,0 +1,155 @@
+import time
+import threading
+import pandas as pd
+
+from unittest.mock import MagicMock, patch
+
+from utils.loader import InventorySource, MultiSourceLoader, api_source, sftp_csv_source, merge_sources
+
+
+def test_load_merges_sources_on_computer_name():
+    sources = [
+        InventorySource('diskspace', lambda: pd.DataFrame({'ComputerName': ['A', 'A', 'B'], 'Drive': ['C', 'D', 'C']})),
+        InventorySource('cmdb', lambda: pd.DataFrame({'ComputerName': ['B', 'C'], 'Owner': ['x', 'y']}))
+    ]
+    loader = MultiSourceLoader(sources)
+
+    df = loader.load()
+
+    assert df['ComputerName'].tolist() == ['A', 'A', 'B', 'C']
+    assert df['Owner'].isna().tolist() == [True, True, False, False]
+    assert df['Drive'].isna().tolist() == [False, False, False, True]
+
+
+def test_load_runs_sources_concurrently():
+    barrier = threading.Barrier(3, timeout=5)
+
+    def load():
+        barrier.wait()
+        return pd.DataFrame({'ComputerName': ['A']})
+
+    loader = MultiSourceLoader([InventorySource(f'source_{i}', load) for i in range(3)])
+
+    assert len(loader.load_sources()) == 3
+
+
+@patch('utils.loader.is_available_gauge')
+def test_load_skips_failed_and_timed_out_sources(mock_gauge):
+    def fail():
+        raise Exception('API down')
+
+    def slow():
+        time.sleep(0.5)
+        return pd.DataFrame({'ComputerName': ['A'], 'Cluster': ['x']})
+
+    sources = [
+        InventorySource('diskspace', lambda: pd.DataFrame({'ComputerName': ['A'], 'Drive': ['C']})),
+        InventorySource('cmdb', fail, columns=['Owner']),
+        InventorySource('hypervisor', slow, timeout=0.05, columns=['Cluster'])
+    ]
+    loader = MultiSourceLoader(sources)
+
+    df = loader.load()
+
+    assert df.columns.tolist() == ['ComputerName', 'Drive', 'Owner', 'Cluster']
+    assert df['Owner'].isna().all() and df['Cluster'].isna().all()
+    mock_gauge.labels.assert_any_call('diskspace')
+    mock_gauge.labels.assert_any_call('cmdb')
+    mock_gauge.labels.assert_any_call('hypervisor')
+    assert [c.args for c in mock_gauge.labels.return_value.set.call_args_list] == [(1,), (0,), (0,)]
+    loader.close()
+
+
+@patch('utils.loader.is_available_gauge')
+def test_load_does_not_resubmit_a_running_source(mock_gauge):
+    release = threading.Event()
+    calls = []
+
+    def hung():
+        calls.append(1)
+        release.wait(5)
+        return pd.DataFrame({'ComputerName': ['A'], 'Cluster': ['x']})
+
+    sources = [
+        InventorySource('hung', hung, timeout=0.1),
+        InventorySource('fast', lambda: pd.DataFrame({'ComputerName': ['A']}), timeout=0.1)
+    ]
+    loader = MultiSourceLoader(sources)
+
+    for _ in range(3):
+        assert list(loader.load_sources()) == ['fast']
+    assert len(calls) == 1
+
+    release.set()
+    loader._running['hung'].result()
+    assert list(loader.load_sources()) == ['hung', 'fast']
+    assert len(calls) == 2
+    loader.close()
+
+
+def test_merge_sources_suffixes_colliding_columns():
+    sources = [InventorySource('diskspace', None), InventorySource('cmdb', None)]
+    frames = {
+        'diskspace': pd.DataFrame({'ComputerName': pd.Categorical(['A']), 'UpdateTimeStamp': [1]}),
+        'cmdb': pd.DataFrame({'ComputerName': ['A'], 'UpdateTimeStamp': [2]})
+    }
+
+    df = merge_sources(sources, frames)
+
+    assert df.columns.tolist() == ['ComputerName', 'UpdateTimeStamp', 'UpdateTimeStamp_cmdb']
+
+
+def test_api_source():
+    api_client = MagicMock()
+    api_client.make_request.return_value = {'items': [{'hostname': 'A', 'owner': {'name': 'x'}}]}
+
+    df = api_source(api_client, 'cmdb', '/hosts', records_key='items', key_field='hostname').load()
+
+    api_client.make_request.assert_called_once_with(path='/hosts', timeout=30)
+    assert df.to_dict('records') == [{'ComputerName': 'A', 'owner.name': 'x'}]
+
+
+def test_api_source_paginated():
+    api_client = MagicMock()
+    api_client.paginate.return_value = iter([{'hostname': 'A'}, {'hostname': 'B'}])
+
+    df = api_source(api_client, 'hypervisor', '/vms', records_key='data', key_field='hostname', pagination='offset').load()
+
+    api_client.paginate.assert_called_once_with('/vms', 'offset', timeout=30, records_key='data')
+    assert df['ComputerName'].tolist() == ['A', 'B']
+
+
+def test_api_source_paginated_default_records_key():
+    api_client = MagicMock()
+    api_client.paginate.return_value = iter([{'hostname': 'A'}])
+
+    api_source(api_client, 'hypervisor', '/vms', key_field='hostname', pagination='next_link').load()
+
+    api_client.paginate.assert_called_once_with('/vms', 'next_link', timeout=30)
+
+
+def test_api_source_failed_request():
+    api_client = MagicMock()
+    api_client.make_request.return_value = None
+
+    loader = MultiSourceLoader([api_source(api_client, 'cmdb', '/hosts')])
+
+    assert loader.load_sources() == {}
+
+
+def test_sftp_csv_source():
+    sftp_client = MagicMock()
+    conn = sftp_client.session.return_value.__enter__.return_value
+    conn.timeout = None
+    timeouts = []
+
+    def getfo(path, buffer):
+        timeouts.append(conn.timeout)
+        buffer.write(b'Host,Site\nA,DK\n')
+    conn.getfo.side_effect = getfo
+
+    df = sftp_csv_source(sftp_client, 'drops', '/drops/hosts.csv', key_field='Host', timeout=5).load()
+
+    assert timeouts == [5]
+    assert conn.timeout is None
+    assert df.to_dict('records') == [{'ComputerName': 'A', 'Site': 'DK'}]
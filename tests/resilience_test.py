@@ -0,0 +1,96 @@
+from unittest.mock import patch
+
+from utils.resilience import RetryPolicy, TokenBucket, CircuitBreaker, parse_retry_after
+
+
+def test_retry_policy_should_retry():
+    policy = RetryPolicy(retries=2)
+
+    assert policy.should_retry('GET', 0)
+    assert policy.should_retry('GET', 1, 503)
+    assert not policy.should_retry('GET', 2, 503)
+    assert not policy.should_retry('GET', 0, 404)
+    assert not policy.should_retry('POST', 0, 503)
+    assert policy.should_retry('POST', 0, 429)
+
+
+def test_retry_policy_delay():
+    policy = RetryPolicy(backoff=1, max_backoff=5, jitter=False)
+
+    assert [policy.delay(attempt) for attempt in range(4)] == [1, 2, 4, 5]
+    assert policy.delay(0, retry_after=3) == 3
+    assert policy.delay(0, retry_after=60) == 5
+
+
+@patch('random.uniform', side_effect=lambda low, high: high / 2)
+def test_retry_policy_jitter(mock_uniform):
+    assert RetryPolicy(backoff=1).delay(2) == 2
+
+
+def test_parse_retry_after():
+    assert parse_retry_after('5') == 5
+    assert parse_retry_after(None) is None
+    assert parse_retry_after('not a date') is None
+    assert parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0
+
+
+@patch('time.sleep')
+@patch('time.monotonic')
+def test_token_bucket(mock_monotonic, mock_sleep):
+    mock_monotonic.return_value = 0
+    bucket = TokenBucket(rate=2, capacity=2)
+
+    assert bucket.acquire() == 0
+    assert bucket.acquire() == 0
+
+    def sleep(seconds):
+        mock_monotonic.return_value += seconds
+    mock_sleep.side_effect = sleep
+
+    assert bucket.acquire() == 0.5
+    mock_sleep.assert_called_once_with(0.5)
+
+
+@patch('utils.resilience.api_circuit_state_gauge')
+@patch('time.monotonic')
+def test_circuit_breaker(mock_monotonic, mock_gauge):
+    mock_monotonic.return_value = 0
+    breaker = CircuitBreaker('cmdb', failure_threshold=2, reset_timeout=30)
+
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+    mock_monotonic.return_value = 30
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    mock_monotonic.return_value = 60
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+
+    mock_gauge.labels.assert_called_with('cmdb')
+    mock_gauge.labels.return_value.set.assert_called_with(CircuitBreaker.CLOSED)
+
+
+@patch('time.monotonic')
+def test_circuit_breaker_release(mock_monotonic):
+    mock_monotonic.return_value = 0
+    breaker = CircuitBreaker('cmdb', failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+
+    mock_monotonic.return_value = 30
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    breaker.release()
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
@@ -0,0 +1,97 @@
+import os
+import threading
+
+from unittest.mock import MagicMock, patch
+
+from utils.response_cache import ResponseCache, parse_cache_control
+
+
+def test_parse_cache_control():
+    assert parse_cache_control('max-age=60, no-cache, private="x"') == {'max-age': '60', 'no-cache': True, 'private': 'x'}
+    assert parse_cache_control(None) == {}
+
+
+@patch('time.time', return_value=0)
+def test_store_and_get(mock_time):
+    cache = ResponseCache()
+
+    assert cache.store('key', {'a': 1}, {'ETag': '"v1"', 'Cache-Control': 'max-age=60'})
+
+    entry = cache.get('key')
+    assert entry['value'] == {'a': 1}
+    assert ResponseCache.is_fresh(entry)
+    assert ResponseCache.validators(entry) == {'If-None-Match': '"v1"'}
+
+    mock_time.return_value = 60
+    assert not ResponseCache.is_fresh(entry)
+
+
+def test_store_not_cacheable():
+    cache = ResponseCache()
+
+    assert not cache.store('no-store', 1, {'ETag': '"v1"', 'Cache-Control': 'no-store'})
+    assert not cache.store('no-validators', 1, {})
+    assert cache.get('no-store') is None
+
+
+def test_no_cache_always_revalidates():
+    cache = ResponseCache()
+
+    cache.store('key', 1, {'Last-Modified': 'Wed, 21 Oct 2015 07:28:00 GMT', 'Cache-Control': 'no-cache, max-age=60'})
+
+    entry = cache.get('key')
+    assert not ResponseCache.is_fresh(entry)
+    assert ResponseCache.validators(entry) == {'If-Modified-Since': 'Wed, 21 Oct 2015 07:28:00 GMT'}
+
+
+def test_lru_eviction():
+    cache = ResponseCache(max_entries=2)
+
+    cache.store('a', 1, {'ETag': 'a'})
+    cache.store('b', 2, {'ETag': 'b'})
+    cache.get('a')
+    cache.store('c', 3, {'ETag': 'c'})
+
+    assert cache.get('b') is None
+    assert cache.get('a')['value'] == 1
+
+
+def test_refresh():
+    cache = ResponseCache()
+    cache.store('key', 1, {'ETag': '"v1"'})
+
+    entry = cache.refresh('key', cache.get('key'), {'Cache-Control': 'max-age=60'})
+
+    assert entry['value'] == 1
+    assert entry['etag'] == '"v1"'
+    assert ResponseCache.is_fresh(cache.get('key'))
+
+
+def test_disk_tier(tmp_path):
+    ResponseCache(path=str(tmp_path)).store(('url', ()), {'a': 1}, {'ETag': '"v1"'})
+
+    restarted_cache = ResponseCache(path=str(tmp_path))
+    assert restarted_cache.get(('url', ()))['value'] == {'a': 1}
+
+    restarted_cache.clear()
+    assert ResponseCache(path=str(tmp_path)).get(('url', ())) is None
+
+
+def test_disk_tier_concurrent_writers(tmp_path):
+    caches = [ResponseCache(path=str(tmp_path)) for _ in range(4)]
+    for cache in caches:
+        cache.logger = MagicMock()
+
+    def store(i, cache):
+        for _ in range(50):
+            cache.store(('url', ()), {'writer': i}, {'ETag': f'"v{i}"'})
+    threads = [threading.Thread(target=store, args=(i, cache)) for i, cache in enumerate(caches)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for cache in caches:
+        cache.logger.error.assert_not_called()
+    assert ResponseCache(path=str(tmp_path)).get(('url', ()))['value']['writer'] in range(4)
+    assert all(name.endswith('.pickle') for name in os.listdir(tmp_path))
@@ -1,5 +1,7 @@
+import pytest
+
 from utils.sftp import SFTPClient
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, PropertyMock
 
 
 @patch('pysftp.Connection')
@@ -9,7 +11,7 @@ def test_get_connection_success(mock_connection):
 
     result = client.get_connection()
 
-    assert result is not None
+    assert result is mock_connection.return_value
     mock_connection.assert_called_once_with(host='host', username='user', password='pass', private_key=None, cnopts=client.cnopts)
 
 
@@ -22,6 +24,7 @@ def test_get_connection_exception(mock_connection):
     result = client.get_connection()
 
     assert result is None
+    assert client.pool._size == 0
 
 
 @patch('base64.b64decode')
@@ -35,3 +38,100 @@ def test_make_key(mock_from_private_key, mock_b64decode):
     assert client.key == 'RSAKey'
     mock_b64decode.assert_called_once_with('base64key')
     mock_from_private_key.assert_called_once()
+
+
+# session pool tests
+
+
+@patch('pysftp.Connection')
+def test_session_reuses_connection(mock_connection):
+    client = SFTPClient('host', 'user', 'pass', keepalive=15)
+
+    with client.session() as first:
+        pass
+    with client.session() as second:
+        pass
+
+    assert first is second
+    mock_connection.assert_called_once_with(host='host', username='user', password='pass', private_key=None, cnopts=client.cnopts)
+    first.sftp_client.get_channel.return_value.get_transport.return_value.set_keepalive.assert_called_once_with(15)
+
+
+@patch('pysftp.Connection')
+def test_session_discards_connection_on_error(mock_connection):
+    mock_connection.side_effect = lambda **kwargs: MagicMock()
+    client = SFTPClient('host', 'user', 'pass')
+
+    try:
+        with client.session() as first:
+            raise OSError('Socket is closed')
+    except OSError:
+        pass
+    with client.session() as second:
+        pass
+
+    assert first is not second
+    first.close.assert_called_once()
+
+
+@patch('pysftp.Connection')
+def test_session_keeps_connection_on_other_errors(mock_connection):
+    mock_connection.side_effect = lambda **kwargs: MagicMock()
+    client = SFTPClient('host', 'user', 'pass')
+
+    for error in [ValueError('database error'), FileNotFoundError('/drops/missing.csv')]:
+        with pytest.raises(type(error)):
+            with client.session():
+                raise error
+    with client.session():
+        pass
+
+    mock_connection.assert_called_once()
+
+
+@patch('pysftp.Connection')
+def test_session_replaces_unhealthy_connection(mock_connection):
+    mock_connection.side_effect = lambda **kwargs: MagicMock()
+    client = SFTPClient('host', 'user', 'pass')
+    client.pool.health_check_interval = -1
+
+    with client.session() as first:
+        type(first).pwd = PropertyMock(side_effect=EOFError())
+    with client.session() as second:
+        pass
+
+    assert first is not second
+
+
+@patch('pysftp.Connection')
+def test_get_many(mock_connection):
+    mock_connection.side_effect = lambda **kwargs: MagicMock()
+    client = SFTPClient('host', 'user', 'pass', pool_size=3)
+    files = [(f'/drops/host{i}.csv', f'/tmp/host{i}.csv') for i in range(10)]
+
+    assert client.get_many(files) == [remote_path for remote_path, _ in files]
+
+    assert 1 <= mock_connection.call_count <= 3
+    assert client.pool._size == mock_connection.call_count
+
+
+@patch('pysftp.Connection')
+def test_get_many_failure(mock_connection):
+    def get(remote_path, local_path, prefetch):
+        if remote_path == '/drops/missing.csv':
+            raise FileNotFoundError(remote_path)
+
+    mock_connection.return_value.sftp_client.get.side_effect = get
+    client = SFTPClient('host', 'user', 'pass', pool_size=1)
+    client.logger = MagicMock()
+
+    assert client.get_many([('/drops/a.csv', '/tmp/a.csv'), ('/drops/missing.csv', '/tmp/missing.csv')]) == ['/drops/a.csv']
+    client.logger.error.assert_called_once_with('Error downloading /drops/missing.csv: /drops/missing.csv')
+
+
+@patch('pysftp.Connection')
+def test_put_many(mock_connection):
+    client = SFTPClient('host', 'user', 'pass', pool_size=2)
+
+    assert client.put_many([('/tmp/a.csv', '/upload/a.csv')]) == ['/tmp/a.csv']
+    mock_connection.return_value.sftp_client.put.assert_called_once_with('/tmp/a.csv', '/upload/a.csv')
@@ -0,0 +1,41 @@
+import pandas as pd
+import pytest
+
+from unittest.mock import patch
+
+from utils.snapshot import write_snapshot, read_snapshot, snapshot_fingerprint
+
+
+def test_write_and_read_snapshot(tmp_path):
+    path = str(tmp_path / 'diskspace.parquet')
+    df = pd.DataFrame({'ComputerName': pd.Categorical(['A']), 'TotalSize_GB': pd.Series([1.5], dtype='float32')})
+
+    write_snapshot(df, path)
+
+    assert read_snapshot(path).equals(df)
+    assert [file.name for file in tmp_path.iterdir()] == ['diskspace.parquet']
+
+
+def test_write_snapshot_unique_tmp_file(tmp_path):
+    path = str(tmp_path / 'diskspace.parquet')
+    tmp_paths = []
+
+    def replace(src, dst):
+        tmp_paths.append(src)
+        raise OSError('rename failed')
+
+    with patch('os.replace', replace):
+        for _ in range(2):
+            with pytest.raises(OSError):
+                write_snapshot(pd.DataFrame({'a': [1]}), path)
+
+    assert tmp_paths[0] != tmp_paths[1]
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_snapshot_fingerprint(tmp_path):
+    path = str(tmp_path / 'diskspace.parquet')
+    assert snapshot_fingerprint(path) is None
+
+    write_snapshot(pd.DataFrame({'a': [1]}), path)
+    assert snapshot_fingerprint(path) is not None
@@ -0,0 +1,64 @@
+from unittest.mock import patch
+from prometheus_client import generate_latest
+
+from utils.timing import PhaseTimer, phase, timed
+
+
+@patch('utils.timing.phase_duration_histogram')
+def test_phase_records_histogram(mock_histogram):
+    with phase('load'):
+        pass
+
+    mock_histogram.labels.assert_called_once_with('load')
+    assert mock_histogram.labels.return_value.observe.call_args[0][0] >= 0
+
+
+def test_phase_is_exposed_in_metrics():
+    with phase('exposed_phase'):
+        pass
+
+    assert 'phase_duration_s_count{phase="exposed_phase"} 1.0' in generate_latest().decode()
+
+
+def test_phase_timer_nesting():
+    timer = PhaseTimer().start()
+
+    with phase('page') as record:
+        with phase('sql', rows=3):
+            pass
+        record['rows'] = 2
+    with phase('render'):
+        pass
+
+    assert [(record['phase'], record['depth'], record['rows']) for record in timer.phases] == [('page', 0, 2), ('sql', 1, 3), ('render', 0, None)]
+    assert all(record['duration_s'] >= 0 for record in timer.phases)
+
+    df = timer.frame()
+    assert df['Phase'].tolist() == ['page', '· sql', 'render']
+    assert df['Rows'].isna().tolist() == [False, False, True]
+
+
+def test_phase_records_on_error():
+    timer = PhaseTimer().start()
+
+    try:
+        with phase('load'):
+            raise ValueError()
+    except ValueError:
+        pass
+
+    assert timer.phases[0]['duration_s'] is not None
+    assert timer.depth == 0
+
+
+def test_timed():
+    timer = PhaseTimer().start()
+
+    @timed('load', rows=len)
+    def load(count):
+        return list(range(count))
+
+    assert load(4) == [0, 1, 2, 3]
+    assert load.__name__ == 'load'
+    assert timer.phases[0]['phase'] == 'load'
+    assert timer.phases[0]['rows'] == 4